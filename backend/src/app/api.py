@@ -6,6 +6,9 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from src.app.routes import file_processing
 from src.app.routes import csv_query
+from src.app.routes import operators
+from src.utils.job_store import job_store
+from src.utils.parallel_enrichment import shutdown_executor
 from fastapi import APIRouter, HTTPException, status
 import logging
 
@@ -19,6 +22,7 @@ logger = logging.getLogger(__name__)
 
 file_processing_router = file_processing.router
 csv_query_router = csv_query.router
+operators_router = operators.router
 
 app = FastAPI(
     title = "API operator",
@@ -38,6 +42,25 @@ app.add_middleware(
 # Include all routes
 app.include_router(file_processing_router)
 app.include_router(csv_query_router)
+app.include_router(operators_router)
+
+
+# Jobs left queued or processing by a previous run will never finish
+@app.on_event("startup")
+def fail_interrupted_jobs() -> None:
+    job_store.fail_interrupted()
+
+
+# Write buffered job progress before the process exits
+@app.on_event("shutdown")
+def flush_job_store() -> None:
+    job_store.close()
+
+
+# Stop the enrichment worker processes shared by the ingest jobs
+@app.on_event("shutdown")
+def stop_enrichment_workers() -> None:
+    shutdown_executor()
 
 
 # Root endpoint to verify API connection
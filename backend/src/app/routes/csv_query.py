@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Query, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, Depends, Query, UploadFile, File, Form, HTTPException
 from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from typing import Optional, List
 import duckdb
@@ -10,9 +10,13 @@ from datetime import datetime, timedelta
 import time
 import logging
 import traceback
+import uuid
+from pathlib import Path
 import sys
 import colorlog
 import warnings
+from src.utils.dataset_store import Snapshot, dataset, dataset_snapshot
+from src.utils.schema_registry import schema_registry
 
 # Silence pandas warnings
 warnings.filterwarnings("ignore", category=pd.errors.SettingWithCopyWarning)
@@ -62,22 +66,21 @@ router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
-CSV_FILE_PATH = "src/data/input.csv"
-
 def inspect_csv_structure():
     """Inspect and log the CSV structure once to help with debugging"""
-    if not os.path.exists(CSV_FILE_PATH):
-        logger.warning(f"CSV file not found: {CSV_FILE_PATH}")
+    segments = dataset.segment_paths()
+    if not segments:
+        logger.warning(f"CSV dataset is empty: {dataset.root}")
         return False
     
     try:
-        # Read just the header to get column names
-        df = pd.read_csv(CSV_FILE_PATH, nrows=1)
+        # Read just the header of the latest segment to get column names
+        df = pd.read_csv(segments[-1], nrows=1)
         
         # Log critical information for debugging
         logger.info("-" * 50)
-        logger.info(f"CSV FILE INSPECTION: {CSV_FILE_PATH}")
-        logger.info(f"File size: {os.path.getsize(CSV_FILE_PATH) / 1024:.2f} KB")
+        logger.info(f"CSV DATASET INSPECTION: {dataset.root}")
+        logger.info(f"Segments: {len(segments)}, size: {sum(os.path.getsize(path) for path in segments) / 1024:.2f} KB")
         logger.info(f"Columns ({len(df.columns)}): {', '.join(df.columns)}")
         
         # Check for special characters in column names that might cause SQL issues
@@ -92,11 +95,16 @@ def inspect_csv_structure():
         return False
 
 @router.get("/csv/stats")
-def get_stats(type: str = Query("operators", enum=["operators", "status", "2fa"])):
+def get_stats(
+    type: str = Query("operators", enum=["operators", "status", "2fa"]),
+    snapshot: Snapshot = Depends(dataset_snapshot)
+):
     """Get statistics based on the specified type"""
     logger.info(f"🔍 Getting stats for type: {type}")
     
-    if not os.path.exists(CSV_FILE_PATH):
+    # Every query of the request reads the same pinned version
+    source = snapshot.sql_source(types=schema_registry.types())
+    if source is None:
         logger.warning("CSV file not found, returning empty data")
         return {"data": [], "message": "no_data"}
     
@@ -111,8 +119,8 @@ def get_stats(type: str = Query("operators", enum=["operators", "status", "2fa"]
         if type == 'operators':
             query = f"""
                 SELECT "Operateur" as name, COUNT(*) as count,
-                ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM '{CSV_FILE_PATH}'), 2) as value
-                FROM '{CSV_FILE_PATH}'
+                ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM {source}), 2) as value
+                FROM {source}
                 WHERE "Operateur" IS NOT NULL
                 GROUP BY "Operateur"
                 ORDER BY count DESC
@@ -121,8 +129,8 @@ def get_stats(type: str = Query("operators", enum=["operators", "status", "2fa"]
         elif type == 'status':
             query = f"""
                 SELECT "USER_STATUS" as name, COUNT(*) as count,
-                ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM '{CSV_FILE_PATH}'), 2) as value
-                FROM '{CSV_FILE_PATH}'
+                ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM {source}), 2) as value
+                FROM {source}
                 WHERE "USER_STATUS" IS NOT NULL
                 GROUP BY "USER_STATUS"
                 ORDER BY count DESC
@@ -130,8 +138,8 @@ def get_stats(type: str = Query("operators", enum=["operators", "status", "2fa"]
         elif type == '2fa':
             query = f"""
                 SELECT "2FA_STATUS" as name, COUNT(*) as count,
-                ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM '{CSV_FILE_PATH}'), 2) as value
-                FROM '{CSV_FILE_PATH}'
+                ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM {source}), 2) as value
+                FROM {source}
                 WHERE "2FA_STATUS" IS NOT NULL
                 GROUP BY "2FA_STATUS"
                 ORDER BY count DESC
@@ -171,11 +179,13 @@ def get_stats(type: str = Query("operators", enum=["operators", "status", "2fa"]
         return {"data": [], "error": str(e)}
 
 @router.get("/csv/filter-options")
-def get_filter_options():
+def get_filter_options(snapshot: Snapshot = Depends(dataset_snapshot)):
     """Get filter options for the UI"""
     logger.info("🔍 Getting filter options")
     
-    if not os.path.exists(CSV_FILE_PATH):
+    # Every query of the request reads the same pinned version
+    source = snapshot.sql_source(types=schema_registry.types())
+    if source is None:
         logger.warning("CSV file not found, returning empty options")
         return {
             "statuts": [],
@@ -191,21 +201,21 @@ def get_filter_options():
         # Define queries for each filter option
         statuts_query = f"""
             SELECT DISTINCT "USER_STATUS" as statut
-            FROM '{CSV_FILE_PATH}'
+            FROM {source}
             WHERE "USER_STATUS" IS NOT NULL
             ORDER BY "USER_STATUS"
         """
         
         fa_statuts_query = f"""
             SELECT DISTINCT "2FA_STATUS" as fa_statut
-            FROM '{CSV_FILE_PATH}'
+            FROM {source}
             WHERE "2FA_STATUS" IS NOT NULL
             ORDER BY "2FA_STATUS"
         """
         
         annees_query = f"""
             SELECT DISTINCT EXTRACT(YEAR FROM "CREATED_DATE")::VARCHAR as annee
-            FROM '{CSV_FILE_PATH}'
+            FROM {source}
             WHERE "CREATED_DATE" IS NOT NULL
             ORDER BY annee
         """
@@ -263,12 +273,15 @@ def get_data(
     filtre_global: Optional[bool] = False,
     date_min: Optional[str] = None,
     date_max: Optional[str] = None,
-    annee: Optional[str] = None
+    annee: Optional[str] = None,
+    snapshot: Snapshot = Depends(dataset_snapshot)
 ):
     """Get filtered data with pagination"""
     logger.info(f"🔍 Getting data: page={page}, filters applied: {bool(statut or fa_statut or date_min or date_max or annee)}")
     
-    if not os.path.exists(CSV_FILE_PATH):
+    # Every query of the request reads the same pinned version
+    source = snapshot.sql_source(types=schema_registry.types())
+    if source is None:
         logger.warning("CSV file not found, returning empty data")
         return {
             "data": [],
@@ -283,7 +296,7 @@ def get_data(
         
         # Get total count
         try:
-            total_count_query = f"SELECT COUNT(*) as total FROM '{CSV_FILE_PATH}'"
+            total_count_query = f"SELECT COUNT(*) as total FROM {source}"
             total_count = conn.execute(total_count_query).fetchone()[0]
             logger.info(f"Total records in CSV: {total_count}")
         except Exception as e:
@@ -294,7 +307,7 @@ def get_data(
         try:
             operator_count_query = f"""
                 SELECT "Operateur" as operateur, COUNT(*) as count
-                FROM '{CSV_FILE_PATH}'
+                FROM {source}
                 GROUP BY "Operateur"
             """
             operator_counts = {row[0]: row[1] for row in conn.execute(operator_count_query).fetchall()}
@@ -329,7 +342,7 @@ def get_data(
             conditions.append(f"EXTRACT(YEAR FROM \"CREATED_DATE\") = {annee}")
         
         # Build and execute filtered query
-        base_query = f"SELECT * FROM '{CSV_FILE_PATH}'"
+        base_query = f"SELECT * FROM {source}"
         filtered_query = base_query
         if conditions:
             filtered_query += " WHERE " + " AND ".join(conditions)
@@ -417,17 +430,19 @@ def get_data(
         }
 
 @router.get("/csv/head")
-def get_head(n: int = 5):
+def get_head(n: int = 5, snapshot: Snapshot = Depends(dataset_snapshot)):
     """Get the first n rows of the CSV file"""
     logger.info(f"🔍 Getting first {n} rows")
     
-    if not os.path.exists(CSV_FILE_PATH):
+    # Every query of the request reads the same pinned version
+    source = snapshot.sql_source(types=schema_registry.types())
+    if source is None:
         logger.warning("CSV file not found, returning empty data")
         return {"data": [], "message": "no_data"}
     
     try:
         # Execute query
-        query = f"SELECT * FROM '{CSV_FILE_PATH}' LIMIT {n}"
+        query = f"SELECT * FROM {source} LIMIT {n}"
         
         try:
             df = duckdb.query(query).to_df()
@@ -442,7 +457,7 @@ def get_head(n: int = 5):
         return {"data": [], "error": str(e)}
 
 @router.post("/csv/upload")
-async def upload_csv(file: UploadFile = File(...)):
+def upload_csv(file: UploadFile = File(...)):
     """Upload a CSV file"""
     logger.info(f"📤 Uploading file: {file.filename}")
     
@@ -455,15 +470,21 @@ async def upload_csv(file: UploadFile = File(...)):
                 content={"success": False, "message": "Le fichier doit être au format CSV"}
             )
         
-        # Create directory if needed
-        os.makedirs(os.path.dirname(CSV_FILE_PATH), exist_ok=True)
-        
-        # Save file
-        with open(CSV_FILE_PATH, 'wb') as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        file_size = os.path.getsize(CSV_FILE_PATH)
-        logger.info(f"✅ File saved successfully: {CSV_FILE_PATH} ({file_size / 1024:.2f} KB)")
+        # Save file, then make it the only segment of the dataset
+        os.makedirs(dataset.root, exist_ok=True)
+        temp_path = os.path.join(dataset.root, f".upload_{uuid.uuid4().hex}.csv")
+        try:
+            with open(temp_path, 'wb') as buffer:
+                shutil.copyfileobj(file.file, buffer)
+            file_size = os.path.getsize(temp_path)
+            with dataset.begin() as transaction:
+                manifest = transaction.replace(Path(temp_path))
+                schema_registry.register(dataset.segment_paths(manifest)[0])
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        
+        logger.info(f"✅ File saved successfully: {dataset.root} ({file_size / 1024:.2f} KB)")
         
         # Inspect the uploaded file
         inspect_csv_structure()
@@ -481,11 +502,11 @@ async def upload_csv(file: UploadFile = File(...)):
 def check_file():
     """Check if the CSV file exists"""
     logger.info("🔍 Checking if CSV file exists")
-    exists = os.path.exists(CSV_FILE_PATH)
+    stats = dataset.stats()
+    exists = stats["segments"] > 0
     
     if exists:
-        file_size = os.path.getsize(CSV_FILE_PATH)
-        logger.info(f"✅ CSV file exists: {CSV_FILE_PATH} ({file_size / 1024:.2f} KB)")
+        logger.info(f"✅ CSV dataset exists: {dataset.root} ({stats['segments']} segments, {stats['bytes'] / 1024:.2f} KB)")
     else:
         logger.info("❌ CSV file does not exist")
     
@@ -497,11 +518,11 @@ def purge_data():
     logger.info("🗑️ Purging CSV data")
     
     try:
-        if os.path.exists(CSV_FILE_PATH):
-            file_size = os.path.getsize(CSV_FILE_PATH)
-            logger.info(f"Deleting CSV file: {CSV_FILE_PATH} ({file_size / 1024:.2f} KB)")
-            os.remove(CSV_FILE_PATH)
-            logger.info("✅ CSV file deleted successfully")
+        with dataset.begin() as transaction:
+            removed = transaction.purge()
+            schema_registry.clear()
+        if removed:
+            logger.info(f"✅ Deleted {removed} CSV segments successfully")
             return {"success": True, "message": "Données purgées avec succès"}
         else:
             logger.info("No CSV file to purge")
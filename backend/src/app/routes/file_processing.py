@@ -1,7 +1,7 @@
 import os
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Query, Request, status, BackgroundTasks
 from fastapi.responses import JSONResponse
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Union, Awaitable, Callable
 import subprocess
 from pathlib import Path
 import traceback
@@ -13,8 +13,28 @@ import asyncio
 import time
 import uuid
 import tempfile
+import re
+import hashlib
+from collections import deque
 from src.utils.settings import Config
-from src.utils.helpers import join_operator_data
+from src.utils.helpers import detect_encoding, join_operator_data
+from src.utils.chunked_upload import UploadError, upload_sessions
+from src.utils.compressed_input import COMPRESSIONS, compression_of
+from src.utils.coverage import CoverageReport
+from src.utils.dataset_store import Transaction, dataset
+from src.utils.key_index import drop_duplicate_rows, key_index
+from src.utils.schema_registry import schema_registry
+from src.utils.duckdb_ingest import duckdb_join_operator_data, duckdb_project_csv
+from src.utils.ingest_cache import ingest_cache
+from src.utils.mapping_registry import MappingConflictError, hash_file, mapping_registry
+from src.utils.job_queue import job_queue
+from src.utils.job_store import job_store
+from src.utils.parallel_enrichment import parallel_join_operator_data, split_line_ranges
+from src.utils.phone_numbers import DEFAULT_COUNTRY_CODE
+from src.utils.dump_parser import parse_dump_to_csv, parser_workers, read_dump_header
+from src.utils.streaming_ingest import (
+    create_pipe, parse_join_operator_data, pipe_supported, release_pipe, stream_join_operator_data
+)
 import warnings
 from src.utils.helpers import clean_error_message
 import logging
@@ -70,16 +90,8 @@ router = APIRouter(
     responses={404: {"description": "Not found"}}
 )
 
-# Chemin vers le fichier CSV
-CSV_FILE_PATH = "src/data/input.csv"
-# Chemin vers le fichier d'index pour optimiser les appends
-CSV_INDEX_PATH = "src/data/input_index.json"
-
-# Verrou pour éviter les traitements simultanés
-processing_lock = False
-current_job_id = None
-# Dictionnaire pour stocker les informations sur les jobs en cours
-JOBS: Dict[str, Dict[str, Any]] = {}
+# Clé du jeu de données dans la file d'attente (écritures sérialisées)
+DATASET_KEY = str(dataset.root)
 
 def inspect_csv_file(file_path: str, description: str = "CSV file"):
     """Inspect a CSV file and log key information for debugging"""
@@ -128,17 +140,287 @@ def get_executable_command(executable_path: Path) -> list:
     logger.debug(f"Using native executable: {executable_path}")
     return [str(executable_path)]
 
+# "7 lignes ecrites" style row counts printed by the processor
+PROCESSOR_ROWS_PATTERN = re.compile(r"(\d+)\s+lignes")
+
+async def run_processor(
+    cmd: list,
+    input_path: Path,
+    output_path: Path,
+    filename: str,
+    job_id: str = None,
+    output_bytes: Optional[Callable[[], int]] = None,
+    input_ranges: Optional[List[Tuple[int, int]]] = None
+) -> subprocess.CompletedProcess:
+    """
+    Run the native processor without blocking the event loop.
+    
+    stdout and stderr are streamed line by line into the logs. Row counts
+    printed by the processor are reported in the job status, and progress is
+    estimated from the bytes written so far relative to the input size
+    (`output_bytes()` when the output is a pipe, the output file size otherwise).
+    With `input_ranges`, these byte ranges of the input are written to the
+    processor's stdin, which `cmd` then names as its input file.
+    Raises subprocess.TimeoutExpired after Config.PROCESSOR_TIMEOUT seconds.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdin=asyncio.subprocess.PIPE if input_ranges else None,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout_lines = deque(maxlen=200)
+    stderr_lines = deque(maxlen=200)
+    input_size = max(input_path.stat().st_size, 1)
+    
+    async def read_stream(stream, lines, log):
+        async for raw_line in stream:
+            line = raw_line.decode(errors="replace").rstrip()
+            if not line:
+                continue
+            lines.append(line)
+            log(f"Process output: {line}")
+            match = PROCESSOR_ROWS_PATTERN.search(line)
+            if match and job_id:
+                job_store.update(job_id, processor_rows=int(match.group(1)))
+    
+    def bytes_written() -> int:
+        if output_bytes:
+            return output_bytes()
+        return output_path.stat().st_size if output_path.exists() else 0
+    
+    async def feed_input():
+        try:
+            with input_path.open("rb") as f:
+                for start, end in input_ranges:
+                    f.seek(start)
+                    remaining = end - start
+                    while remaining > 0:
+                        chunk = f.read(min(remaining, 1024 * 1024))
+                        if not chunk:
+                            break
+                        process.stdin.write(chunk)
+                        await process.stdin.drain()
+                        remaining -= len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            # The processor exited early, its return code tells why
+            pass
+        finally:
+            process.stdin.close()
+    
+    async def report_progress():
+        # Processor progress maps to 20-60% of the job
+        while True:
+            await asyncio.sleep(Config.PROGRESS_INTERVAL)
+            job = job_store.get(job_id) if job_id else None
+            written = bytes_written()
+            if job and written:
+                rows = job.get("processor_rows")
+                done = f"{rows} lignes" if rows else f"{written / (1024 * 1024):.0f} Mo écrits"
+                job_store.update(
+                    job_id,
+                    progress=20 + int(40 * min(written / input_size, 1.0)),
+                    message=f"Exécution du traitement pour {filename} ({done})..."
+                )
+    
+    progress_task = asyncio.create_task(report_progress())
+    streams = asyncio.gather(
+        read_stream(process.stdout, stdout_lines, logger.info),
+        read_stream(process.stderr, stderr_lines, logger.error),
+        process.wait(),
+        *([feed_input()] if input_ranges else [])
+    )
+    try:
+        await asyncio.wait_for(streams, timeout=Config.PROCESSOR_TIMEOUT)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise subprocess.TimeoutExpired(cmd, Config.PROCESSOR_TIMEOUT)
+    finally:
+        progress_task.cancel()
+        # When the processor is cancelled, nobody else retrieves the readers' outcome
+        streams.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+    
+    return subprocess.CompletedProcess(cmd, process.returncode, "\n".join(stdout_lines), "\n".join(stderr_lines))
+
+async def run_parallel_processor(
+    executable_cmd: list,
+    input_path: Path,
+    output_path: Path,
+    filename: str,
+    job_id: str,
+    workers: int
+) -> subprocess.CompletedProcess:
+    """
+    Run one native processor per line-aligned byte range of the input and
+    concatenate their outputs in order into `output_path`.
+    
+    The lines up to the header are read once and sent ahead of every range, so
+    each processor sees a complete dump. Returns the first failed processor,
+    or a combined CompletedProcess.
+    """
+    try:
+        _, data_start = read_dump_header(input_path)
+    except ValueError:
+        # No header: a single processor reports the error
+        return await run_processor(executable_cmd + [str(input_path), str(output_path)], input_path, output_path, filename, job_id)
+    
+    ranges = split_line_ranges(input_path, workers, data_start)
+    part_paths = [output_path.with_name(f"{output_path.stem}_part{i}.csv") for i in range(len(ranges))]
+    logger.info(f"⚡ Parsing {filename} with {len(ranges)} processors")
+    input_size = max(input_path.stat().st_size, 1)
+    
+    async def report_progress():
+        # Processor progress maps to 20-60% of the job
+        while True:
+            await asyncio.sleep(Config.PROGRESS_INTERVAL)
+            written = sum(path.stat().st_size for path in part_paths if path.exists())
+            job_store.update(
+                job_id,
+                progress=20 + int(40 * min(written / input_size, 1.0)),
+                message=f"Exécution du traitement pour {filename} ({written / (1024 * 1024):.0f} Mo écrits)..."
+            )
+    
+    progress_task = asyncio.create_task(report_progress()) if job_id else None
+    try:
+        results = await asyncio.gather(
+            *(
+                run_processor(
+                    executable_cmd + ["/dev/stdin", str(part_path)],
+                    input_path,
+                    part_path,
+                    filename,
+                    input_ranges=[(0, data_start), (start, end)]
+                )
+                for (start, end), part_path in zip(ranges, part_paths)
+            ),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        for result in results:
+            if result.returncode != 0:
+                return result
+        
+        # Header of the first part, then the rows of every part in input order
+        def concatenate():
+            with output_path.open("wb") as output:
+                for i, part_path in enumerate(part_paths):
+                    with part_path.open("rb") as part:
+                        if i:
+                            part.readline()
+                        shutil.copyfileobj(part, output, 4 * 1024 * 1024)
+        
+        await asyncio.to_thread(concatenate)
+        return subprocess.CompletedProcess(
+            executable_cmd,
+            0,
+            "\n".join(result.stdout for result in results),
+            "\n".join(result.stderr for result in results if result.stderr)
+        )
+    finally:
+        if progress_task:
+            progress_task.cancel()
+        for part_path in part_paths:
+            part_path.unlink(missing_ok=True)
+
+def parse_progress_reporter(job_id: Optional[str], input_path: Path, filename: str) -> Callable[[int], None]:
+    """Progress callback of the in-process parser: bytes parsed map to 20-60% of the job"""
+    input_size = max(input_path.stat().st_size, 1)
+    
+    def report(parsed: int) -> None:
+        if job_id:
+            job_store.update(
+                job_id,
+                progress=20 + int(40 * min(parsed / input_size, 1.0)),
+                message=f"Analyse de {filename} ({parsed / (1024 * 1024):.0f} Mo lus)..."
+            )
+    
+    return report
+
+async def run_streaming_processor(
+    cmd: list,
+    input_path: Path,
+    pipe_path: Path,
+    processed_output_path: Path,
+    filename: str,
+    job_id: str,
+    numbering_plan,
+    coverage: CoverageReport
+) -> tuple:
+    """
+    Run the processor writing into the FIFO `pipe_path` while the operator join
+    reads it and writes the enriched batches to `processed_output_path`.
+    
+    Returns (completed process, rows written), rows being None when the
+    processor failed. A failed join stops the processor and is raised.
+    """
+    source = None
+    
+    def follow_source(reader):
+        nonlocal source
+        source = reader
+    
+    join = asyncio.ensure_future(asyncio.to_thread(
+        stream_join_operator_data,
+        str(pipe_path),
+        str(processed_output_path),
+        numbering_plan,
+        Config.OPERATOR_AS_OF_COLUMN,
+        coverage,
+        None,
+        follow_source
+    ))
+    processor = asyncio.ensure_future(run_processor(
+        cmd, input_path, pipe_path, filename, job_id,
+        output_bytes=lambda: source.bytes_read if source else 0
+    ))
+    
+    def stop_processor(task):
+        # Nobody reads the pipe anymore, the processor would block on it
+        if not task.cancelled() and task.exception() is not None:
+            processor.cancel()
+    
+    join.add_done_callback(stop_processor)
+    try:
+        try:
+            process = await processor
+        except asyncio.CancelledError:
+            if join.done() and not join.cancelled() and join.exception() is not None:
+                raise join.exception()
+            raise
+        finally:
+            # A processor that never opened the pipe leaves the join waiting on it
+            release_pipe(pipe_path)
+            pipe_path.unlink(missing_ok=True)
+        
+        try:
+            return process, await join
+        except Exception:
+            if process.returncode != 0:
+                processed_output_path.unlink(missing_ok=True)
+                return process, None
+            raise
+    except BaseException:
+        processed_output_path.unlink(missing_ok=True)
+        raise
+
 async def process_single_file(
-    file: UploadFile,
-    mapping_path: Path,
+    input_path: Path,
+    filename: str,
+    mapping_id: str,
     upload_dir: Path,
     executable_cmd: list,
     append_mode: bool = False,
     job_id: str = None
 ) -> dict:
-    """Process a single file and return result dictionary"""
+    """Process a single saved input file and return result dictionary"""
     file_result = {
-        'filename': file.filename,
+        'filename': filename,
         'success': False,
         'error': None,
         'processing_time': None,
@@ -147,26 +429,20 @@ async def process_single_file(
     start_time = datetime.now()
     
     logger.info("=" * 80)
-    logger.info(f"🔄 PROCESSING FILE: {file.filename}")
+    logger.info(f"🔄 PROCESSING FILE: {filename}")
     logger.info(f"Mode: {'APPEND' if append_mode else 'NEW'}, Job ID: {job_id}")
     logger.info("=" * 80)
     
     try:
         # Update job status if job_id is provided
-        if job_id and job_id in JOBS:
-            JOBS[job_id]["status"] = "processing"
-            JOBS[job_id]["progress"] = 5
-            JOBS[job_id]["message"] = f"Préparation du fichier {file.filename}..."
-        
-        # Save input file with chunking for large files
-        input_path = upload_dir / Path(file.filename).name
-        logger.info(f"📥 Saving uploaded file to: {input_path}")
+        if job_id:
+            job_store.update(
+                job_id,
+                status="processing",
+                progress=5,
+                message=f"Préparation du fichier {filename}..."
+            )
         
-        if not await save_upload_file_chunked(file, input_path):
-            file_result['error'] = "Could not save input file"
-            logger.error(f"❌ Failed to save input file: {input_path}")
-            return file_result
-
         # Check if the file was saved correctly
         if input_path.exists():
             file_size = input_path.stat().st_size
@@ -177,62 +453,154 @@ async def process_single_file(
             return file_result
 
         # Prepare output path with unique identifier to avoid conflicts
-        output_filename = f'output_{uuid.uuid4().hex}_{Path(file.filename).stem}.csv'
+        output_filename = f'output_{uuid.uuid4().hex}_{Path(filename).stem}.csv'
         output_path = upload_dir / output_filename
         logger.info(f"📤 Output path set to: {output_path}")
         
         # Update job status
-        if job_id and job_id in JOBS:
-            JOBS[job_id]["progress"] = 20
-            JOBS[job_id]["message"] = f"Exécution du traitement pour {file.filename}..."
+        if job_id:
+            job_store.update(
+                job_id,
+                progress=20,
+                message=f"Exécution du traitement pour {filename}..."
+            )
         
-        # Execute processing with increased timeout
         cmd = executable_cmd + [str(input_path), str(output_path)]
-        logger.info(f"🚀 Executing command: {' '.join(cmd)}")
+        processed_output = str(output_path).replace('.csv', '_with_operators.csv')
 
-        try:
-            # Increased timeout to 20 minutes (1200 seconds)
-            logger.info(f"⏱️ Running subprocess with timeout of 1200 seconds")
-            process = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=1200
-            )
+        # Compressed inputs are decompressed on the fly by the in-process parser
+        # and streamed into the join, the uncompressed dump never reaches the disk
+        compression = compression_of(filename)
+        if compression:
+            logger.info(f"🗜️ {filename} is {compression} compressed, decompressing while parsing")
 
-            # Log process output for debugging
-            if process.stdout:
-                logger.info(f"Process stdout: {process.stdout[:100]}..." if len(process.stdout) > 100 else f"Process stdout: {process.stdout}")
-            if process.stderr:
-                logger.error(f"Process stderr: {process.stderr[:100]}..." if len(process.stderr) > 100 else f"Process stderr: {process.stderr}")
-            
-            logger.info(f"Process completed with return code: {process.returncode}")
+        # Detected on samples of the dump, other encodings are transcoded to UTF-8 by the in-process parser
+        encoding = await asyncio.to_thread(detect_encoding, input_path, compression)
+        if encoding != "utf-8":
+            logger.info(f"🔤 {filename} is {encoding} encoded, transcoding to UTF-8 while parsing")
 
-            # Check process results
-            if process.returncode != 0:
-                error_msg = process.stderr or "Unknown processing error"
-                file_result['error'] = clean_error_message(error_msg)
-                logger.error(f"❌ Process failed with error: {file_result['error']}")
-                return file_result
+        # Small enough inputs are streamed from the parser into the join;
+        # large ones go through a file split across workers
+        parallel = Config.ENRICH_WORKERS > 1 and file_size >= Config.PARALLEL_ENRICH_MIN_BYTES and not compression
+        builtin_parser = Config.PARSER_ENGINE == "arrow" or compression is not None or encoding != "utf-8"
+        # Native processors run one per byte range of large inputs (they read stdin)
+        native_workers = parser_workers(file_size) if pipe_supported(executable_cmd) else 1
+        streaming = (
+            Config.INGEST_ENGINE == "pandas"
+            and not parallel
+            and (builtin_parser or (Config.PROCESSOR_PIPE and pipe_supported(executable_cmd) and native_workers == 1))
+        )
 
-            # Check if output file was created
-            if not output_path.exists():
-                file_result['error'] = "Output file was not created by the process"
-                logger.error(f"❌ Output file not found: {output_path}")
-                return file_result
-            
-            # Log output file details
-            output_file_size = output_path.stat().st_size
-            logger.info(f"✅ Output file created successfully. Size: {output_file_size / 1024:.2f} KB")
+        try:
+            coverage = CoverageReport()
+            process = None
+            if builtin_parser:
+                report_parse = parse_progress_reporter(job_id, input_path, filename)
+                try:
+                    if streaming:
+                        numbering_plan = mapping_registry.numbering_plan(mapping_id, Config.OPERATOR_MATCH_MODE)
+                        logger.info(f"🧩 Parsing {filename} in process into the operator join with mapping: {mapping_id}")
+                        rows_processed = await asyncio.to_thread(
+                            parse_join_operator_data,
+                            input_path,
+                            processed_output,
+                            numbering_plan,
+                            Config.OPERATOR_AS_OF_COLUMN,
+                            coverage,
+                            report_parse,
+                            compression,
+                            encoding
+                        )
+                    else:
+                        logger.info(f"🧩 Parsing {filename} in process into {output_path}")
+                        await asyncio.to_thread(parse_dump_to_csv, input_path, output_path, report_parse, compression, encoding)
+                except ValueError as e:
+                    file_result['error'] = f"Parsing failed: {e}"
+                    logger.error(f"❌ Parsing failed: {e}")
+                    Path(processed_output).unlink(missing_ok=True)
+                    output_path.unlink(missing_ok=True)
+                    return file_result
+            else:
+                # Execute processing with increased timeout
+                logger.info(f"🚀 Executing command: {' '.join(cmd)}")
+                logger.info(f"⏱️ Running subprocess with timeout of {Config.PROCESSOR_TIMEOUT} seconds")
+                if streaming:
+                    numbering_plan = mapping_registry.numbering_plan(mapping_id, Config.OPERATOR_MATCH_MODE)
+                    logger.info(f"🚰 Streaming processor output into the operator join with mapping: {mapping_id}")
+                    create_pipe(output_path)
+                    process, rows_processed = await run_streaming_processor(
+                        cmd, input_path, output_path, Path(processed_output), filename, job_id, numbering_plan, coverage
+                    )
+                elif native_workers > 1:
+                    process = await run_parallel_processor(executable_cmd, input_path, output_path, filename, job_id, native_workers)
+                else:
+                    process = await run_processor(cmd, input_path, output_path, filename, job_id)
+                
+                logger.info(f"Process completed with return code: {process.returncode}")
 
-            # Update job status
-            if job_id and job_id in JOBS:
-                JOBS[job_id]["progress"] = 60
-                JOBS[job_id]["message"] = f"Traitement des données pour {file.filename}..."
+                # Check process results
+                if process.returncode != 0:
+                    error_msg = process.stderr or "Unknown processing error"
+                    file_result['error'] = clean_error_message(error_msg)
+                    logger.error(f"❌ Process failed with error: {file_result['error']}")
+                    return file_result
+
+            if streaming:
+                file_result['rows_processed'] = rows_processed
+            else:
+                # Check if output file was created
+                if not output_path.exists():
+                    file_result['error'] = "Output file was not created by the process"
+                    logger.error(f"❌ Output file not found: {output_path}")
+                    return file_result
+                
+                # Log output file details
+                output_file_size = output_path.stat().st_size
+                logger.info(f"✅ Output file created successfully. Size: {output_file_size / 1024:.2f} KB")
+
+                # Update job status
+                if job_id:
+                    job_store.update(
+                        job_id,
+                        progress=60,
+                        message=f"Traitement des données pour {filename}..."
+                    )
 
-            # Process output with mapping
-            logger.info(f"🔄 Joining operator data with mapping file: {mapping_path}")
-            processed_output = join_operator_data(str(output_path), str(mapping_path))
+                # Process output with mapping
+                logger.info(f"🔄 Joining operator data with mapping: {mapping_id}")
+                if Config.INGEST_ENGINE == "duckdb":
+                    # Normalization, lookup and CSV writing run in a single DuckDB query
+                    numbering_plan = mapping_registry.numbering_plan(mapping_id, Config.OPERATOR_MATCH_MODE)
+                    logger.info(f"🦆 Enriching with DuckDB, country codes: {numbering_plan.country_codes}")
+                    processed_output, rows_processed = await asyncio.to_thread(
+                        duckdb_join_operator_data,
+                        str(output_path),
+                        numbering_plan,
+                        Config.OPERATOR_AS_OF_COLUMN,
+                        coverage
+                    )
+                    file_result['rows_processed'] = rows_processed
+                elif Config.ENRICH_WORKERS > 1 and output_file_size >= Config.PARALLEL_ENRICH_MIN_BYTES:
+                    # Large outputs are split into byte ranges enriched by a process pool
+                    logger.info(f"⚡ Enriching with {Config.ENRICH_WORKERS} worker processes")
+                    processed_output = await asyncio.to_thread(
+                        parallel_join_operator_data,
+                        str(output_path),
+                        mapping_id,
+                        Config.OPERATOR_MATCH_MODE,
+                        as_of_column=Config.OPERATOR_AS_OF_COLUMN,
+                        coverage=coverage
+                    )
+                else:
+                    numbering_plan = mapping_registry.numbering_plan(mapping_id, Config.OPERATOR_MATCH_MODE)
+                    logger.info(f"🌍 Numbering plan covers country codes: {numbering_plan.country_codes}")
+                    processed_output = await asyncio.to_thread(
+                        join_operator_data,
+                        str(output_path),
+                        numbering_plan,
+                        as_of_column=Config.OPERATOR_AS_OF_COLUMN,
+                        coverage=coverage
+                    )
             
             if not processed_output:
                 file_result['error'] = "Failed to join operator data - returned None"
@@ -251,10 +619,25 @@ async def process_single_file(
             # Verify processed output file
             inspect_csv_file(processed_output, "Processed output file")
 
+            # Keep the match coverage with the job, every enriched row is counted
+            file_result['coverage'] = coverage.to_dict()
+            file_result.setdefault('rows_processed', coverage.total)
+            logger.info(
+                f"📊 Coverage: {coverage.resolved}/{coverage.total} resolved "
+                f"(by prefix length: {file_result['coverage']['resolved_by_prefix_length']}), "
+                f"{coverage.unresolved} unresolved, {coverage.unsupported_country} foreign, "
+                f"{coverage.malformed} malformed, {coverage.empty} empty"
+            )
+            if job_id:
+                job_store.update(job_id, coverage=file_result['coverage'])
+
             # Update job status
-            if job_id and job_id in JOBS:
-                JOBS[job_id]["progress"] = 80
-                JOBS[job_id]["message"] = f"Finalisation du traitement pour {file.filename}..."
+            if job_id:
+                job_store.update(
+                    job_id,
+                    progress=80,
+                    message=f"Finalisation du traitement pour {filename}..."
+                )
 
             file_result['success'] = True
             file_result['output_file'] = processed_output
@@ -262,8 +645,8 @@ async def process_single_file(
             return file_result
 
         except subprocess.TimeoutExpired:
-            file_result['error'] = "Processing timed out after 20 minutes"
-            logger.error("❌ Subprocess timed out after 20 minutes")
+            file_result['error'] = f"Processing timed out after {Config.PROCESSOR_TIMEOUT // 60} minutes"
+            logger.error(f"❌ Subprocess timed out after {Config.PROCESSOR_TIMEOUT} seconds")
         except subprocess.CalledProcessError as e:
             file_result['error'] = f"Processing failed: {str(e)}"
             logger.error(f"❌ Subprocess failed with CalledProcessError: {e}")
@@ -273,7 +656,7 @@ async def process_single_file(
             traceback.print_exc()
 
     except Exception as e:
-        logger.error(f"❌ Error processing {file.filename}: {str(e)}")
+        logger.error(f"❌ Error processing {filename}: {str(e)}")
         traceback.print_exc()
         file_result['error'] = f"Processing error: {str(e)}"
     finally:
@@ -302,8 +685,11 @@ async def process_single_file(
       
     return file_result
 
-async def save_upload_file_chunked(upload_file: UploadFile, destination: Path) -> bool:
-    """Save uploaded file to destination using chunked approach for large files"""
+async def save_upload_file_chunked(upload_file: UploadFile, destination: Path) -> Optional[str]:
+    """
+    Save uploaded file to destination using chunked approach for large files
+    Returns the SHA-256 of the file, hashed while it is written, or None if it could not be saved
+    """
     logger.info(f"📥 Starting chunked save of file {upload_file.filename}")
     
     try:
@@ -311,6 +697,7 @@ async def save_upload_file_chunked(upload_file: UploadFile, destination: Path) -
         chunk_size = 4 * 1024 * 1024  # 4MB chunks for better performance
         total_size = 0
         chunks_count = 0
+        digest = hashlib.sha256()
         
         with destination.open("wb") as buffer:
             # Read and write in chunks
@@ -319,6 +706,7 @@ async def save_upload_file_chunked(upload_file: UploadFile, destination: Path) -
                 if not chunk:
                     break
                 buffer.write(chunk)
+                digest.update(chunk)
                 total_size += len(chunk)
                 chunks_count += 1
                 # Log progress for large files
@@ -328,184 +716,143 @@ async def save_upload_file_chunked(upload_file: UploadFile, destination: Path) -
                 await asyncio.sleep(0)
         
         logger.info(f"✅ File saved successfully: {destination}. Total size: {total_size / (1024*1024):.2f} MB in {chunks_count} chunks")
-        return True
+        return digest.hexdigest()
     except Exception as e:
         logger.error(f"❌ Error saving file {upload_file.filename}: {str(e)}")
         traceback.print_exc()
-        return False
+        return None
+
+async def register_uploaded_mapping(mapping_file: UploadFile, upload_dir: Path, country_code: int = DEFAULT_COUNTRY_CODE) -> str:
+    """Save an uploaded mapping file, register it for `country_code` and return its mapping id"""
+    mapping_path = upload_dir / f"{uuid.uuid4().hex}_{Path(mapping_file.filename).name}"
+    logger.info(f"📥 Saving mapping file to: {mapping_path}")
+    
+    try:
+        if not await save_upload_file_chunked(mapping_file, mapping_path):
+            logger.error("❌ Failed to save mapping file")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Could not save mapping file"
+            )
+        
+        try:
+            mapping_id, created = await asyncio.to_thread(
+                mapping_registry.register, mapping_path, mapping_file.filename, country_code
+            )
+        except MappingConflictError as e:
+            logger.error(f"❌ Mapping conflict: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=str(e)
+            )
+        except ValueError as e:
+            logger.error(f"❌ Invalid mapping file: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid mapping file: {e}"
+            )
+        
+        logger.info(f"✅ Mapping {'compiled' if created else 'already registered'}: {mapping_id}")
+        return mapping_id
+    finally:
+        if mapping_path.exists():
+            logger.debug(f"🧹 Removing uploaded mapping file: {mapping_path}")
+            mapping_path.unlink()
 
-async def append_to_csv_optimized(processed_df: pd.DataFrame, combined_output_path: Path, job_id: str) -> dict:
+async def append_to_csv_optimized(
+    processed_data: Union[pd.DataFrame, Path],
+    transaction: Transaction,
+    job_id: str,
+    rows_count: Optional[int] = None,
+    content_key: Optional[str] = None
+) -> dict:
     """
-    Optimized function to append data to existing CSV file
-    Uses a temporary file approach to avoid memory issues with large files
+    Append data to the dataset as a new segment
+    Only the new rows are written: existing segments are left untouched
+    The columns are mapped onto the dataset schema first, and the segment is
+    committed in `transaction`, which holds the dataset write lock
+
+    processed_data is either a DataFrame or the path of a processed CSV file,
+    which is then moved in without being loaded into pandas.
+    content_key is the ingest cache key of the input, recorded with the segment.
     """
+    from_file = isinstance(processed_data, Path)
+    if from_file:
+        columns = pd.read_csv(processed_data, nrows=0).columns.tolist()
+    else:
+        processed_df = processed_data
+        columns = processed_df.columns.tolist()
+
     logger.info("=" * 80)
-    logger.info(f"🔄 APPEND OPERATION: {combined_output_path.name}")
-    logger.info(f"Data to append: {len(processed_df)} rows, {len(processed_df.columns)} columns")
+    logger.info(f"🔄 APPEND OPERATION: {dataset.root}")
+    logger.info(f"Data to append: {'file ' + processed_data.name if from_file else str(len(processed_df)) + ' rows'}, {len(columns)} columns")
     logger.info("=" * 80)
 
-    if len(processed_df.columns) > 30:
-        # Define the target 28-column schema
-        target_columns = [
-            "FIRST_NAME", "BIRTH_NAME", "MIDDLE_NAME", "LAST_NAME", "SEX", "BIRTH_DATE", 
-            "COGVILLE", "COGPAYS", "BIRTH_CITY", "BIRTH_COUNTRY", "EMAIL", "CREATED_DATE", 
-            "ARCHIVED_DATE", "UUID", "ID_CCU", "SUBSCRIPTION_CHANNEL", "VERIFICATION_MODE", 
-            "VERIFICATION_DATE", "USER_STATUS", "2FA_STATUS", "TELEPHONE", "INDICATIF", 
-            "DATE_MODF_TEL", "Numero Pi", "EXPIRATION", "EMISSION", "TYPE", "Operateur"
-        ]
-
-        # Add missing columns with NaN
-        for col in target_columns:
-            if col not in processed_df.columns:
-                processed_df[col] = pd.NA
-        # Reorder columns to match the target schema
-        processed_df = processed_df[target_columns]
+    # Create a temporary file for the new segment, next to the segments it joins
+    dataset.root.mkdir(parents=True, exist_ok=True)
+    temp_file = dataset.root / f".append_{uuid.uuid4().hex}.csv"
+    projected_file = temp_file.with_suffix(".projected.csv")
     try:
         # Update job status
-        if job_id in JOBS:
-            JOBS[job_id]["progress"] = 85
-            JOBS[job_id]["message"] = "Sauvegarde des résultats..."
-        
-        # Create a temporary file for the new data
-        temp_dir = Path(tempfile.gettempdir())
-        temp_file = temp_dir / f"temp_append_{uuid.uuid4().hex}.csv"
-        logger.info(f"📄 Created temporary file for append: {temp_file}")
-        
-        # Save the processed data to the temporary file
-        processed_df.to_csv(temp_file, index=False)
-        logger.info(f"✅ Saved processed data to temporary file. Size: {temp_file.stat().st_size / 1024:.2f} KB")
-        
-        # If the combined output file doesn't exist, just rename the temp file
-        if not combined_output_path.exists():
-            logger.info(f"📄 Target file doesn't exist, creating new file: {combined_output_path}")
-            # Ensure the directory exists
-            combined_output_path.parent.mkdir(exist_ok=True, parents=True)
-            logger.info(f"📤 Moving temporary file to final destination")
-            shutil.move(str(temp_file), str(combined_output_path))
-            logger.info(f"✅ Created new file with {len(processed_df)} rows")
-            
-            # Verify the newly created file
-            inspect_csv_file(str(combined_output_path), "Newly created CSV file")
-            
-            return {
-                "success": True,
-                "rows_added": len(processed_df),
-                "total_rows": len(processed_df)
-            }
-        
-        # For append operations, use a more efficient approach
-        # Create a lock file to prevent concurrent access
-        lock_file = combined_output_path.with_suffix('.lock')
-        logger.info(f"🔒 Using lock file: {lock_file}")
+        if job_id:
+            job_store.update(
+                job_id,
+                progress=85,
+                message="Sauvegarde des résultats..."
+            )
         
-        # Wait if another process is using the file
-        max_wait = 60  # seconds
-        wait_time = 0
-        while lock_file.exists() and wait_time < max_wait:
-            logger.debug(f"Lock file exists, waiting... ({wait_time}s)")
-            await asyncio.sleep(1)
-            wait_time += 1
+        # Save the processed data as the new segment
+        if not from_file:
+            processed_df.to_csv(temp_file, index=False)
+            rows_count = len(processed_df)
+        else:
+            shutil.move(str(processed_data), str(temp_file))
         
-        if lock_file.exists():
-            logger.error(f"❌ Lock file still exists after {max_wait}s, cannot proceed")
-            raise Exception(f"Lock file still exists after {max_wait}s, cannot proceed")
+        # Map the columns onto the dataset schema (order, aliases, missing and unknown columns)
+        if schema_registry.schema() is None:
+            # Dataset saved before the schema registry: its first segment defines the schema
+            await asyncio.to_thread(schema_registry.register, dataset.segment_paths(transaction.manifest)[0])
+        schema_columns, sources, schema = await asyncio.to_thread(schema_registry.reconcile, temp_file)
+        if [sources.get(column) for column in schema_columns] != columns:
+            logger.info(f"🔄 Mapping {len(columns)} columns onto the {len(schema_columns)} columns of the schema")
+            rows_count = await asyncio.to_thread(duckdb_project_csv, temp_file, projected_file, schema_columns, sources)
+            os.replace(projected_file, temp_file)
+        logger.info(f"✅ Saved new segment: {temp_file.stat().st_size / 1024:.2f} KB")
         
-        # Create the lock
-        with lock_file.open('w') as f:
-            f.write(f"{job_id} - {datetime.now().isoformat()}")
-        logger.info(f"🔒 Created lock file")
+        # Drop the rows whose key is already in the dataset (or repeated in the batch)
+        duplicates, new_keys = 0, []
+        if key_index.enabled:
+            await asyncio.to_thread(key_index.sync, transaction.manifest, dataset.segment_dir)
+            duplicates, new_keys = await asyncio.to_thread(drop_duplicate_rows, temp_file, key_index)
+            if rows_count is not None:
+                rows_count -= duplicates
+            logger.info(f"🔍 {duplicates} duplicate {key_index.key_column} found in the new rows")
+        duplicates_info = {"duplicates_found": duplicates, "duplicates_removed": duplicates}
         
-        try:
-            # Log the existing file details
-            existing_file_size = combined_output_path.stat().st_size
-            logger.info(f"📄 Existing file size: {existing_file_size / 1024:.2f} KB")
-            
-            # Verify the existing file
-            inspect_csv_file(str(combined_output_path), "Existing CSV file before append")
-            
-            # Instead of reading the entire file into memory, we'll use a streaming approach
-            # Create a new file that will contain both the existing data and the new data
-            final_output = combined_output_path.with_suffix('.new.csv')
-            logger.info(f"📄 Creating new combined file: {final_output}")
-            
-            # First, copy the header from the processed data
-            with open(temp_file, 'r') as src, open(final_output, 'w') as dest:
-                # Copy the header
-                header = src.readline()
-                dest.write(header)
-                logger.info(f"✅ Wrote header to new file")
-            
-            # Now append the existing data (skipping the header)
-            logger.info(f"🔄 Appending existing data from {combined_output_path.name}")
-            existing_rows = 0
-            with open(combined_output_path, 'r') as src, open(final_output, 'a') as dest:
-                # Skip the header
-                src.readline()
-                # Copy the rest line by line
-                for line in src:
-                    dest.write(line)
-                    existing_rows += 1
-                    # Log progress for large files
-                    if existing_rows % 100000 == 0:
-                        logger.info(f"Progress: Copied {existing_rows} existing rows")
-            
-            logger.info(f"✅ Appended {existing_rows} existing rows")
-            
-            # Now append the new data (skipping the header)
-            logger.info(f"🔄 Appending new data")
+        if rows_count == 0:
+            # Nothing new: no empty segment is added
+            manifest = transaction.manifest
             new_rows = 0
-            with open(temp_file, 'r') as src, open(final_output, 'a') as dest:
-                # Skip the header
-                src.readline()
-                # Copy the rest line by line
-                for line in src:
-                    dest.write(line)
-                    new_rows += 1
-                    # Log progress for large files
-                    if new_rows % 100000 == 0:
-                        logger.info(f"Progress: Copied {new_rows} new rows")
-            
-            logger.info(f"✅ Appended {new_rows} new rows")
-            
-            # Count the total number of rows (approximate)
-            total_rows = existing_rows + new_rows
-            logger.info(f"📊 Total rows in combined file: {total_rows}")
-            
-            # Replace the original file with the new one
-            logger.info(f"🔄 Replacing original file with combined file")
-            shutil.move(str(final_output), str(combined_output_path))
-            logger.info(f"✅ Successfully replaced original file with combined file")
-            
-            # Verify the final file
-            final_file_size = combined_output_path.stat().st_size
-            logger.info(f"📄 Final file size: {final_file_size / 1024:.2f} KB")
-            
-            # Verify the final combined file
-            inspect_csv_file(str(combined_output_path), "Final combined CSV file")
-            
-            logger.info("=" * 80)
-            logger.info(f"APPEND OPERATION COMPLETED SUCCESSFULLY ✅")
-            logger.info(f"Added {new_rows} rows to existing {existing_rows} rows")
-            logger.info("=" * 80)
-            
-            return {
-                "success": True,
-                "rows_added": new_rows,
-                "total_rows": total_rows
-            }
-        finally:
-            # Clean up
-            logger.info("🧹 Cleaning up temporary files")
-            if lock_file.exists():
-                logger.info(f"🔓 Removing lock file")
-                lock_file.unlink()
-            if temp_file.exists():
-                logger.info(f"🧹 Removing temporary file")
-                temp_file.unlink()
-            if 'final_output' in locals() and final_output.exists():
-                logger.info(f"🧹 Removing temporary output file")
-                final_output.unlink()
-    
+        else:
+            manifest = await asyncio.to_thread(transaction.append, temp_file, rows_count, job_id, content_key)
+            new_rows = manifest["segments"][-1]["rows"]
+            # The schema changes made for the batch hold once it is committed
+            await asyncio.to_thread(schema_registry.save, schema)
+            if key_index.enabled:
+                await asyncio.to_thread(key_index.add, new_keys, manifest["segments"][-1]["file"])
+        total_rows = sum(segment["rows"] for segment in manifest["segments"])
+        
+        logger.info("=" * 80)
+        logger.info(f"APPEND OPERATION COMPLETED SUCCESSFULLY ✅")
+        logger.info(f"Added {new_rows} rows ({len(manifest['segments'])} segments, {total_rows} rows)")
+        logger.info("=" * 80)
+        
+        return {
+            "success": True,
+            "rows_added": new_rows,
+            "total_rows": total_rows,
+            "duplicates_info": duplicates_info
+        }
     except Exception as e:
         logger.error(f"❌ Error in append operation: {e}")
         traceback.print_exc()
@@ -516,50 +863,246 @@ async def append_to_csv_optimized(processed_df: pd.DataFrame, combined_output_pa
             "success": False,
             "error": str(e)
         }
+    finally:
+        for path in (temp_file, projected_file):
+            if path.exists():
+                logger.info(f"🧹 Removing temporary file {path.name}")
+                path.unlink()
 
-@router.post("/process_files", response_model=dict)
-async def process_files_endpoint(
-    dataFiles: UploadFile = File(...),
-    mappingFile: UploadFile = File(...),
-    appendMode: Optional[str] = Form("false"),
-    background_tasks: BackgroundTasks = None
-):
-    """Endpoint for processing a single data file with a mapping file and appending to existing data"""
-    global processing_lock, current_job_id
-    
+async def save_to_dataset(
+    processed_data: Path,
+    transaction: Transaction,
+    job_id: str,
+    rows_processed: int,
+    append_mode: bool,
+    content_key: Optional[str] = None
+) -> Tuple[int, dict, bool]:
+    """
+    Commit a processed file to the dataset in `transaction`: appended as a new
+    segment, or replacing the dataset. Nothing is written when the dataset
+    already holds the segment made from the same input (`content_key`).
+    Returns (total rows, duplicates info, already ingested).
+    """
+    segments = transaction.manifest["segments"]
+    if content_key and transaction.holds(content_key) and (append_mode or len(segments) == 1):
+        total_rows = sum(segment["rows"] for segment in segments)
+        logger.info(f"♻️ Input already ingested in {dataset.root}, nothing to write ({total_rows} rows)")
+        return total_rows, {"duplicates_found": 0, "duplicates_removed": 0}, True
+
+    # New rows are appended as a new segment of the dataset
+    if append_mode and segments:
+        logger.info(f"🔄 Appending to existing dataset: {dataset.root}")
+        append_result = await append_to_csv_optimized(processed_data, transaction, job_id, rows_processed, content_key)
+        
+        if not append_result["success"]:
+            error_msg = append_result.get('error', 'Unknown error')
+            logger.error(f"❌ Failed to append data: {error_msg}")
+            raise Exception(f"Failed to append data: {error_msg}")
+        
+        total_rows = append_result["total_rows"]
+        logger.info(f"✅ Append successful. Total rows: {total_rows}")
+        return total_rows, append_result["duplicates_info"], False
+
+    # If not appending or the dataset is empty, the processed data replaces it
+    logger.info(f"📄 Saving processed data as new dataset: {dataset.root}")
+    manifest = await asyncio.to_thread(transaction.replace, processed_data, rows_processed, job_id, content_key)
+    # The columns of the new data become the schema of the dataset
+    await asyncio.to_thread(schema_registry.register, dataset.segment_paths(manifest)[0])
+    if key_index.enabled:
+        # Index the keys of the new data for the next appends
+        await asyncio.to_thread(key_index.sync, manifest, dataset.segment_dir)
+    logger.info(f"✅ Saved new dataset with {rows_processed} rows")
+    return rows_processed, {"duplicates_found": 0, "duplicates_removed": 0}, False
+
+async def run_ingest_job(
+    job_id: str,
+    input_path: Path,
+    filename: str,
+    mapping_id: str,
+    upload_dir: Path,
+    executable_cmd: list,
+    append_mode: bool,
+    input_sha256: Optional[str] = None
+) -> dict:
+    """
+    Run an ingest job on a worker of the job queue: process and enrich the
+    input file, then save it to the dataset during the job's dataset turn.
+    The processed output of an input already processed with the same mappings
+    (`input_sha256`, SHA-256 of the input file) is taken from the ingest cache.
+    """
     start_time = datetime.now()
-    logger.info("=" * 80)
-    logger.info(f"🚀 PROCESS FILES ENDPOINT CALLED")
-    logger.info(f"Data file: {dataFiles.filename}, Mapping file: {mappingFile.filename}, Append mode: {appendMode}")
-    logger.info("=" * 80)
 
-    # Vérifier si un traitement est déjà en cours
-    if processing_lock:
-        logger.warning(f"⚠️ Processing already in progress: job_id={current_job_id}")
-        return JSONResponse(
-            status_code=409,
-            content={"success": False, "message": "Un traitement est déjà en cours. Veuillez réessayer plus tard."}
-        )
+    # Update job status
+    job_store.update(
+        job_id,
+        status="processing",
+        progress=10,
+        message="Traitement du fichier...",
+        position=None
+    )
 
-    # Générer un ID unique pour ce job
-    job_id = f"job_{int(time.time())}_{uuid.uuid4().hex[:8]}"
-    current_job_id = job_id
-    processing_lock = True
-    logger.info(f"🆔 Created new job with ID: {job_id}")
+    # Same input, mappings and pipeline: the cached output skips parsing and enrichment
+    content_key = ingest_cache.key(input_sha256, mapping_registry.plan_mappings(mapping_id)) if input_sha256 else None
+    cached = None
+    if content_key and ingest_cache.enabled:
+        cached_output = upload_dir / f"output_{uuid.uuid4().hex}_{Path(filename).stem}_with_operators.csv"
+        cached = await asyncio.to_thread(ingest_cache.get, content_key, cached_output)
+
+    if cached:
+        logger.info(f"♻️ {filename} already processed with these mappings, reusing cached output {content_key}")
+        job_store.update(
+            job_id,
+            progress=80,
+            message=f"Fichier déjà traité, réutilisation du résultat pour {filename}...",
+            coverage=cached["coverage"]
+        )
+        result = {
+            'success': True,
+            'output_file': str(cached_output),
+            'rows_processed': cached['rows_processed'],
+            'coverage': cached['coverage']
+        }
+    else:
+        # Process the file
+        logger.info(f"🔄 Starting file processing for {filename}")
+        result = await process_single_file(
+            input_path=input_path,
+            filename=filename,
+            mapping_id=mapping_id,
+            upload_dir=upload_dir,
+            executable_cmd=executable_cmd,
+            append_mode=append_mode,
+            job_id=job_id
+        )
     
-    # Initialiser le statut du job
-    JOBS[job_id] = {
-        "status": "queued",
-        "progress": 0,
-        "message": "En attente de traitement...",
-        "createdAt": time.time(),
-        "file": dataFiles.filename
-    }
+    logger.info(f"Result: {'SUCCESS ✅' if result['success'] else 'FAILED ❌'}")
+
+    if not result['success']:
+        logger.error(f"❌ File processing failed: {result['error']}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process file: {result['error']}"
+        )
+
+    # Handle the processed output
+    try:
+        # Path to the processed output file
+        processed_output_path = Path(result['output_file'])
+        logger.info(f"📄 Processed output path: {processed_output_path}")
+        
+        # Check if processed output file exists
+        if not processed_output_path.exists():
+            raise Exception(f"Processed output file not found: {processed_output_path}")
+        
+        # The processed file is saved as is, without loading it into pandas
+        rows_processed = result['rows_processed']
+        processed_data = processed_output_path
+        logger.info(f"✅ Processed file has {rows_processed} rows")
+
+        if content_key and not cached:
+            # Kept for a retry or a resubmission of the same input, the job goes on without it otherwise
+            try:
+                await asyncio.to_thread(ingest_cache.put, content_key, processed_output_path, {
+                    "filename": filename,
+                    "input_sha256": input_sha256,
+                    "mapping_id": mapping_id,
+                    "rows_processed": rows_processed,
+                    "coverage": result.get('coverage')
+                })
+            except Exception as e:
+                logger.warning(f"⚠️ Could not cache the processed output of {filename}: {e}")
+        
+        # Writes to the dataset are applied one job at a time
+        job_store.update(job_id, message="En attente de l'écriture des données...")
+        async with job_queue.dataset_turn(job_id, DATASET_KEY):
+            # Write lock shared with the other server processes, released even if the job fails
+            transaction = await asyncio.to_thread(dataset.begin)
+            try:
+                logger.info(f"🔒 Job {job_id} is writing {dataset.root} (version {transaction.manifest['version']})")
+                total_rows, duplicates_info, already_ingested = await save_to_dataset(
+                    processed_data, transaction, job_id, rows_processed, append_mode, content_key
+                )
+            finally:
+                transaction.close()
+        
+        # Update job status
+        job_store.update(
+            job_id,
+            progress=95,
+            message="Nettoyage des fichiers temporaires..."
+        )
+        
+        # Clean up temporary files
+        try:
+            # Clean up the processed output file
+            if processed_output_path.exists():
+                logger.info(f"🧹 Removing processed output file")
+                processed_output_path.unlink()
+        except Exception as e:
+            logger.error(f"❌ Error cleaning up temporary files: {e}")
+        
+        # Update job status
+        job_store.update(
+            job_id,
+            status="completed",
+            progress=100,
+            message="Fichier déjà importé, aucune donnée ajoutée" if already_ingested else "Traitement terminé avec succès"
+        )
+
+        logger.info("=" * 80)
+        logger.info(f"JOB {job_id} COMPLETED SUCCESSFULLY ✅")
+        logger.info(f"Job processing time: {datetime.now() - start_time}")
+        logger.info("=" * 80)
+
+        return {
+            "success": True,
+            "message": "File already ingested" if already_ingested else f"File processed and {'added to' if append_mode else 'saved as'} the dataset",
+            "rows_processed": rows_processed,
+            "total_rows": total_rows,
+            "duplicates_info": duplicates_info,
+            "already_ingested": already_ingested,
+            "cached": bool(cached),
+            "coverage": result.get('coverage'),
+            "mapping_id": mapping_id,
+            "job_id": job_id
+        }
+        
+    except Exception as e:
+        logger.error(f"❌ Error handling processed output: {e}")
+        traceback.print_exc()
+        
+        # Clean up the processed output left by the failed job
+        if 'processed_output_path' in locals() and processed_output_path.exists():
+            processed_output_path.unlink()
+        
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error handling processed output: {str(e)}"
+        )
+
+async def execute_ingest_job(job_id: str, input_path: Path, *args) -> dict:
+    """Run an ingest job and record its outcome in the job store, whether or not a client is waiting for it"""
+    try:
+        response = await run_ingest_job(job_id, input_path, *args)
+        job_store.update(job_id, result=response)
+        return response
+    except Exception as e:
+        error = e.detail if isinstance(e, HTTPException) else str(e)
+        job_store.update(job_id, status="failed", error=error)
+        logger.error(f"❌ Job {job_id} failed: {error}")
+        raise
+    finally:
+        if input_path.exists():
+            input_path.unlink()
 
+def is_data_file(filename: str) -> bool:
+    """Data files are .txt dumps, possibly compressed (.gz, .zst, .zip)"""
+    return filename.lower().endswith('.txt') or compression_of(filename) is not None
+
+def validate_ingest_request(filename: str, mappingFile: Optional[UploadFile], mappingId: Optional[str]) -> None:
+    """Check the data file name and the mapping of an ingest request, raises HTTPException"""
     # Validate input files
-    if not dataFiles:
-        processing_lock = False
-        current_job_id = None
+    if not filename:
         logger.error("❌ No data file provided")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -567,212 +1110,145 @@ async def process_files_endpoint(
         )
 
     # Validate file extensions
-    if not dataFiles.filename.lower().endswith('.txt'):
-        processing_lock = False
-        current_job_id = None
-        logger.error(f"❌ Invalid file format: {dataFiles.filename}")
+    if not is_data_file(filename):
+        logger.error(f"❌ Invalid file format: {filename}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f'Invalid file format for {dataFiles.filename}. Only .txt files allowed.'
+            detail=f'Invalid file format for {filename}. Only .txt files, possibly compressed ({", ".join(COMPRESSIONS)}), allowed.'
         )
 
-    if not mappingFile.filename.lower().endswith('.csv'):
-        processing_lock = False
-        current_job_id = None
+    if not mappingFile and not mappingId:
+        logger.error("❌ No mapping file or mapping id provided")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No mapping file or mapping id provided"
+        )
+
+    if mappingFile and not mappingFile.filename.lower().endswith('.csv'):
         logger.error(f"❌ Invalid mapping file format: {mappingFile.filename}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail='Invalid mapping file format. Only .csv files allowed.'
         )
 
-    # Convert appendMode string to boolean
-    append_mode = appendMode.lower() == "true"
-    logger.info(f"Mode: {'APPEND' if append_mode else 'NEW'}")
-
+async def queue_ingest_job(
+    filename: str,
+    save_input: Callable[[Path], Awaitable[Optional[str]]],
+    mappingFile: Optional[UploadFile],
+    mappingId: Optional[str],
+    append_mode: bool,
+    async_mode: bool,
+    priority: int,
+    start_time: datetime
+):
+    """
+    Create an ingest job, save its input with `save_input(input_path)`, which
+    returns the SHA-256 of the input, and queue it. Returns the job result, or
+    202 at once in async mode.
+    """
     # Setup working directory
     upload_dir = Path(Config.UPLOAD_FOLDER)
     upload_dir.mkdir(exist_ok=True, parents=True)
     logger.info(f"📁 Using upload directory: {upload_dir}")
     
-    # Verify executable
+    # Verify executable (only needed by the native parser)
     c_executable = Path(Config.C_EXECUTABLE_PATH)
     logger.info(f"🔍 Checking executable: {c_executable}")
-    if not c_executable.exists():
-        processing_lock = False
-        current_job_id = None
+    if Config.PARSER_ENGINE == "native" and not c_executable.exists():
         logger.error(f"❌ Executable not found: {c_executable}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Processing service unavailable"
         )
-    else:
+    elif c_executable.exists():
         logger.info(f"✅ Executable found: {c_executable}")
 
+    # Générer un ID unique pour ce job
+    job_id = f"job_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+    logger.info(f"🆔 Created new job with ID: {job_id}")
+    
+    # Initialiser le statut du job
+    job_store.create(
+        job_id,
+        status="queued",
+        progress=0,
+        message="En attente de traitement...",
+        file=filename,
+        priority=priority
+    )
+
+    input_path = upload_dir / f"input_{job_id}_{Path(filename).name}"
     try:
-        # Save mapping file with chunking for large files
-        mapping_path = upload_dir / f"{uuid.uuid4().hex}_{Path(mappingFile.filename).name}"
-        logger.info(f"📥 Saving mapping file to: {mapping_path}")
-        
-        if not await save_upload_file_chunked(mappingFile, mapping_path):
-            processing_lock = False
-            current_job_id = None
-            logger.error("❌ Failed to save mapping file")
+        if mappingFile:
+            # Register the uploaded mapping, compiled only if its content is new
+            mapping_id = await register_uploaded_mapping(mappingFile, upload_dir)
+        elif mapping_registry.exists(mappingId):
+            mapping_id = mappingId
+            logger.info(f"✅ Using registered mapping: {mapping_id}")
+        else:
+            logger.error(f"❌ Unknown mapping id: {mappingId}")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Unknown mapping id: {mappingId}"
+            )
+
+        # Save the upload now: it overlaps with the jobs already running
+        logger.info(f"📥 Saving uploaded file to: {input_path}")
+        input_sha256 = await save_input(input_path)
+        if not input_sha256:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Could not save mapping file"
+                detail="Failed to process file: Could not save input file"
             )
-        
-        # Verify the mapping file
-        inspect_csv_file(str(mapping_path), "Mapping file")
 
         # Get appropriate command for the environment
         executable_cmd = get_executable_command(c_executable)
         logger.info(f"🔧 Using command: {' '.join(executable_cmd)}")
 
-        # Update job status
-        JOBS[job_id]["status"] = "processing"
-        JOBS[job_id]["progress"] = 10
-        JOBS[job_id]["message"] = "Traitement du fichier..."
-
-        # Process the file
-        logger.info(f"🔄 Starting file processing for {dataFiles.filename}")
-        result = await process_single_file(
-            file=dataFiles,
-            mapping_path=mapping_path,
-            upload_dir=upload_dir,
-            executable_cmd=executable_cmd,
-            append_mode=append_mode,
-            job_id=job_id
+        # Queue the job, writes to input.csv are serialized by the queue
+        future = job_queue.submit(
+            job_id,
+            lambda: execute_ingest_job(
+                job_id, input_path, filename, mapping_id, upload_dir, executable_cmd, append_mode, input_sha256
+            ),
+            priority=priority,
+            datasets=(DATASET_KEY,)
         )
+        position = job_queue.position(job_id)
+        job_store.update(job_id, position=position)
         
-        logger.info(f"Result: {'SUCCESS ✅' if result['success'] else 'FAILED ❌'}")
-
-        if not result['success']:
-            processing_lock = False
-            current_job_id = None
-            logger.error(f"❌ File processing failed: {result['error']}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to process file: {result['error']}"
+        if async_mode:
+            # The job outcome is recorded in the job store, nobody awaits the future
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            logger.info(f"📨 Job {job_id} accepted, processing in background")
+            return JSONResponse(
+                status_code=status.HTTP_202_ACCEPTED,
+                content={
+                    "success": True,
+                    "message": "Fichier reçu, traitement en arrière-plan",
+                    "job_id": job_id,
+                    "status": "queued",
+                    "position": position,
+                    "mapping_id": mapping_id
+                }
             )
+        
+        response = await asyncio.shield(future)
 
-        # Handle the processed output
-        try:
-            # Path to the combined output file
-            combined_output_path = Path(CSV_FILE_PATH)
-            logger.info(f"📄 Combined output path: {combined_output_path}")
-            
-            # Path to the processed output file
-            processed_output_path = Path(result['output_file'])
-            logger.info(f"📄 Processed output path: {processed_output_path}")
-            
-            # Check if processed output file exists
-            if not processed_output_path.exists():
-                raise Exception(f"Processed output file not found: {processed_output_path}")
-            
-            # Read the processed data
-            logger.info(f"📊 Reading processed data")
-            processed_df = pd.read_csv(processed_output_path, low_memory=False)
-            logger.info(f"✅ Processed file has {len(processed_df)} rows and {len(processed_df.columns)} columns")
-            
-            # Use the optimized append function
-            if append_mode and combined_output_path.exists():
-                logger.info(f"🔄 Appending to existing file: {combined_output_path}")
-                append_result = await append_to_csv_optimized(processed_df, combined_output_path, job_id)
-                
-                if not append_result["success"]:
-                    error_msg = append_result.get('error', 'Unknown error')
-                    logger.error(f"❌ Failed to append data: {error_msg}")
-                    raise Exception(f"Failed to append data: {error_msg}")
-                
-                total_rows = append_result["total_rows"]
-                logger.info(f"✅ Append successful. Total rows: {total_rows}")
-                duplicates_info = {"duplicates_found": 0, "duplicates_removed": 0}
-            else:
-                # If not appending or the file doesn't exist, just save the processed data
-                logger.info(f"📄 Saving processed data as new file: {combined_output_path}")
-                combined_output_path.parent.mkdir(exist_ok=True, parents=True)
-                processed_df.to_csv(combined_output_path, index=False)
-                total_rows = len(processed_df)
-                logger.info(f"✅ Saved new file with {total_rows} rows")
-                duplicates_info = {"duplicates_found": 0, "duplicates_removed": 0}
-                
-                # Verify the newly created file
-                inspect_csv_file(str(combined_output_path), "Newly created CSV file")
-            
-            # Update job status
-            JOBS[job_id]["progress"] = 95
-            JOBS[job_id]["message"] = "Nettoyage des fichiers temporaires..."
-            
-            # Clean up temporary files
-            try:
-                # Clean up the mapping file
-                if mapping_path.exists():
-                    logger.info(f"🧹 Removing mapping file")
-                    mapping_path.unlink()
-                
-                # Clean up the processed output file
-                if processed_output_path.exists():
-                    logger.info(f"🧹 Removing processed output file")
-                    processed_output_path.unlink()
-            except Exception as e:
-                logger.error(f"❌ Error cleaning up temporary files: {e}")
-            
-            # Update job status
-            JOBS[job_id]["status"] = "completed"
-            JOBS[job_id]["progress"] = 100
-            JOBS[job_id]["message"] = "Traitement terminé avec succès"
-
-            # Release the lock
-            processing_lock = False
-            current_job_id = None
-            logger.info(f"🔓 Released processing lock. Job {job_id} completed successfully")
-
-            logger.info("=" * 80)
-            logger.info(f"PROCESS FILES ENDPOINT COMPLETED SUCCESSFULLY ✅")
-            logger.info(f"Total processing time: {datetime.now() - start_time}")
-            logger.info("=" * 80)
-
-            return {
-                "success": True,
-                "message": f"File processed and {'added to' if append_mode else 'saved as'} input.csv",
-                "rows_processed": len(processed_df),
-                "total_rows": total_rows,
-                "duplicates_info": duplicates_info,
-                "job_id": job_id
-            }
-            
-        except Exception as e:
-            logger.error(f"❌ Error handling processed output: {e}")
-            traceback.print_exc()
-            
-            # Update job status
-            JOBS[job_id]["status"] = "failed"
-            JOBS[job_id]["error"] = str(e)
-            
-            # Release the lock
-            processing_lock = False
-            current_job_id = None
-            logger.info(f"🔓 Released processing lock due to error. Job {job_id} failed")
-            
-            logger.info("=" * 80)
-            logger.info(f"PROCESS FILES ENDPOINT FAILED ❌")
-            logger.info("=" * 80)
-            
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Error handling processed output: {str(e)}"
-            )
+        logger.info("=" * 80)
+        logger.info(f"PROCESS FILES ENDPOINT COMPLETED SUCCESSFULLY ✅")
+        logger.info(f"Total processing time: {datetime.now() - start_time}")
+        logger.info("=" * 80)
+        return response
     except Exception as e:
-        # Update job status
-        if job_id in JOBS:
-            JOBS[job_id]["status"] = "failed"
-            JOBS[job_id]["error"] = str(e)
+        # Update job status (jobs that ran have already recorded their failure)
+        if job_store.get(job_id)["status"] != "failed":
+            job_store.update(job_id, error=e.detail if isinstance(e, HTTPException) else str(e))
+        job_store.update(job_id, status="failed", position=None)
+        logger.info(f"❌ Job {job_id} failed")
         
-        # Release the lock
-        processing_lock = False
-        current_job_id = None
-        logger.info(f"🔓 Released processing lock due to error. Job {job_id} failed")
+        if input_path.exists():
+            input_path.unlink()
         
         logger.error(f"❌ Error in process_files_endpoint: {e}")
         traceback.print_exc()
@@ -783,51 +1259,250 @@ async def process_files_endpoint(
         
         raise
 
+@router.post("/process_files", response_model=dict)
+async def process_files_endpoint(
+    dataFiles: UploadFile = File(...),
+    mappingFile: Optional[UploadFile] = File(None),
+    mappingId: Optional[str] = Form(None),
+    appendMode: Optional[str] = Form("false"),
+    asyncMode: Optional[str] = Form("false"),
+    priority: int = Form(0)
+):
+    """
+    Endpoint for processing a single data file with a mapping and appending to existing data.
+    The mapping is either uploaded as mappingFile or referenced by the mappingId of a registered mapping.
+    The data file may be compressed (.gz, .zst or a .zip holding the dump), it is decompressed while parsed.
+    The job is queued (higher priority first, FIFO otherwise) and run by the ingest worker pool.
+    With asyncMode=true the upload is saved, the job is queued and 202 is returned
+    immediately with the job_id to follow on /api/job-status/{job_id}.
+    """
+    start_time = datetime.now()
+    logger.info("=" * 80)
+    logger.info(f"🚀 PROCESS FILES ENDPOINT CALLED")
+    logger.info(f"Data file: {dataFiles.filename}, Mapping: {mappingFile.filename if mappingFile else mappingId}, Append mode: {appendMode}, Priority: {priority}")
+    logger.info("=" * 80)
+
+    validate_ingest_request(dataFiles.filename, mappingFile, mappingId)
+
+    # Convert appendMode and asyncMode strings to booleans
+    append_mode = appendMode.lower() == "true"
+    async_mode = asyncMode.lower() == "true"
+    logger.info(f"Mode: {'APPEND' if append_mode else 'NEW'}{' (ASYNC)' if async_mode else ''}")
+
+    return await queue_ingest_job(
+        dataFiles.filename,
+        lambda input_path: save_upload_file_chunked(dataFiles, input_path),
+        mappingFile,
+        mappingId,
+        append_mode,
+        async_mode,
+        priority,
+        start_time
+    )
+
+def get_upload_status(upload_id: str) -> dict:
+    """Status of an upload session, 404 if unknown or expired"""
+    try:
+        return upload_sessions.status(upload_id)
+    except KeyError:
+        logger.warning(f"❌ Upload not found: {upload_id}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+
+@router.post("/uploads")
+async def create_upload(
+    filename: str = Form(...),
+    size: int = Form(...),
+    chunkSize: Optional[int] = Form(None)
+):
+    """
+    Open a resumable upload of `size` bytes. The file is then sent as chunks of
+    chunk_size bytes to PUT /api/uploads/{upload_id}/chunks/{index}, in parallel
+    and in any order, and ingested with POST /api/uploads/{upload_id}/complete.
+    """
+    logger.info(f"📥 Opening chunked upload for {filename} ({size / (1024 * 1024):.2f} MB)")
+    if not is_data_file(filename):
+        logger.error(f"❌ Invalid file format: {filename}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Invalid file format for {filename}. Only .txt files, possibly compressed ({", ".join(COMPRESSIONS)}), allowed.'
+        )
+
+    try:
+        return await asyncio.to_thread(upload_sessions.create, filename, size, chunkSize)
+    except UploadError as e:
+        logger.error(f"❌ Invalid upload: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.get("/uploads/{upload_id}")
+async def upload_status(upload_id: str):
+    """État d'un upload : chunks reçus et chunks manquants à renvoyer pour reprendre"""
+    return get_upload_status(upload_id)
+
+@router.put("/uploads/{upload_id}/chunks/{index}")
+async def upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    x_chunk_sha256: Optional[str] = Header(None)
+):
+    """
+    Receive chunk `index` of an upload as the raw request body. When the
+    X-Chunk-SHA256 header is set, the chunk is rejected if its SHA-256 differs
+    and must be sent again. Sending a chunk again is harmless.
+    """
+    session = get_upload_status(upload_id)
+    content_length = request.headers.get("content-length")
+    if content_length and int(content_length) > session["chunk_size"]:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Chunk larger than {session['chunk_size']} bytes"
+        )
+
+    try:
+        writer = await asyncio.to_thread(upload_sessions.open_chunk, upload_id, index, x_chunk_sha256)
+        try:
+            # Written as it streams in, in pieces of about Config.UPLOAD_WRITE_SIZE bytes
+            buffer = bytearray()
+            async for piece in request.stream():
+                buffer += piece
+                if len(buffer) >= Config.UPLOAD_WRITE_SIZE:
+                    await asyncio.to_thread(writer.write, bytes(buffer))
+                    buffer.clear()
+            await asyncio.to_thread(writer.write, bytes(buffer))
+            await asyncio.to_thread(writer.commit)
+        finally:
+            await asyncio.to_thread(writer.close)
+    except KeyError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    except UploadError as e:
+        logger.error(f"❌ Rejected chunk {index} of upload {upload_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    logger.debug(f"Received chunk {index} of upload {upload_id} ({writer.written} bytes)")
+    return {"success": True, "upload_id": upload_id, "index": index}
+
+@router.post("/uploads/{upload_id}/complete", response_model=dict)
+async def complete_upload(
+    upload_id: str,
+    mappingFile: Optional[UploadFile] = File(None),
+    mappingId: Optional[str] = Form(None),
+    appendMode: Optional[str] = Form("false"),
+    asyncMode: Optional[str] = Form("false"),
+    priority: int = Form(0)
+):
+    """
+    Ingest a fully received upload, with the same options as /api/process_files.
+    Returns 409 with the missing chunk indexes if the upload is incomplete.
+    """
+    start_time = datetime.now()
+    session = get_upload_status(upload_id)
+    filename = session["filename"]
+    logger.info("=" * 80)
+    logger.info(f"🚀 COMPLETE UPLOAD ENDPOINT CALLED")
+    logger.info(f"Upload: {upload_id}, Data file: {filename}, Mapping: {mappingFile.filename if mappingFile else mappingId}, Append mode: {appendMode}, Priority: {priority}")
+    logger.info("=" * 80)
+
+    if session["missing"]:
+        logger.error(f"❌ Upload {upload_id} is missing {len(session['missing'])} chunks")
+        return JSONResponse(
+            status_code=status.HTTP_409_CONFLICT,
+            content={
+                "success": False,
+                "message": f"Upload incomplet : {len(session['missing'])} chunks manquants",
+                "missing": session["missing"]
+            }
+        )
+
+    validate_ingest_request(filename, mappingFile, mappingId)
+
+    # Convert appendMode and asyncMode strings to booleans
+    append_mode = appendMode.lower() == "true"
+    async_mode = asyncMode.lower() == "true"
+    logger.info(f"Mode: {'APPEND' if append_mode else 'NEW'}{' (ASYNC)' if async_mode else ''}")
+
+    async def move_upload(input_path: Path) -> str:
+        # The chunks were assembled in place, the file is only moved (and hashed
+        # in one read, its chunks arrive in any order)
+        await asyncio.to_thread(upload_sessions.complete, upload_id, input_path)
+        return await asyncio.to_thread(hash_file, input_path)
+
+    return await queue_ingest_job(
+        filename,
+        move_upload,
+        mappingFile,
+        mappingId,
+        append_mode,
+        async_mode,
+        priority,
+        start_time
+    )
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Abandonner un upload et supprimer les chunks reçus"""
+    get_upload_status(upload_id)
+    await asyncio.to_thread(upload_sessions.abort, upload_id)
+    logger.info(f"🗑️ Aborted upload {upload_id}")
+    return {"success": True, "message": "Upload annulé"}
+
 @router.get("/job-status/{job_id}")
 async def get_job_status(job_id: str):
     """Vérifier le statut d'un job de traitement"""
     logger.info(f"🔍 Checking status for job: {job_id}")
     
-    if job_id not in JOBS:
+    job = job_store.get(job_id)
+    if job is None:
         logger.warning(f"❌ Job not found: {job_id}")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Job not found"
         )
     
-    logger.info(f"✅ Job status: {JOBS[job_id]['status']}, progress: {JOBS[job_id]['progress']}%")
-    return JOBS[job_id]
-
-@router.post("/reset-processing-lock")
-async def reset_processing_lock():
-    """Réinitialiser le verrou de traitement (pour les administrateurs uniquement)"""
-    global processing_lock, current_job_id
-    
-    logger.info("🔄 Reset processing lock requested")
-    # Dans un environnement de production, ajoutez une authentification ici
+    # Position in the queue while the job is waiting for a worker of this process
+    if job["status"] == "queued" and job_queue.position(job_id) is not None:
+        job["position"] = job_queue.position(job_id)
     
-    old_status = {"was_locked": processing_lock, "previous_job": current_job_id}
-    
-    processing_lock = False
-    current_job_id = None
-    logger.info("✅ Processing lock reset successfully")
-    
-    return {"message": "Verrou réinitialisé avec succès", "previous_status": old_status}
+    logger.info(f"✅ Job status: {job['status']}, progress: {job['progress']}%")
+    return job
+
+@router.get("/jobs")
+async def list_jobs(status_filter: Optional[str] = Query(None, alias="status"), limit: int = 100):
+    """Lister les jobs les plus récents, éventuellement filtrés par statut"""
+    logger.info(f"🔍 Listing jobs (status: {status_filter or 'all'})")
+    return {"jobs": job_store.list(status_filter, min(limit, 1000))}
+
+@router.get("/job-queue")
+async def get_job_queue():
+    """État de la file d'attente des jobs (workers, jobs en attente et en cours)"""
+    logger.info("🔍 Checking job queue")
+    return job_queue.status()
 
 @router.get("/csv/check")
 def check_file():
     """Vérifie si un fichier de données existe déjà"""
-    logger.info("🔍 Checking if CSV file exists")
-    exists = os.path.exists(CSV_FILE_PATH)
+    logger.info("🔍 Checking if CSV dataset exists")
+    stats = dataset.stats()
+    exists = stats["segments"] > 0
     
     if exists:
-        file_size = os.path.getsize(CSV_FILE_PATH)
-        logger.info(f"✅ CSV file exists: {CSV_FILE_PATH} ({file_size / 1024:.2f} KB)")
+        logger.info(f"✅ CSV dataset exists: {dataset.root} ({stats['segments']} segments, {stats['rows']} rows, {stats['bytes'] / 1024:.2f} KB)")
         
-        # Verify the existing file
-        inspect_csv_file(CSV_FILE_PATH, "Existing CSV file")
+        # Verify the latest segment
+        inspect_csv_file(str(dataset.segment_paths()[-1]), "Latest CSV segment")
     else:
-        logger.info("❌ CSV file does not exist")
+        logger.info("❌ CSV dataset does not exist")
     
     return {"exists": exists}
 
@@ -837,22 +1512,15 @@ def purge_data():
     logger.info("🗑️ Purging CSV data")
     
     try:
-        if os.path.exists(CSV_FILE_PATH):
-            file_size = os.path.getsize(CSV_FILE_PATH)
-            logger.info(f"🗑️ Deleting CSV file: {CSV_FILE_PATH} ({file_size / 1024:.2f} KB)")
-            
-            os.remove(CSV_FILE_PATH)
-            logger.info(f"✅ CSV file deleted")
-            
-            # Also remove the index file if it exists
-            if os.path.exists(CSV_INDEX_PATH):
-                logger.info(f"🗑️ Deleting index file: {CSV_INDEX_PATH}")
-                os.remove(CSV_INDEX_PATH)
-                logger.info(f"✅ Index file deleted")
-                
+        with dataset.begin() as transaction:
+            removed = transaction.purge()
+            schema_registry.clear()
+        
+        if removed:
+            logger.info(f"✅ Deleted {removed} CSV segments")
             return {"success": True, "message": "Données purgées avec succès"}
         else:
-            logger.info("No CSV file to purge")
+            logger.info("No CSV data to purge")
             return {"success": True, "message": "Aucun fichier à purger"}
     except Exception as e:
         logger.error(f"❌ Error purging data: {e}")
@@ -867,13 +1535,14 @@ async def health_check():
     """Simple health check endpoint to verify server availability"""
     logger.info("🔍 Health check requested")
     
-    # Check if CSV file exists and log its status
-    csv_exists = os.path.exists(CSV_FILE_PATH)
+    # Check if CSV data exists and log its status (waits for an unversioned
+    # dataset to be adopted, off the event loop)
+    stats = await asyncio.to_thread(dataset.stats)
+    csv_exists = stats["segments"] > 0
     if csv_exists:
-        file_size = os.path.getsize(CSV_FILE_PATH)
-        logger.info(f"✅ CSV file exists: {CSV_FILE_PATH} ({file_size / 1024:.2f} KB)")
+        logger.info(f"✅ CSV dataset exists: {dataset.root} ({stats['segments']} segments, {stats['bytes'] / 1024:.2f} KB)")
     else:
-        logger.info("❌ CSV file does not exist")
+        logger.info("❌ CSV dataset does not exist")
     
     return {
         "status": "ok",
@@ -0,0 +1,145 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Request, Response, status
+from pathlib import Path
+from typing import Optional
+import asyncio
+import json
+import logging
+import pandas as pd
+from src.utils.settings import Config
+from src.utils.mapping_registry import mapping_registry
+from src.utils.operator_index import parse_record_dates
+from src.utils.phone_numbers import DEFAULT_COUNTRY_CODE
+from src.app.routes.file_processing import register_uploaded_mapping
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api",
+    tags=["operators"],
+    responses={404: {"description": "Not found"}}
+)
+
+@router.post("/mappings")
+async def upload_mapping(
+    mappingFile: UploadFile = File(...),
+    countryCode: int = Form(DEFAULT_COUNTRY_CODE)
+):
+    """
+    Register a MAJNUM mapping file once so that ingest jobs can refer to it by id.
+    The mapping becomes the numbering plan of countryCode (33 by default).
+    """
+    logger.info(f"📤 Registering mapping file: {mappingFile.filename} (country code {countryCode})")
+    
+    if not mappingFile.filename.lower().endswith('.csv'):
+        logger.warning(f"Invalid mapping file format: {mappingFile.filename}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Invalid mapping file format. Only .csv files allowed.'
+        )
+    
+    upload_dir = Path(Config.UPLOAD_FOLDER)
+    upload_dir.mkdir(exist_ok=True, parents=True)
+    
+    mapping_id = await register_uploaded_mapping(mappingFile, upload_dir, countryCode)
+    return {"success": True, **mapping_registry.get(mapping_id)}
+
+@router.get("/mappings")
+def list_mappings():
+    """List the registered mappings, most recent first"""
+    logger.info("🔍 Listing registered mappings")
+    return {"mappings": mapping_registry.list()}
+
+@router.get("/mappings/{mapping_id}")
+def get_mapping(mapping_id: str):
+    """Get the metadata of a registered mapping"""
+    logger.info(f"🔍 Getting mapping: {mapping_id}")
+    
+    mapping = mapping_registry.get(mapping_id)
+    if mapping is None:
+        logger.warning(f"❌ Mapping not found: {mapping_id}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Mapping not found"
+        )
+    
+    return mapping
+
+def parse_lookup_body(body: bytes, content_type: str):
+    """
+    Numbers (and optional as-of dates) of a lookup request: a JSON list, a JSON
+    object {"numbers": [...], "dates": [...]} or newline-delimited text.
+    """
+    if "json" in content_type:
+        payload = json.loads(body)
+        if isinstance(payload, list):
+            return payload, None
+        if isinstance(payload, dict) and isinstance(payload.get("numbers"), list):
+            return payload["numbers"], payload.get("dates")
+        raise ValueError('Expected a list of numbers or {"numbers": [...]}')
+
+    text = body.decode("utf-8-sig")
+    return [line.strip() for line in text.splitlines() if line.strip()], None
+
+@router.post("/operators/lookup")
+async def lookup_operators(
+    request: Request,
+    mappingId: Optional[str] = None,
+    mode: Optional[str] = None
+):
+    """
+    Resolve a batch of phone numbers to operators, in the order they were sent.
+    Numbers are resolved against the resident numbering plan of mappingId (the
+    latest French mapping by default), reloaded only when a mapping is registered.
+    """
+    kind = mode or Config.OPERATOR_MATCH_MODE
+    if kind not in mapping_registry.INDEX_KINDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid mode: {kind}"
+        )
+    
+    try:
+        numbers, dates = parse_lookup_body(await request.body(), request.headers.get("content-type", ""))
+    except (ValueError, UnicodeDecodeError) as e:
+        logger.warning(f"Invalid lookup request: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid lookup request: {e}"
+        )
+    
+    if len(numbers) > Config.LOOKUP_MAX_BATCH:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Too many numbers: {len(numbers)} (max {Config.LOOKUP_MAX_BATCH})"
+        )
+    if dates is not None and len(dates) != len(numbers):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="dates must have one entry per number"
+        )
+    
+    try:
+        numbering_plan, mapping_id = mapping_registry.resident_plan(mappingId, kind)
+    except (KeyError, ValueError):
+        logger.warning(f"❌ Mapping not found: {mappingId or 'latest'}")
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Mapping not found"
+        )
+    
+    def resolve():
+        record_dates = None if dates is None else parse_record_dates(pd.Series(dates, dtype=object))
+        # The list itself: bare digits take the fast path of the normalization
+        return numbering_plan.resolve_numbers(numbers, record_dates)
+    
+    operators, statuses = await asyncio.to_thread(resolve)
+    logger.info(f"🔍 Resolved {len(numbers)} numbers with mapping {mapping_id}")
+    
+    # Serialize directly: the response holds up to LOOKUP_MAX_BATCH entries
+    content = json.dumps({
+        "mapping_id": mapping_id,
+        "count": len(numbers),
+        "operators": operators.tolist(),
+        "statuses": statuses.tolist()
+    }, ensure_ascii=False)
+    return Response(content=content, media_type="application/json")
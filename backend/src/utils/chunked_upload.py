@@ -0,0 +1,219 @@
+"""
+Resumable chunked uploads.
+
+A file is uploaded as fixed-size chunks sent in parallel and in any order.
+Each chunk is written at its offset in a preallocated file as it streams in,
+and checked against its SHA-256, so the file is assembled in place without a
+final concatenation. Received chunks are recorded one byte per chunk in a bitmap
+file, which lets a client resume after a failure by asking which chunks are
+still missing. Sessions that receive no chunk for `ttl` seconds are removed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+from src.utils.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class UploadError(ValueError):
+    """Invalid upload session or chunk"""
+
+
+class UploadSessions:
+    """Upload sessions stored as one directory each under `root`"""
+
+    def __init__(self, root, ttl: float):
+        self.root = Path(root)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+
+    def _directory(self, upload_id: str) -> Path:
+        # Ids are generated by create(), anything else is unknown
+        if not upload_id.isalnum():
+            raise KeyError(upload_id)
+        directory = self.root / upload_id
+        if not (directory / "session.json").exists():
+            raise KeyError(upload_id)
+        return directory
+
+    def _session(self, upload_id: str) -> dict:
+        with (self._directory(upload_id) / "session.json").open() as f:
+            return json.load(f)
+
+    def create(self, filename: str, size: int, chunk_size: Optional[int] = None) -> dict:
+        """Open an upload of `size` bytes and preallocate its file"""
+        chunk_size = int(chunk_size or Config.UPLOAD_CHUNK_SIZE)
+        if size <= 0:
+            raise UploadError("File size must be positive")
+        if not 0 < chunk_size <= Config.UPLOAD_MAX_CHUNK_SIZE:
+            raise UploadError(f"Chunk size must be between 1 and {Config.UPLOAD_MAX_CHUNK_SIZE} bytes")
+
+        self._evict_expired()
+        upload_id = uuid.uuid4().hex
+        directory = self.root / upload_id
+        directory.mkdir(parents=True)
+
+        chunk_count = -(-size // chunk_size)
+        with (directory / "data").open("wb") as f:
+            f.truncate(size)
+        with (directory / "chunks").open("wb") as f:
+            f.write(bytes(chunk_count))
+
+        session = {
+            "upload_id": upload_id,
+            "filename": Path(filename).name,
+            "size": size,
+            "chunk_size": chunk_size,
+            "chunk_count": chunk_count,
+            "createdAt": time.time()
+        }
+        with (directory / "session.json").open("w") as f:
+            json.dump(session, f)
+
+        logger.info(f"Opened upload {upload_id} for {filename}: {size} bytes in {chunk_count} chunks")
+        return self.status(upload_id)
+
+    def _received(self, directory: Path) -> bytes:
+        return (directory / "chunks").read_bytes()
+
+    def status(self, upload_id: str) -> dict:
+        """Session with the indexes of the chunks still missing"""
+        session = self._session(upload_id)
+        received = self._received(self._directory(upload_id))
+        missing = [index for index, done in enumerate(received) if not done]
+        return {**session, "received": session["chunk_count"] - len(missing), "missing": missing}
+
+    def open_chunk(self, upload_id: str, index: int, checksum: Optional[str] = None) -> "ChunkWriter":
+        """
+        Writer of chunk `index`, fed piece by piece so that a chunk is never
+        held in memory whole. Chunks may arrive in any order and concurrently;
+        writing a chunk twice is harmless.
+
+        Raises:
+            KeyError: Unknown upload
+            UploadError: Bad index
+        """
+        session = self._session(upload_id)
+        directory = self._directory(upload_id)
+        chunk_size = session["chunk_size"]
+
+        if not 0 <= index < session["chunk_count"]:
+            raise UploadError(f"Chunk index {index} out of range (0-{session['chunk_count'] - 1})")
+        expected = min(chunk_size, session["size"] - index * chunk_size)
+        return ChunkWriter(directory, index, index * chunk_size, expected, checksum)
+
+    def write_chunk(self, upload_id: str, index: int, data: bytes, checksum: Optional[str] = None) -> None:
+        """
+        Write chunk `index` at its offset in one piece.
+
+        Raises:
+            KeyError: Unknown upload
+            UploadError: Bad index, size or checksum
+        """
+        writer = self.open_chunk(upload_id, index, checksum)
+        try:
+            writer.write(data)
+            writer.commit()
+        finally:
+            writer.close()
+
+    def complete(self, upload_id: str, destination: Path) -> dict:
+        """
+        Move the assembled file to `destination` and close the session.
+
+        Raises:
+            KeyError: Unknown upload
+            UploadError: Chunks are still missing
+        """
+        with self._lock:
+            status = self.status(upload_id)
+            if status["missing"]:
+                raise UploadError(f"{len(status['missing'])} chunks missing")
+
+            directory = self._directory(upload_id)
+            shutil.move(str(directory / "data"), str(destination))
+            shutil.rmtree(directory, ignore_errors=True)
+
+        logger.info(f"Completed upload {upload_id} into {destination}")
+        return status
+
+    def abort(self, upload_id: str) -> None:
+        shutil.rmtree(self._directory(upload_id), ignore_errors=True)
+
+    def _evict_expired(self) -> None:
+        """Remove sessions idle for the TTL, at most once a minute"""
+        now = time.time()
+        if now - self._last_eviction < 60 or not self.root.exists():
+            return
+        self._last_eviction = now
+
+        for directory in self.root.iterdir():
+            try:
+                # The chunk bitmap is rewritten by every chunk
+                expired = now - (directory / "chunks").stat().st_mtime > self.ttl
+            except OSError:
+                # Session not fully created yet or already removed
+                continue
+            if expired:
+                shutil.rmtree(directory, ignore_errors=True)
+                logger.info(f"Removed expired upload {directory.name}")
+
+
+
+class ChunkWriter:
+    """
+    Chunk written at its offset as its pieces arrive, hashed on the way. It is
+    marked as received by commit() once its size and checksum are right;
+    closing it uncommitted marks it as missing again, as its bytes may have
+    overwritten a chunk received before.
+    """
+
+    def __init__(self, directory: Path, index: int, offset: int, expected: int, checksum: Optional[str]):
+        self.directory = directory
+        self.index = index
+        self.expected = expected
+        self.written = 0
+        self._offset = offset
+        self._checksum = checksum.lower() if checksum is not None else None
+        self._hash = hashlib.sha256()
+        self._committed = False
+        # Positional writes to disjoint ranges, no lock needed between chunks
+        self._file = (directory / "data").open("r+b")
+
+    def write(self, data: bytes) -> None:
+        if self.written + len(data) > self.expected:
+            raise UploadError(f"Chunk {self.index} has more than {self.expected} bytes")
+        os.pwrite(self._file.fileno(), data, self._offset + self.written)
+        self._hash.update(data)
+        self.written += len(data)
+
+    def commit(self) -> None:
+        """Mark the chunk as received, after checking its size and checksum"""
+        if self.written != self.expected:
+            raise UploadError(f"Chunk {self.index} has {self.written} bytes, expected {self.expected}")
+        if self._checksum is not None and self._hash.hexdigest() != self._checksum:
+            raise UploadError(f"Checksum mismatch for chunk {self.index}")
+        self._mark(b"\x01")
+        self._committed = True
+
+    def close(self) -> None:
+        self._file.close()
+        if not self._committed and self.written:
+            self._mark(b"\x00")
+
+    def _mark(self, state: bytes) -> None:
+        with (self.directory / "chunks").open("r+b") as f:
+            f.seek(self.index)
+            f.write(state)
+
+upload_sessions = UploadSessions(Config.UPLOAD_SESSION_FOLDER, Config.UPLOAD_TTL)
@@ -0,0 +1,81 @@
+"""
+Compressed dumps (.gz, .zst, .zip), decompressed on the fly while they are
+parsed so that the uncompressed dump is never written to disk.
+
+gzip and zstd streams are decompressed by Arrow's codecs, which release the
+GIL; a zip archive must hold a single dump. Neither format can be split
+without an index, so a stream is decompressed sequentially by one thread,
+concurrently with the threads parsing the blocks it produces.
+"""
+
+import logging
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Optional
+import pyarrow as pa
+
+logger = logging.getLogger(__name__)
+
+# Compression of a data file by extension
+COMPRESSIONS = {
+    ".gz": "gzip",
+    ".zst": "zstd",
+    ".zip": "zip"
+}
+
+
+def compression_of(filename: str) -> Optional[str]:
+    """Compression of a data file from its name, None for an uncompressed dump"""
+    return COMPRESSIONS.get(Path(filename.lower()).suffix)
+
+
+class DecompressedInput:
+    """Decompressed content of a compressed dump, read sequentially"""
+
+    def __init__(self, path, compression: str):
+        self.path = Path(path)
+        self.compression = compression
+        self._archive = None
+        if compression == "zip":
+            self._raw = open(self.path, "rb")
+            try:
+                self._archive = zipfile.ZipFile(self._raw)
+                members = [member for member in self._archive.infolist() if not member.is_dir()]
+                if len(members) != 1:
+                    raise ValueError(f"Zip archive must contain a single dump, found {len(members)} files")
+                self._stream = self._archive.open(members[0])
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                self.close()
+                raise ValueError(f"Invalid zip archive: {e}")
+            except ValueError:
+                self.close()
+                raise
+            logger.info(f"Reading {members[0].filename} from {self.path.name} ({members[0].file_size} bytes)")
+        elif compression in ("gzip", "zstd"):
+            self._raw = pa.OSFile(str(self.path), "rb")
+            self._stream = pa.CompressedInputStream(self._raw, compression)
+        else:
+            raise ValueError(f"Unsupported compression: {compression}")
+
+    def read(self, size: int) -> bytes:
+        """Up to `size` decompressed bytes, b"" at the end"""
+        try:
+            return self._stream.read(size)
+        except (OSError, EOFError, zipfile.BadZipFile, zlib.error) as e:
+            raise ValueError(f"Corrupt {self.compression} data in {self.path.name}: {e}")
+
+    def compressed_position(self) -> int:
+        """Bytes of the compressed file consumed so far"""
+        return self._raw.tell()
+
+    def close(self) -> None:
+        for stream in (getattr(self, "_stream", None), self._archive, self._raw):
+            if stream is not None:
+                stream.close()
+
+    def __enter__(self) -> "DecompressedInput":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,98 @@
+"""
+Match-coverage counters of the operator join.
+
+Counters are updated from the arrays each batch already computes during
+enrichment (statuses, match lengths, emptiness), so a report costs a few
+bincounts per batch and no extra pass over the data.
+"""
+
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from src.utils.numbering_plan import MALFORMED, RESOLVED, UNRESOLVED, UNSUPPORTED_COUNTRY
+
+
+class CoverageReport:
+    """Per-status row counts of an operator join, merged across batches"""
+
+    def __init__(self):
+        self.batches = 0
+        self.total = 0
+        self.resolved = 0
+        self.unresolved = 0
+        self.unsupported_country = 0
+        self.malformed = 0
+        self.empty = 0
+        # Resolved rows keyed by the length of the matched prefix (0 for ranges)
+        self.resolved_by_prefix_length: Dict[int, int] = {}
+
+    def add_batch(self, statuses: np.ndarray, lengths: np.ndarray, empty: np.ndarray) -> None:
+        """
+        Count one enriched batch.
+
+        Args:
+            statuses: Statut_Operateur values of the batch
+            lengths: Matched prefix lengths from NumberingPlan.resolve
+            empty: Mask of rows whose TELEPHONE is empty (counted apart from malformed)
+        """
+        self.batches += 1
+        self.total += len(statuses)
+
+        resolved = statuses == RESOLVED
+        self.resolved += int(resolved.sum())
+        self.unresolved += int((statuses == UNRESOLVED).sum())
+        self.unsupported_country += int((statuses == UNSUPPORTED_COUNTRY).sum())
+
+        empty_count = int(empty.sum())
+        self.empty += empty_count
+        self.malformed += int((statuses == MALFORMED).sum()) - empty_count
+
+        counts = np.bincount(np.asarray(lengths, dtype=np.int64)[resolved])
+        for length in np.flatnonzero(counts):
+            self.add_resolved(int(length), int(counts[length]))
+
+    def add_resolved(self, length: int, count: int) -> None:
+        self.resolved_by_prefix_length[length] = self.resolved_by_prefix_length.get(length, 0) + count
+
+    def merge(self, other: "CoverageReport") -> None:
+        """Add the counters of another report (e.g. from a worker process)"""
+        for field in ("batches", "total", "resolved", "unresolved", "unsupported_country", "malformed", "empty"):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        for length, count in other.resolved_by_prefix_length.items():
+            self.add_resolved(length, count)
+
+    @staticmethod
+    def empty_mask(telephone: pd.Series) -> np.ndarray:
+        """Rows whose TELEPHONE is missing or blank"""
+        return telephone.isna().to_numpy() | (telephone.astype(str).str.strip() == "").to_numpy()
+
+    @property
+    def match_rate(self) -> Optional[float]:
+        """Share of well-formed numbers resolved to an operator"""
+        candidates = self.total - self.malformed - self.empty
+        return round(self.resolved / candidates, 6) if candidates else None
+
+    def to_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "total": self.total,
+            "resolved": self.resolved,
+            "resolved_by_prefix_length": {
+                str(length): count for length, count in sorted(self.resolved_by_prefix_length.items())
+            },
+            "unresolved": self.unresolved,
+            "unsupported_country": self.unsupported_country,
+            "malformed": self.malformed,
+            "empty": self.empty,
+            "match_rate": self.match_rate
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "CoverageReport":
+        report = cls()
+        for field in ("batches", "total", "resolved", "unresolved", "unsupported_country", "malformed", "empty"):
+            setattr(report, field, int(data.get(field, 0)))
+        report.resolved_by_prefix_length = {
+            int(length): int(count) for length, count in data.get("resolved_by_prefix_length", {}).items()
+        }
+        return report
@@ -0,0 +1,398 @@
+"""
+Append-only segmented storage of the enriched dataset, with snapshot-isolated
+commits.
+
+The dataset is a directory of immutable CSV segments listed by versioned
+manifests. An append moves the new processed file in as one more segment and
+publishes a new manifest, so it costs the size of the new rows whatever the
+size of the dataset; existing segments are never read or copied.
+
+Commit protocol:
+
+- Writers stage their new segment in the dataset directory, then open a
+  transaction: an exclusive OS lock (flock) on the dataset, held by the
+  kernel and released if the process dies, so a crashed job leaves nothing
+  to clean up and waiting writers sleep instead of polling.
+- A commit writes the immutable manifest `manifests/<version>.json`, then
+  atomically renames a copy over the current manifest (`manifest.json`).
+- Readers pin a snapshot: the versioned manifest they read, share-locked for
+  the whole request. They never wait for writers and keep reading the same
+  segments whatever is committed meanwhile.
+- After each commit, manifests older than the current one that no reader
+  pins are removed, then the segments none of the remaining manifests list.
+
+A dataset saved as a single `input.csv` by earlier versions is adopted as the
+first segment the first time the store is used.
+"""
+
+import csv
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from src.utils.duckdb_ingest import quote_literal
+from src.utils.settings import Config
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: writers are only serialized within the process, and readers do not pin segments
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FOLDER = "manifests"
+SEGMENT_FOLDER = "segments"
+LOCK_NAME = ".lock"
+
+
+def read_csv_header(path) -> List[str]:
+    with open(path, newline="") as f:
+        return next(csv.reader(f), [])
+
+
+def count_csv_rows(path) -> int:
+    """Data rows of a CSV file, without the header"""
+    with open(path, "rb") as f:
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def _write_json(path: Path, content: dict) -> None:
+    """Write `path` atomically: readers see either the previous file or the complete new one"""
+    temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+    with temp_path.open("w") as f:
+        json.dump(content, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class Snapshot:
+    """Version of the dataset pinned by a reader until `close`"""
+
+    def __init__(self, dataset: "SegmentedDataset", manifest: dict, fd: Optional[int] = None):
+        self.dataset = dataset
+        self.manifest = manifest
+        self._fd = fd
+
+    @property
+    def version(self) -> int:
+        return self.manifest["version"]
+
+    def exists(self) -> bool:
+        return bool(self.manifest["segments"])
+
+    def segment_paths(self) -> List[Path]:
+        return self.dataset.segment_paths(self.manifest)
+
+    def sql_source(self, types: Optional[Dict[str, str]] = None) -> Optional[str]:
+        return self.dataset.sql_source(self.manifest, types)
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Transaction:
+    """
+    Exclusive write access to the dataset until `close`. Each change is
+    published at once as a new manifest version.
+    """
+
+    def __init__(self, dataset: "SegmentedDataset", fd: Optional[int]):
+        self.dataset = dataset
+        self._fd = fd
+        self._closed = False
+        self.manifest = dataset._read_manifest()
+
+    def _commit(self, segments: List[dict]) -> dict:
+        manifest = {
+            "version": self.manifest["version"] + 1,
+            "segments": segments,
+            "committedAt": datetime.now().isoformat()
+        }
+        self.dataset._publish(manifest)
+        self.manifest = manifest
+        self.dataset._collect_garbage(manifest)
+        return manifest
+
+    def _add_segment(self, source: Path, rows: Optional[int], job_id: Optional[str], content_key: Optional[str]) -> dict:
+        """Move a staged file in as a segment, listed by no manifest until committed"""
+        rows = count_csv_rows(source) if rows is None else rows
+        self.dataset.segment_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{self.manifest['version'] + 1:08d}-{uuid.uuid4().hex[:8]}.csv"
+        segment_path = self.dataset.segment_dir / name
+        shutil.move(str(source), str(segment_path))
+        return {
+            "file": name,
+            "rows": rows,
+            "bytes": segment_path.stat().st_size,
+            "columns": read_csv_header(segment_path),
+            "job_id": job_id,
+            # Key of the ingest input the segment was made from (see ingest_cache)
+            "content_key": content_key,
+            "createdAt": datetime.now().isoformat()
+        }
+
+    def append(
+        self,
+        source: Path,
+        rows: Optional[int] = None,
+        job_id: Optional[str] = None,
+        content_key: Optional[str] = None
+    ) -> dict:
+        """Commit the CSV file `source` as a new segment; returns the new manifest"""
+        segment = self._add_segment(Path(source), rows, job_id, content_key)
+        manifest = self._commit(self.manifest["segments"] + [segment])
+        logger.info(f"Appended {segment['rows']} rows to {self.dataset.root} (version {manifest['version']})")
+        return manifest
+
+    def replace(
+        self,
+        source: Path,
+        rows: Optional[int] = None,
+        job_id: Optional[str] = None,
+        content_key: Optional[str] = None
+    ) -> dict:
+        """Commit the CSV file `source` as the only segment"""
+        segment = self._add_segment(Path(source), rows, job_id, content_key)
+        manifest = self._commit([segment])
+        logger.info(f"Replaced {self.dataset.root} with {segment['rows']} rows (version {manifest['version']})")
+        return manifest
+
+    def holds(self, content_key: str) -> bool:
+        """Whether a segment made from the ingest input `content_key` is in the dataset"""
+        return any(segment.get("content_key") == content_key for segment in self.manifest["segments"])
+
+    def purge(self) -> int:
+        """Commit an empty dataset; returns the number of segments removed"""
+        removed = len(self.manifest["segments"])
+        if removed:
+            self._commit([])
+        return removed
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+        self.dataset._writer.release()
+
+    def __enter__(self) -> "Transaction":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class SegmentedDataset:
+    """Dataset stored as immutable CSV segments under `root`, listed by versioned manifests"""
+
+    def __init__(self, root, legacy_file=None):
+        self.root = Path(root)
+        self.segment_dir = self.root / SEGMENT_FOLDER
+        self.manifest_dir = self.root / MANIFEST_FOLDER
+        self.manifest_path = self.root / MANIFEST_NAME
+        self.legacy_file = Path(legacy_file) if legacy_file else None
+        # Writers of this process; flock serializes them with other processes
+        self._writer = threading.Lock()
+
+    def _versioned_path(self, version: int) -> Path:
+        return self.manifest_dir / f"{version:08d}.json"
+
+    def _read_manifest(self) -> dict:
+        try:
+            with self.manifest_path.open() as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": 0, "segments": []}
+
+    def _publish(self, manifest: dict) -> None:
+        """Write the immutable versioned manifest, then swap it in as the current one"""
+        self.manifest_dir.mkdir(parents=True, exist_ok=True)
+        _write_json(self._versioned_path(manifest["version"]), manifest)
+        _write_json(self.manifest_path, manifest)
+
+    def _collect_garbage(self, current: dict) -> None:
+        """Remove the older manifests no reader pins, then the segments no remaining manifest lists"""
+        kept = [current]
+        current_path = self._versioned_path(current["version"])
+        for path in self.manifest_dir.glob("*.json"):
+            if path == current_path:
+                continue
+            if fcntl is None:
+                path.unlink()
+                continue
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Pinned by a reader: kept with its segments until a later commit
+                with path.open() as f:
+                    kept.append(json.load(f))
+            else:
+                # Unlinked while locked: a reader locking it next sees it is gone
+                path.unlink()
+            finally:
+                os.close(fd)
+
+        listed = {segment["file"] for manifest in kept for segment in manifest["segments"]}
+        for path in self.segment_dir.glob("*.csv"):
+            if path.name not in listed:
+                path.unlink(missing_ok=True)
+
+    def begin(self) -> Transaction:
+        """
+        Open a write transaction, waiting (without polling) for the current
+        writer, in this process or another one, to close its own.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._writer.acquire()
+        fd = None
+        try:
+            if fcntl is not None:
+                fd = os.open(self.root / LOCK_NAME, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            transaction = Transaction(self, fd)
+        except BaseException:
+            if fd is not None:
+                os.close(fd)
+            self._writer.release()
+            raise
+
+        manifest = transaction.manifest
+        try:
+            if manifest["version"] == 0 and self.legacy_file and self.legacy_file.exists():
+                logger.info(f"Adopting {self.legacy_file} as the first segment of {self.root}")
+                transaction.append(self.legacy_file)
+            elif manifest["version"] and not self._versioned_path(manifest["version"]).exists():
+                # Current manifest written before manifests were versioned
+                self._publish(manifest)
+        except BaseException:
+            transaction.close()
+            raise
+        return transaction
+
+    def snapshot(self) -> Snapshot:
+        """Pin the current version of the dataset for a reader (released by `close`)"""
+        while True:
+            manifest = self._read_manifest()
+            if manifest["version"] == 0 and self.legacy_file and self.legacy_file.exists():
+                # Adopted by the first transaction
+                self.begin().close()
+                continue
+            if manifest["version"] == 0 or fcntl is None:
+                return Snapshot(self, manifest)
+
+            try:
+                fd = os.open(self._versioned_path(manifest["version"]), os.O_RDONLY)
+            except FileNotFoundError:
+                if manifest == self._read_manifest():
+                    # Current manifest not versioned yet, done by the first transaction
+                    self.begin().close()
+                # Otherwise collected after a newer commit: read the current manifest again
+                continue
+            fcntl.flock(fd, fcntl.LOCK_SH)
+            if os.fstat(fd).st_nlink == 0:
+                # Collected between open and lock
+                os.close(fd)
+                continue
+            with os.fdopen(os.dup(fd)) as f:
+                return Snapshot(self, json.load(f), fd)
+
+    def manifest(self) -> dict:
+        """Current manifest: version and segments (file, rows, bytes, columns)"""
+        with self.snapshot() as snapshot:
+            return snapshot.manifest
+
+    def segment_paths(self, manifest: Optional[dict] = None) -> List[Path]:
+        manifest = manifest or self.manifest()
+        return [self.segment_dir / segment["file"] for segment in manifest["segments"]]
+
+    def exists(self) -> bool:
+        return bool(self.manifest()["segments"])
+
+    def stats(self) -> dict:
+        manifest = self.manifest()
+        return {
+            "version": manifest["version"],
+            "segments": len(manifest["segments"]),
+            "rows": sum(segment["rows"] for segment in manifest["segments"]),
+            "bytes": sum(segment["bytes"] for segment in manifest["segments"])
+        }
+
+    def sql_source(self, manifest: Optional[dict] = None, types: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """
+        DuckDB table expression over the union of the segments, None when the
+        dataset is empty. Columns are matched by name, so segments written
+        with different schemas can be queried together. `types` sets the type
+        of columns instead of detecting it in each segment.
+        """
+        manifest = manifest or self.manifest()
+        paths = self.segment_paths(manifest)
+        if not paths:
+            return None
+        files = ", ".join(quote_literal(str(path)) for path in paths)
+        options = "union_by_name = true"
+
+        # DuckDB rejects types of columns no segment has
+        present = set()
+        for segment, path in zip(manifest["segments"], paths):
+            present.update(segment.get("columns") or read_csv_header(path))
+        types = {name: column_type for name, column_type in (types or {}).items() if name in present}
+        if types:
+            options += ", types = {" + ", ".join(
+                f"{quote_literal(name)}: {quote_literal(column_type)}" for name, column_type in types.items()
+            ) + "}"
+        return f"read_csv([{files}], {options})"
+
+    def append(
+        self,
+        source: Path,
+        rows: Optional[int] = None,
+        job_id: Optional[str] = None,
+        content_key: Optional[str] = None
+    ) -> dict:
+        """Commit `source` as a new segment in a transaction of its own"""
+        with self.begin() as transaction:
+            return transaction.append(source, rows, job_id, content_key)
+
+    def replace(
+        self,
+        source: Path,
+        rows: Optional[int] = None,
+        job_id: Optional[str] = None,
+        content_key: Optional[str] = None
+    ) -> dict:
+        """Commit `source` as the only segment in a transaction of its own"""
+        with self.begin() as transaction:
+            return transaction.replace(source, rows, job_id, content_key)
+
+    def purge(self) -> int:
+        """Commit an empty dataset in a transaction of its own"""
+        with self.begin() as transaction:
+            return transaction.purge()
+
+
+dataset = SegmentedDataset(Config.DATASET_FOLDER, Config.UPLOAD_FOLDER + Config.PROCESSED_CSV)
+
+
+def dataset_snapshot():
+    """FastAPI dependency pinning the current version of the dataset for the whole request"""
+    with dataset.snapshot() as snapshot:
+        yield snapshot
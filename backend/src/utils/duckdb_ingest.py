@@ -0,0 +1,287 @@
+"""
+DuckDB ingest engine: processor output → operator join → CSV in one SQL pipeline.
+
+The numbering plan is exported to DuckDB as small Arrow tables:
+
+- plans (country_code, key_width): countries with an index, and their prefix
+  key width (NULL for range indexes, keyed on the national number)
+- segments (country_code, bound, segment, min_digits): the disjoint segments of
+  every country's index, found with an ASOF join on the lookup key
+- versions (country_code, version_key, segment, operator): the attributions of
+  each segment, keyed like OperatorRangeIndex (segment << 32 | day) so that a
+  second ASOF join picks the attribution valid at the record date
+
+Phone numbers are normalized in SQL with the same rules and constants as
+normalize_phone_numbers, and the whole pipeline runs on DuckDB's threads
+without materializing pandas frames.
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import duckdb
+import numpy as np
+import pyarrow as pa
+from src.utils.coverage import CoverageReport
+from src.utils.numbering_plan import MALFORMED, RESOLVED, UNRESOLVED, UNSUPPORTED_COUNTRY, NumberingPlan
+from src.utils.operator_index import DAY_OFFSET, LATEST_DAY, OperatorIndex, OperatorRangeIndex
+from src.utils.phone_numbers import DEFAULT_COUNTRY_CODE, MAX_DIGITS, ONE_DIGIT_COUNTRY_CODES, TWO_DIGIT_COUNTRY_CODES
+
+logger = logging.getLogger(__name__)
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a column name for DuckDB"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def quote_literal(value: str) -> str:
+    """Quote a string literal for DuckDB"""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def numbering_plan_tables(numbering_plan: NumberingPlan) -> Tuple[pa.Table, pa.Table, pa.Table]:
+    """Export a numbering plan as (plans, segments, versions) Arrow tables"""
+    plans = {"country_code": [], "key_width": []}
+    segments = {"country_code": [], "bound": [], "segment": [], "min_digits": []}
+    versions = {"country_code": [], "version_key": [], "segment": [], "operator": []}
+
+    for country_code, index in numbering_plan.indexes.items():
+        bounds = np.asarray(index.bounds, dtype=np.int64)
+        segment_numbers = np.arange(len(bounds), dtype=np.int64)
+
+        if isinstance(index, OperatorIndex):
+            # Prefix segments have a single attribution, valid since forever
+            owned = np.asarray(index.owners) >= 0
+            key_width = index.key_width
+            min_digits = np.asarray(index.prefix_lengths, dtype=np.int64)
+            version_segments = segment_numbers[owned]
+            version_keys = version_segments << 32
+            version_operators = index.operator_names(np.asarray(index.owners)[owned])
+        elif isinstance(index, OperatorRangeIndex):
+            key_width = None
+            min_digits = np.zeros(len(bounds), dtype=np.int64)
+            version_keys = np.asarray(index.version_keys, dtype=np.int64)
+            version_segments = version_keys >> 32
+            version_operators = index.operator_names(np.asarray(index.version_owners))
+        else:
+            raise TypeError(f"Unsupported index type: {type(index).__name__}")
+
+        plans["country_code"].append(country_code)
+        plans["key_width"].append(key_width)
+        segments["country_code"].append(np.full(len(bounds), country_code, dtype=np.int64))
+        segments["bound"].append(bounds)
+        segments["segment"].append(segment_numbers)
+        segments["min_digits"].append(min_digits)
+        versions["country_code"].append(np.full(len(version_keys), country_code, dtype=np.int64))
+        versions["version_key"].append(version_keys)
+        versions["segment"].append(version_segments)
+        versions["operator"].append(version_operators)
+
+    def concat(columns, types):
+        return pa.table({
+            name: pa.array(np.concatenate(values) if values else np.array([], dtype=object), type=types[name])
+            for name, values in columns.items()
+        })
+
+    plans_table = pa.table({
+        "country_code": pa.array(plans["country_code"], type=pa.int64()),
+        "key_width": pa.array(plans["key_width"], type=pa.int64())
+    })
+    segments_table = concat(segments, {name: pa.int64() for name in segments})
+    versions_table = concat(versions, {
+        "country_code": pa.int64(), "version_key": pa.int64(), "segment": pa.int64(), "operator": pa.string()
+    })
+    return plans_table, segments_table, versions_table
+
+
+def _country_code_sql(digits: str) -> str:
+    """SQL length of the E.164 country code at the start of `digits`"""
+    one = ", ".join(f"'{code}'" for code in ONE_DIGIT_COUNTRY_CODES)
+    two = ", ".join(f"'{code}'" for code in TWO_DIGIT_COUNTRY_CODES)
+    return f"CASE WHEN left({digits}, 1) IN ({one}) THEN 1 WHEN left({digits}, 2) IN ({two}) THEN 2 ELSE 3 END"
+
+
+def build_enrichment_query(source_sql: str, columns, as_of_column: Optional[str] = None) -> str:
+    """
+    SQL enriching `source_sql` (a relation with all columns as VARCHAR) with
+    the Operateur and Statut_Operateur columns. The input order (__row), the
+    matched prefix length (__match_length) and TELEPHONE emptiness (__empty)
+    are kept as extra columns for ordering and coverage counters.
+    """
+    telephone = quote_identifier("TELEPHONE")
+
+    if as_of_column and as_of_column in columns:
+        record_date = f"try_strptime(left({quote_identifier(as_of_column)}, 10), '%Y-%m-%d')"
+        record_day = f"coalesce(date_diff('day', DATE '1970-01-01', {record_date}::DATE) + {DAY_OFFSET}, {LATEST_DAY})"
+    else:
+        record_day = str(LATEST_DAY)
+
+    output_columns = [
+        f"CASE WHEN __country_code = {DEFAULT_COUNTRY_CODE} THEN __national_text ELSE {telephone} END AS {telephone}"
+        if column == "TELEPHONE" else quote_identifier(column)
+        for column in columns if column not in ("Operateur", "Statut_Operateur")
+    ]
+    resolved = "__operator IS NOT NULL AND __version_segment = __segment AND length(__national_text) >= __min_digits"
+
+    return f"""
+        WITH source AS (
+            SELECT *, row_number() OVER () AS __row FROM {source_sql}
+        ),
+        cleaned AS (
+            SELECT *, regexp_replace(regexp_replace(coalesce({telephone}, ''), '\\.0+$', ''), '[\\s.\\-/()]', '', 'g') AS __text
+            FROM source
+        ),
+        prefixed AS (
+            SELECT *,
+                (__text LIKE '0%' AND __text NOT LIKE '00%') AS __trunk,
+                regexp_replace(__text, '^(\\+|00|0)', '') AS __digits
+            FROM cleaned
+        ),
+        split AS (
+            SELECT *,
+                CASE WHEN __trunk THEN 0 ELSE {_country_code_sql('__digits')} END AS __code_length
+            FROM prefixed
+        ),
+        parsed AS (
+            SELECT *,
+                CASE WHEN __trunk THEN {DEFAULT_COUNTRY_CODE} ELSE TRY_CAST(left(__digits, __code_length) AS BIGINT) END AS __raw_country_code,
+                TRY_CAST(substr(__digits, __code_length + 1) AS BIGINT) AS __raw_national
+            FROM split
+        ),
+        numbers AS (
+            SELECT *,
+                CASE WHEN __valid THEN __raw_country_code ELSE 0 END AS __country_code,
+                CAST(CASE WHEN __valid THEN __raw_national ELSE 0 END AS VARCHAR) AS __national_text,
+                CASE WHEN __valid THEN __raw_national ELSE 0 END AS __national,
+                {record_day} AS __day
+            FROM (
+                SELECT *,
+                    coalesce(regexp_full_match(__digits, '[0-9]{{1,{MAX_DIGITS}}}') AND __raw_national > 0, false) AS __valid
+                FROM parsed
+            )
+        ),
+        keyed AS (
+            SELECT n.*,
+                p.country_code IS NOT NULL AS __supported,
+                CASE
+                    WHEN p.key_width IS NULL THEN n.__national
+                    ELSE CAST(rpad(left(n.__national_text, p.key_width::INTEGER), p.key_width::INTEGER, '0') AS BIGINT)
+                END AS __key
+            FROM numbers n LEFT JOIN __plans p ON n.__country_code = p.country_code
+        ),
+        segmented AS (
+            SELECT k.*, s.segment AS __segment, s.min_digits AS __min_digits
+            FROM keyed k ASOF LEFT JOIN __segments s
+                ON k.__country_code = s.country_code AND k.__key >= s.bound
+        ),
+        versioned AS (
+            SELECT g.*, v.operator AS __operator, v.segment AS __version_segment
+            FROM segmented g ASOF LEFT JOIN __versions v
+                ON g.__country_code = v.country_code AND ((g.__segment << 32) | g.__day) >= v.version_key
+        )
+        SELECT
+            {", ".join(output_columns)},
+            CASE WHEN {resolved} THEN __operator END AS "Operateur",
+            CASE
+                WHEN __country_code = 0 THEN '{MALFORMED}'
+                WHEN NOT __supported THEN '{UNSUPPORTED_COUNTRY}'
+                WHEN {resolved} THEN '{RESOLVED}'
+                ELSE '{UNRESOLVED}'
+            END AS "Statut_Operateur",
+            __row,
+            CASE WHEN {resolved} THEN __min_digits ELSE 0 END AS __match_length,
+            regexp_full_match(coalesce({telephone}, ''), '\\s*') AS __empty
+        FROM versioned
+    """
+
+
+def _coverage_counts(conn, table: str, coverage: CoverageReport) -> None:
+    """Add the counters of an enriched table to `coverage`"""
+    rows = conn.execute(f"""
+        SELECT "Statut_Operateur", __match_length, __empty, count(*)
+        FROM {table} GROUP BY ALL
+    """).fetchall()
+    coverage.batches += 1
+    for status, length, empty, count in rows:
+        coverage.total += count
+        if status == RESOLVED:
+            coverage.resolved += count
+            coverage.add_resolved(int(length), count)
+        elif status == UNRESOLVED:
+            coverage.unresolved += count
+        elif status == UNSUPPORTED_COUNTRY:
+            coverage.unsupported_country += count
+        elif empty:
+            coverage.empty += count
+        else:
+            coverage.malformed += count
+
+
+def duckdb_join_operator_data(output_path, numbering_plan: NumberingPlan, as_of_column: Optional[str] = None,
+                              coverage: Optional[CoverageReport] = None):
+    """
+    DuckDB counterpart of join_operator_data. When `coverage` is given, the
+    enriched rows are materialized once and counted before being written.
+
+    Returns:
+        (path to the processed file with operator information, rows written),
+        (None, 0) on error
+    """
+    processed_output_path = str(output_path).replace('.csv', '_with_operators.csv')
+    conn = duckdb.connect(":memory:")
+    try:
+        logger.info(f"Joining operator data to {output_path} with DuckDB")
+        source_sql = f"read_csv({quote_literal(Path(output_path).as_posix())}, header=true, all_varchar=true)"
+
+        columns = [column[0] for column in conn.execute(f"SELECT * FROM {source_sql} LIMIT 0").description]
+        if "TELEPHONE" not in columns:
+            logger.error(f"TELEPHONE column not found in {output_path}")
+            return None, 0
+
+        plans, segments, versions = numbering_plan_tables(numbering_plan)
+        conn.register("__plans", plans)
+        conn.register("__segments", segments)
+        conn.register("__versions", versions)
+
+        query = build_enrichment_query(source_sql, columns, as_of_column)
+        if coverage is not None:
+            conn.execute(f"CREATE TEMP TABLE __enriched AS {query}")
+            _coverage_counts(conn, "__enriched", coverage)
+            query = "SELECT * FROM __enriched"
+
+        rows = conn.execute(
+            f"COPY (SELECT * EXCLUDE (__row, __match_length, __empty) FROM ({query}) ORDER BY __row) "
+            f"TO {quote_literal(Path(processed_output_path).as_posix())} (HEADER, DELIMITER ',')"
+        ).fetchone()[0]
+
+        logger.info(f"Operator data joined successfully with DuckDB ({rows} rows), saved to {processed_output_path}")
+        return processed_output_path, rows
+    except Exception as e:
+        logger.error(f"Error joining operator data with DuckDB: {str(e)}")
+        return None, 0
+    finally:
+        conn.close()
+
+
+def duckdb_project_csv(source_path, target_path, columns, sources: Optional[Dict[str, str]] = None) -> int:
+    """
+    Copy `source_path` to `target_path` with exactly `columns`, in that order,
+    missing columns being left empty. `sources` maps the columns read from a
+    column of another name. Returns the number of rows written.
+    """
+    sources = sources or {}
+    conn = duckdb.connect(":memory:")
+    try:
+        source_sql = f"read_csv({quote_literal(Path(source_path).as_posix())}, header=true, all_varchar=true)"
+        existing = {column[0] for column in conn.execute(f"SELECT * FROM {source_sql} LIMIT 0").description}
+        projection = ", ".join(
+            f"{quote_identifier(sources.get(column, column))} AS {quote_identifier(column)}"
+            if sources.get(column, column) in existing else f"NULL::VARCHAR AS {quote_identifier(column)}"
+            for column in columns
+        )
+        return conn.execute(
+            f"COPY (SELECT {projection} FROM {source_sql}) TO {quote_literal(Path(target_path).as_posix())} (HEADER, DELIMITER ',')"
+        ).fetchone()[0]
+    finally:
+        conn.close()
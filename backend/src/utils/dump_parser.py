@@ -0,0 +1,413 @@
+"""
+In-process parser of the psql-style `|`-separated dumps.
+
+Reproduces the rules of the native data_processor without its line and column
+limits:
+
+- lines made only of `-`, `+`, `|` and spaces (separators, blank lines) are skipped
+- the header is the first other line, its non-empty cells are the columns
+- fields are split on `|` (consecutive separators count as one, like strtok)
+  and trimmed; missing fields are empty and extra fields are dropped
+- rows without any meaningful value are skipped
+
+The data is cut into line-aligned blocks parsed concurrently by a thread pool.
+Each block is parsed with Arrow and numpy kernels that release the GIL into a
+record batch of string columns; batches are yielded in file order. Compressed
+dumps and dumps in another encoding than UTF-8 are read sequentially,
+decompressed and transcoded by a reader thread that hands its blocks to the
+same pool; so is the rest of a dump sampled as UTF-8 from its first block
+that is not.
+"""
+
+import codecs
+import io
+import logging
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from src.utils.compressed_input import DecompressedInput
+from src.utils.parallel_enrichment import split_line_ranges
+from src.utils.settings import Config
+from src.utils.transcoding import EncodingError, TranscodedInput
+
+logger = logging.getLogger(__name__)
+
+# Characters isspace() accepts in the C locale
+WHITESPACE = " \t\n\v\f\r"
+# Separator and blank lines (should_ignore_line)
+IGNORED_LINE_PATTERN = r"^[-+|" + WHITESPACE + r"]*$"
+# Values made only of these characters are not meaningful (has_meaningful_content)
+SEPARATOR_CHARACTERS = "-|+." + WHITESPACE
+
+
+def _is_ignored(line: str) -> bool:
+    return all(char in "-+|" + WHITESPACE for char in line)
+
+
+def _is_meaningful(value: str) -> bool:
+    return bool(value.strip(SEPARATOR_CHARACTERS))
+
+
+def _csv_field(value: str) -> str:
+    """Quote a value like the native processor's write_csv_field"""
+    if "," in value or '"' in value:
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def _csv_lines(batch: pa.RecordBatch) -> pa.Buffer:
+    """CSV lines of a record batch of string columns, each value quoted like _csv_field"""
+    fields = []
+    for column in batch.columns:
+        needs_quotes = pc.or_(pc.match_substring(column, ","), pc.match_substring(column, '"'))
+        if pc.any(needs_quotes).as_py():
+            quoted = pc.binary_join_element_wise('"', pc.replace_substring(column, '"', '""'), '"', "")
+            column = pc.if_else(needs_quotes, quoted, column)
+        fields.append(column)
+    fields[-1] = pc.binary_join_element_wise(fields[-1], "", "\n")
+    lines = pc.binary_join_element_wise(*fields, ",")
+    # The lines are contiguous in the data buffer of the array
+    offsets = np.frombuffer(lines.buffers()[1], dtype=np.int32)[lines.offset:lines.offset + len(lines) + 1]
+    return lines.buffers()[2][offsets[0]:offsets[-1]]
+
+
+def _header_columns(line: str) -> Optional[List[str]]:
+    """
+    Column names of a header line as written by the native processor
+    (duplicates kept), None for a line that is not a header.
+    """
+    if _is_ignored(line):
+        return None
+    names = [name.strip(WHITESPACE) for name in line.split("|") if name]
+    names = [name for name in names if name and _is_meaningful(name)]
+    return names or None
+
+
+def pandas_column_names(columns: List[str]) -> List[str]:
+    """Names pandas gives to `columns` when reading them from a CSV header, duplicates renamed ("A.1")"""
+    header_line = ",".join(_csv_field(name) for name in columns)
+    return pd.read_csv(io.StringIO(header_line), nrows=0).columns.tolist()
+
+
+def read_dump_header(path) -> Tuple[List[str], int]:
+    """
+    Find the header of a dump.
+
+    Returns:
+        (column names, offset of the first data line)
+
+    Raises:
+        ValueError: The file has no header line
+    """
+    with open(path, "rb") as f:
+        for raw_line in f:
+            columns = _header_columns(raw_line.decode("utf-8").rstrip("\n"))
+            if columns:
+                return columns, f.tell()
+    raise ValueError("No header line found in the dump")
+
+
+def read_stream_header(stream, block_size: Optional[int] = None) -> Tuple[List[str], bytes]:
+    """
+    Find the header of a dump read sequentially from `stream` (read(size)).
+
+    Returns:
+        (column names, data already read past the header line)
+
+    Raises:
+        ValueError: The dump has no header line
+    """
+    block_size = block_size or Config.PARSER_BLOCK_SIZE
+    data = b""
+    while True:
+        end = data.find(b"\n")
+        if end < 0:
+            block = stream.read(block_size)
+            if block:
+                data += block
+                continue
+            if not data:
+                raise ValueError("No header line found in the dump")
+            # Last line, without a newline
+            end = len(data)
+        line, data = data[:end], data[end + 1:]
+        columns = _header_columns(line.decode("utf-8"))
+        if columns:
+            return columns, data
+
+
+def parse_dump_block(data: bytes, columns: List[str]) -> pa.RecordBatch:
+    """Parse a block of complete dump lines into a record batch of string columns"""
+    # Lines as a zero-copy string array over the block, newlines included
+    # (they are whitespace for every rule below)
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    offsets = np.flatnonzero(buffer == ord("\n")) + 1
+    if not len(offsets) or offsets[-1] != len(buffer):
+        offsets = np.append(offsets, len(buffer))
+    offsets = np.concatenate(([0], offsets)).astype(np.int32)
+    lines = pa.StringArray.from_buffers(len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(data))
+    try:
+        lines.validate(full=True)
+    except pa.ArrowInvalid as e:
+        raise EncodingError(f"Dump is not valid UTF-8: {e}")
+
+    lines = lines.filter(pc.invert(pc.match_substring_regex(lines, IGNORED_LINE_PATTERN)))
+    row_count = len(lines)
+
+    # Fields split on "|", empty tokens dropped like strtok does
+    tokens = pc.split_pattern(lines, "|")
+    token_counts = pc.list_value_length(tokens).to_numpy(zero_copy_only=False)
+    values = pc.list_flatten(tokens)
+    kept = pc.greater(pc.binary_length(values), 0)
+    values = pc.ascii_trim_whitespace(values.filter(kept))
+    rows = np.repeat(np.arange(row_count), token_counts)[kept.to_numpy(zero_copy_only=False)]
+
+    # Position of each field in its row, fields beyond the header are dropped
+    row_sizes = np.bincount(rows, minlength=row_count)
+    positions = np.arange(len(rows)) - (np.cumsum(row_sizes) - row_sizes)[rows]
+    in_header = positions < len(columns)
+
+    # Rows with at least one meaningful field among the header columns
+    meaningful = pc.greater(
+        pc.binary_length(pc.ascii_trim(values, SEPARATOR_CHARACTERS)), 0
+    ).to_numpy(zero_copy_only=False)
+    meaningful_rows = np.bincount(rows[in_header & meaningful], minlength=row_count) > 0
+
+    # Value index of every (column, row), -1 for missing fields
+    indices = np.full((len(columns), row_count), -1, dtype=np.int64)
+    indices[positions[in_header], rows[in_header]] = np.flatnonzero(in_header)
+    arrays = [
+        pc.take(values, pa.array(column_indices, mask=column_indices < 0)).fill_null("")
+        for column_indices in indices
+    ]
+
+    batch = pa.RecordBatch.from_arrays(arrays, names=columns)
+    return batch.filter(pa.array(meaningful_rows))
+
+
+def parser_workers(size: int) -> int:
+    """Parsers worth running on `size` bytes: one per Config.PARSER_MIN_BYTES_PER_WORKER, up to Config.PARSER_WORKERS"""
+    return max(1, min(Config.PARSER_WORKERS, size // Config.PARSER_MIN_BYTES_PER_WORKER))
+
+
+def iter_dump_batches(
+    path,
+    columns: List[str],
+    data_start: int,
+    block_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    on_block: Optional[Callable[[int], None]] = None
+) -> Iterator[pa.RecordBatch]:
+    """
+    Parse the data lines of a dump, from `data_start`, into record batches in
+    file order. Blocks of about `block_size` bytes are parsed by `workers`
+    threads (adapted to the size of the dump by default), with at most two
+    blocks per worker held in memory.
+    `on_block(bytes_parsed)` is called after each block.
+    """
+    block_size = block_size or Config.PARSER_BLOCK_SIZE
+    size = os.path.getsize(path)
+    workers = workers or parser_workers(size - data_start)
+    ranges = split_line_ranges(path, max(workers, -(-(size - data_start) // block_size)), data_start)
+
+    def parse_range(start: int, end: int) -> pa.RecordBatch:
+        with open(path, "rb") as f:
+            f.seek(start)
+            return parse_dump_block(f.read(end - start), columns)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        remaining = iter(ranges)
+        for start, end in remaining:
+            pending.append((end, executor.submit(parse_range, start, end)))
+            if len(pending) >= 2 * workers:
+                break
+        while pending:
+            end, future = pending.popleft()
+            batch = future.result()
+            for start, next_end in remaining:
+                pending.append((next_end, executor.submit(parse_range, start, next_end)))
+                break
+            if on_block:
+                on_block(end)
+            yield batch
+
+
+def iter_stream_batches(
+    stream,
+    columns: List[str],
+    data: bytes = b"",
+    block_size: Optional[int] = None,
+    workers: Optional[int] = None,
+    on_block: Optional[Callable[[int], None]] = None,
+    position: Optional[Callable[[], int]] = None
+) -> Iterator[pa.RecordBatch]:
+    """
+    Parse the data lines of a dump read sequentially from `stream`, after
+    `data` already read, into record batches in order. A reader thread cuts
+    the stream into line-aligned blocks of about `block_size` bytes, parsed
+    by `workers` threads while it reads the next ones, with at most two
+    blocks per worker in flight.
+    `on_block(position())` is called after each block (bytes read by default).
+    """
+    block_size = block_size or Config.PARSER_BLOCK_SIZE
+    workers = workers or Config.PARSER_WORKERS
+    blocks = queue.Queue(maxsize=2 * workers)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Gives up when the consumer has stopped
+        while not stop.is_set():
+            try:
+                blocks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_blocks(executor: ThreadPoolExecutor) -> None:
+        pending, read = data, len(data)
+        try:
+            while not stop.is_set():
+                block = stream.read(block_size)
+                read += len(block)
+                if block:
+                    pending += block
+                    cut = pending.rfind(b"\n") + 1
+                    if not cut:
+                        # Line longer than a block
+                        continue
+                    complete, pending = pending[:cut], pending[cut:]
+                else:
+                    complete, pending = pending, b""
+                if complete:
+                    future = executor.submit(parse_dump_block, complete, columns)
+                    if not put((future, position() if position else read)):
+                        return
+                if not block:
+                    break
+            put(None)
+        except BaseException as e:
+            put(e)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        reader = threading.Thread(target=read_blocks, args=(executor,), name="dump-reader", daemon=True)
+        reader.start()
+        try:
+            while (item := blocks.get()) is not None:
+                if isinstance(item, BaseException):
+                    raise item
+                future, consumed = item
+                batch = future.result()
+                if on_block:
+                    on_block(consumed)
+                yield batch
+        finally:
+            stop.set()
+            reader.join()
+
+
+def _utf8_dump_batches(
+    path,
+    columns: List[str],
+    data_start: int,
+    on_block: Optional[Callable[[int], None]] = None
+) -> Iterator[pa.RecordBatch]:
+    """
+    Record batches of a dump sampled as UTF-8, parsed in parallel. Its
+    encoding was only detected on samples: from the first block that is not
+    UTF-8, the rest is read sequentially and transcoded from the encoding
+    detected on that block.
+    """
+    resume = data_start
+
+    def parsed(end: int) -> None:
+        nonlocal resume
+        resume = end
+        if on_block:
+            on_block(end)
+
+    try:
+        yield from iter_dump_batches(path, columns, data_start, on_block=parsed)
+    except EncodingError as e:
+        logger.warning(f"{path} is not UTF-8 after byte {resume} ({e}), transcoding the rest")
+        with open(path, "rb") as f:
+            f.seek(resume)
+            stream = TranscodedInput(f, "utf-8", detect=True)
+            yield from iter_stream_batches(stream, columns, on_block=on_block, position=f.tell)
+
+
+@contextmanager
+def dump_batches(
+    path,
+    compression: Optional[str] = None,
+    on_block: Optional[Callable[[int], None]] = None,
+    encoding: str = "utf-8"
+) -> Iterator[Tuple[List[str], Iterator[pa.RecordBatch]]]:
+    """
+    Columns and record batches of a dump, uncompressed or compressed with
+    `compression` (see compressed_input), in `encoding` (transcoded to UTF-8
+    while read). `on_block(bytes)` is called with the bytes of `path`
+    consumed after each block.
+
+    Raises:
+        ValueError: The dump has no header, is not in its encoding or is corrupt
+    """
+    utf8 = codecs.lookup(encoding).name == "utf-8"
+    if compression is None and utf8:
+        columns, data_start = read_dump_header(path)
+        batches = _utf8_dump_batches(path, columns, data_start, on_block)
+        try:
+            yield columns, batches
+        finally:
+            batches.close()
+        return
+
+    with ExitStack() as stack:
+        if compression:
+            stream = stack.enter_context(DecompressedInput(path, compression))
+            position = stream.compressed_position
+        else:
+            stream = stack.enter_context(open(path, "rb"))
+            position = stream.tell
+        # The encoding was detected on samples: a dump sampled as UTF-8 may not be after them
+        stream = TranscodedInput(stream, encoding, detect=True)
+        columns, data = read_stream_header(stream)
+        batches = iter_stream_batches(stream, columns, data, on_block=on_block, position=position)
+        try:
+            yield columns, batches
+        finally:
+            # Stops the reader thread before the stream is closed
+            batches.close()
+
+
+def parse_dump_to_csv(
+    input_path,
+    output_path,
+    on_block: Optional[Callable[[int], None]] = None,
+    compression: Optional[str] = None,
+    encoding: str = "utf-8"
+) -> int:
+    """
+    Write a dump, possibly compressed or in another encoding, as the UTF-8 CSV
+    the native processor would produce, byte for byte (for the engines that
+    read a file).
+    Returns the number of data rows.
+    """
+    rows = 0
+    with dump_batches(input_path, compression, on_block, encoding) as (columns, batches), open(output_path, "wb") as f:
+        f.write((",".join(_csv_field(name) for name in columns) + "\n").encode("utf-8"))
+        for batch in batches:
+            if batch.num_rows:
+                f.write(_csv_lines(batch))
+            rows += batch.num_rows
+    logger.info(f"Parsed {input_path}: {rows} rows, {len(columns)} columns")
+    return rows
@@ -2,114 +2,117 @@ import datetime
 import pandas as pd
 import traceback
 import logging
-import chardet
+import os
+from typing import Optional
+from src.utils.settings import Config
+from src.utils.compressed_input import DecompressedInput
+from src.utils.transcoding import detect_sample_encoding
+from src.utils.coverage import CoverageReport
+from src.utils.numbering_plan import NumberingPlan
+from src.utils.operator_index import OperatorIndex, SegmentIndex, parse_record_dates
+from src.utils.phone_numbers import DEFAULT_COUNTRY_CODE, normalize_phone_numbers
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-def join_operator_data(output_path, mapping_path):
+# Columns added to the processor output by the operator join
+OPERATOR_COLUMNS = ['Operateur', 'Statut_Operateur']
+
+def enrich_operator_batch(df: pd.DataFrame, numbering_plan: NumberingPlan, as_of_column: Optional[str] = None,
+                          coverage: Optional[CoverageReport] = None) -> pd.DataFrame:
+    """
+    Add the Operateur and Statut_Operateur columns to a batch of processor output rows.
+    
+    Every row is kept: numbers are resolved against the index of their country
+    and Statut_Operateur tells whether they were resolved, unmatched, from a
+    country without numbering plan or malformed. French numbers have TELEPHONE
+    rewritten as the national number. With range indexes and `as_of_column`,
+    each number gets the attribution valid at the date of that column.
+    When `coverage` is given, the batch is counted into it.
+    """
+    # Normalize numbers into country code and national number
+    country_codes, national_numbers = normalize_phone_numbers(df['TELEPHONE'])
+    
+    # Resolve every number against its country's index in one dispatch pass
+    dates = None
+    if as_of_column and as_of_column in df.columns:
+        dates = parse_record_dates(df[as_of_column])
+    operators, statuses, lengths = numbering_plan.resolve(country_codes, national_numbers, dates, return_lengths=True)
+    if coverage is not None:
+        coverage.add_batch(statuses, lengths, CoverageReport.empty_mask(df['TELEPHONE']))
+    
+    # French numbers are stored without their country code
+    french = country_codes == DEFAULT_COUNTRY_CODE
+    telephone = df['TELEPHONE'].mask(french, national_numbers.astype(str))
+    
+    result = df.assign(TELEPHONE=telephone, Operateur=operators, Statut_Operateur=statuses)
+    
+    # Keep the original columns plus the operator columns
+    columns_to_keep = df.columns.tolist()
+    columns_to_keep += [col for col in OPERATOR_COLUMNS if col not in columns_to_keep]
+    return result[columns_to_keep]
+
+def join_operator_data(output_path, mapping, batch_size: Optional[int] = None, as_of_column: Optional[str] = None,
+                       coverage: Optional[CoverageReport] = None):
     """
     Join operator data from the mapping file to the output CSV
     
+    The output is streamed in batches of `batch_size` rows (Config.JOIN_BATCH_SIZE
+    by default), each enriched and appended to the result file, so memory stays
+    bounded by the batch size whatever the size of the input.
+    
     Args:
         output_path: Path to the output CSV file from the C executable
-        mapping_path: Path to the MAJNUM.csv file with operator information
+        mapping: NumberingPlan, compiled French operator index, or path to the MAJNUM.csv file with operator information
+        batch_size: Number of rows read, enriched and written at a time
+        as_of_column: Date column used to pick the attribution valid at that date (range index only)
+        coverage: Report filled with the match-coverage counters of every batch
     
     Returns:
         Path to the processed file with operator information
     """
     try:
-        logger.info(f"Joining operator data to {output_path} using {mapping_path}")
-        
-        # Read the output CSV
-        df = pd.read_csv(output_path, low_memory=False)
+        batch_size = batch_size or Config.JOIN_BATCH_SIZE
+        logger.info(f"Joining operator data to {output_path} in batches of {batch_size} rows")
         
         # Ensure TELEPHONE column exists
-        if 'TELEPHONE' not in df.columns:
+        header = pd.read_csv(output_path, nrows=0)
+        if 'TELEPHONE' not in header.columns:
             logger.error(f"TELEPHONE column not found in {output_path}")
             return None
-            
-        df['TELEPHONE'] = df['TELEPHONE'].astype(str)
-        df['TELEPHONE'] = df['TELEPHONE'].str.replace('+', '')
-        df['TELEPHONE'] = df['TELEPHONE'].str.replace('.0', '')
-        
-        # Read the operator data
-        operateur = pd.read_csv(
-            mapping_path,
-            encoding='ISO-8859-1',
-            sep=';'
-        )
-        
-        # Check if required columns exist in the mapping file
-        required_columns = ["Tranche_Debut", "Tranche_Fin", "Date_Attribution", "EZABPQM", "Mnémo"]
-        missing_columns = [col for col in required_columns if col not in operateur.columns]
-        if missing_columns:
-            logger.error(f"Missing columns in mapping file: {missing_columns}")
-            return None
-            
-        df_operateur_fr = operateur.drop(columns=["Tranche_Debut", "Tranche_Fin", "Date_Attribution"])
-        df_operateur_fr.rename(columns={"EZABPQM": "Prefixe"}, inplace=True)
-        df_operateur_fr.rename(columns={"Mnémo": "Operateur"}, inplace=True)
-        
-        # Create a list of phone number prefixes
-        liste_numeros_idrh = df["TELEPHONE"]
-        liste_numeros_idrh = liste_numeros_idrh.astype(str)
-        liste_numeros_idrh = [numero[:2] for numero in liste_numeros_idrh]
-        
-        # Filter French numbers (starting with "33")
-        liste_numeros_fr_idrh = [code for code in liste_numeros_idrh if code == "33"]
         
-        # Split into French and non-French numbers
-        df_numeros_fr_idrh = df[df["TELEPHONE"].str[:2].isin(liste_numeros_fr_idrh)]
-        df_numero_etrangers = df[~df["TELEPHONE"].str[:2].isin(liste_numeros_fr_idrh)]
-        
-        # Remove the country code from French numbers
-        df_numeros_fr_idrh['TELEPHONE'] = df_numeros_fr_idrh['TELEPHONE'].str.replace(r'^33', '', regex=True)
-        
-        # Add length of phone numbers
-        df_numeros_fr_idrh["Longueur_numero_telephone"] = df_numeros_fr_idrh["TELEPHONE"].str.len()
-        df_operateur_fr['Prefixe'] = df_operateur_fr['Prefixe'].astype(str)
-        
-        # Split operators by prefix length
-        df_operateur_fr_7 = df_operateur_fr[df_operateur_fr["Prefixe"].str.len() == 7]
-        df_operateur_fr_6 = df_operateur_fr[df_operateur_fr["Prefixe"].str.len() == 6]
-        df_operateur_fr_5 = df_operateur_fr[df_operateur_fr["Prefixe"].str.len() == 5]
-        df_operateur_fr_4 = df_operateur_fr[df_operateur_fr["Prefixe"].str.len() == 4]
-        df_operateur_fr_3 = df_operateur_fr[df_operateur_fr["Prefixe"].str.len() == 3]
-        
-        # Extract prefixes of different lengths
-        df_numeros_fr_idrh['Prefixe_7'] = df_numeros_fr_idrh['TELEPHONE'].str[:7]
-        df_numeros_fr_idrh['Prefixe_6'] = df_numeros_fr_idrh['TELEPHONE'].str[:6]
-        df_numeros_fr_idrh['Prefixe_5'] = df_numeros_fr_idrh['TELEPHONE'].str[:5]
-        df_numeros_fr_idrh['Prefixe_4'] = df_numeros_fr_idrh['TELEPHONE'].str[:4]
-        df_numeros_fr_idrh['Prefixe_3'] = df_numeros_fr_idrh['TELEPHONE'].str[:3]
-        
-        # Match each prefix length
-        result_idrh_7 = df_numeros_fr_idrh.merge(df_operateur_fr_7, left_on='Prefixe_7', right_on='Prefixe', how='inner')
-        result_idrh_6 = df_numeros_fr_idrh.merge(df_operateur_fr_6, left_on='Prefixe_6', right_on='Prefixe', how='inner')
-        result_idrh_5 = df_numeros_fr_idrh.merge(df_operateur_fr_5, left_on='Prefixe_5', right_on='Prefixe', how='inner')
-        result_idrh_4 = df_numeros_fr_idrh.merge(df_operateur_fr_4, left_on='Prefixe_4', right_on='Prefixe', how='inner')
-        result_idrh_3 = df_numeros_fr_idrh.merge(df_operateur_fr_3, left_on='Prefixe_3', right_on='Prefixe', how='inner')
-        
-        # Combine all results
-        result_idrh = pd.concat([result_idrh_3, result_idrh_4, result_idrh_5], axis=0)
-        
-        # Keep only the original columns plus the Operateur column
-        original_columns = df.columns.tolist()
-        if 'Operateur' not in original_columns:
-            columns_to_keep = original_columns + ['Operateur']
+        # Build the longest-prefix index over the operator data unless it is already compiled
+        if isinstance(mapping, NumberingPlan):
+            numbering_plan = mapping
+        elif isinstance(mapping, SegmentIndex):
+            numbering_plan = NumberingPlan.for_country(mapping)
         else:
-            columns_to_keep = original_columns
-            
-        # Filter to keep only necessary columns
-        result_columns = [col for col in columns_to_keep if col in result_idrh.columns]
-        result_idrh = result_idrh[result_columns]
+            try:
+                numbering_plan = NumberingPlan.for_country(OperatorIndex.from_mapping_file(mapping))
+            except ValueError as e:
+                logger.error(str(e))
+                return None
         
-        # Save the result
         processed_output_path = str(output_path).replace('.csv', '_with_operators.csv')
-        result_idrh.to_csv(processed_output_path, index=False)
         
-        logger.info(f"Operator data joined successfully, saved to {processed_output_path}")
+        # Read everything as text so that values are written back untouched
+        reader = pd.read_csv(output_path, dtype=str, keep_default_na=False, chunksize=batch_size)
+        rows_read = 0
+        rows_written = 0
+        header_written = False
+        with open(processed_output_path, 'w', newline='') as output:
+            for batch in reader:
+                result = enrich_operator_batch(batch, numbering_plan, as_of_column, coverage)
+                result.to_csv(output, index=False, header=not header_written)
+                header_written = True
+                rows_read += len(batch)
+                rows_written += len(result)
+            
+            # Keep the header even when the input has no rows
+            if not header_written:
+                enrich_operator_batch(header.astype(str), numbering_plan).to_csv(output, index=False)
+        
+        logger.info(f"Operator data joined successfully ({rows_written}/{rows_read} rows), saved to {processed_output_path}")
         return processed_output_path
     
     except Exception as e:
@@ -161,10 +164,38 @@ def clean_datetime(value):
     except:
         return None
 
-def detect_encoding(file_path):
+def _encoding_samples(file_path, compression: Optional[str] = None, sample_size: Optional[int] = None):
+    """
+    Windows of `sample_size` bytes taken from the start, middle and end of a
+    file, or the first three of a compressed file (read sequentially)
+    """
+    sample_size = sample_size or Config.ENCODING_SAMPLE_SIZE
+    if compression:
+        with DecompressedInput(file_path, compression) as stream:
+            for _ in range(3):
+                sample = stream.read(sample_size)
+                if not sample:
+                    return
+                yield sample
+        return
+
+    size = os.path.getsize(file_path)
     with open(file_path, 'rb') as file:
-        raw_data = file.read()
-    return chardet.detect(raw_data)['encoding']
+        if size <= 3 * sample_size:
+            yield file.read()
+            return
+        for offset in (0, (size - sample_size) // 2, size - sample_size):
+            file.seek(offset)
+            yield file.read(sample_size)
+
+def detect_encoding(file_path, compression: Optional[str] = None) -> str:
+    """
+    Encoding of a dump, detected on bounded samples instead of the whole file
+    (see _encoding_samples and transcoding.detect_sample_encoding)
+    """
+    encoding = detect_sample_encoding(_encoding_samples(file_path, compression))
+    logger.info(f"Encoding of {file_path}: {encoding}")
+    return encoding
 
 def clean_error_message(error_msg: str) -> str:
     """Clean and truncate error messages"""
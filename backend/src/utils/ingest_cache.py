@@ -0,0 +1,125 @@
+"""
+Cache of the processed outputs of ingest jobs, addressed by content.
+
+The key of an ingest input is the SHA-256 of the uploaded file, computed
+while it is saved, combined with the mappings of its numbering plan and the
+version and settings of the parse and enrich pipeline. A job whose key is
+cached skips parsing and enrichment: the cached output is linked in its place
+and committed at once. Segments record the key they were made from, so a
+resubmission whose key is already in the dataset is reported as already
+ingested without writing anything.
+
+Entries are directories published with a rename and removed least recently
+used first when the cache grows over its size limit. Outputs are hard links
+when possible: a segment and the entry it came from then share their data.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+from src.utils.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Bump when a change of the parse or enrich steps changes their output
+PIPELINE_VERSION = 1
+
+
+def link_or_copy(source: Path, destination: Path) -> None:
+    """Hard link `source` to `destination`, copied when links are not possible (other file system)"""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class IngestCache:
+    """Processed outputs stored under `root`, one directory per key"""
+
+    OUTPUT_FILE = "output.csv"
+    ENTRY_FILE = "entry.json"
+
+    def __init__(self, root, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def key(self, input_sha256: str, mappings: Dict[int, str]) -> str:
+        """Key of an input processed with the numbering plan made of `mappings` (country code → mapping id)"""
+        fields = {
+            "input": input_sha256,
+            "mappings": {str(country_code): mapping_id for country_code, mapping_id in mappings.items()},
+            "pipeline": PIPELINE_VERSION,
+            "match_mode": Config.OPERATOR_MATCH_MODE,
+            "as_of_column": Config.OPERATOR_AS_OF_COLUMN
+        }
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key: str, destination: Path) -> Optional[dict]:
+        """Link the cached output of `key` to `destination` and return its entry, None if not cached"""
+        directory = self.root / key
+        try:
+            with (directory / self.ENTRY_FILE).open() as f:
+                entry = json.load(f)
+            link_or_copy(directory / self.OUTPUT_FILE, destination)
+        except (OSError, ValueError):
+            # Not cached, or evicted meanwhile
+            return None
+        # Last use, for eviction
+        os.utime(directory / self.ENTRY_FILE)
+        return entry
+
+    def put(self, key: str, output_path: Path, entry: dict) -> None:
+        """Cache the processed output `output_path` (left in place) under `key`"""
+        if not self.enabled:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        temp_dir = self.root / f".{key}.{uuid.uuid4().hex}"
+        temp_dir.mkdir()
+        try:
+            link_or_copy(output_path, temp_dir / self.OUTPUT_FILE)
+            with (temp_dir / self.ENTRY_FILE).open("w") as f:
+                json.dump({**entry, "key": key, "pipeline": PIPELINE_VERSION, "createdAt": datetime.now().isoformat()}, f)
+            os.rename(temp_dir, self.root / key)
+            logger.info(f"Cached the processed output of {entry.get('filename')} as {key}")
+        except OSError:
+            # Already cached by another job
+            pass
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self._evict()
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            for directory in self.root.iterdir():
+                try:
+                    used = (directory / self.ENTRY_FILE).stat().st_mtime
+                    size = (directory / self.OUTPUT_FILE).stat().st_size
+                except OSError:
+                    # Being published or removed
+                    continue
+                entries.append((used, size, directory))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, directory in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                logger.info(f"Evicting cached output {directory.name} ({size / (1024 * 1024):.2f} MB)")
+                shutil.rmtree(directory, ignore_errors=True)
+                total -= size
+
+
+ingest_cache = IngestCache(Config.INGEST_CACHE_FOLDER, Config.INGEST_CACHE_MAX_BYTES)
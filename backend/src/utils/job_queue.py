@@ -0,0 +1,163 @@
+"""
+Asyncio scheduler for ingest jobs.
+
+Jobs wait in a priority queue (highest priority first, FIFO among equal
+priorities) and are run by a fixed pool of worker tasks. Stages that only
+touch a job's own files (upload, parse, enrich) run concurrently across jobs.
+Stages that write a dataset go through `dataset_turn`: writes to the same
+dataset are applied one at a time, in the order the jobs were started.
+"""
+
+import asyncio
+import itertools
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from src.utils.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetTurns:
+    """Ticket lock: holders enter in ticket order, unused tickets are skipped"""
+
+    def __init__(self):
+        self._next_ticket = 0
+        self._serving = 0
+        self._released: Set[int] = set()
+        self._changed = asyncio.Condition()
+
+    def take(self) -> int:
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        return ticket
+
+    @property
+    def busy(self) -> bool:
+        return self._serving < self._next_ticket
+
+    async def wait(self, ticket: int) -> None:
+        async with self._changed:
+            await self._changed.wait_for(lambda: self._serving == ticket)
+
+    async def release(self, ticket: int) -> None:
+        async with self._changed:
+            self._released.add(ticket)
+            while self._serving in self._released:
+                self._released.remove(self._serving)
+                self._serving += 1
+            self._changed.notify_all()
+
+
+class JobQueue:
+    """Priority queue of ingest jobs served by a bounded pool of workers"""
+
+    def __init__(self, workers: int):
+        self.workers = max(1, int(workers))
+        self._loop = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+        # Queue key (-priority, sequence) of the waiting jobs
+        self._pending: Dict[str, Tuple[int, int]] = {}
+        self._running: Dict[str, int] = {}
+        self._turns: Dict[str, DatasetTurns] = {}
+        # Dataset tickets of the running jobs
+        self._tickets: Dict[Tuple[str, str], int] = {}
+
+    def _ensure_started(self) -> None:
+        """Start the workers on the running event loop (once per loop)"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+
+        self._loop = loop
+        self._queue = asyncio.PriorityQueue()
+        self._pending = {}
+        self._running = {}
+        self._turns = {}
+        self._tickets = {}
+        self._tasks = [loop.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} ingest workers")
+
+    async def _worker(self, worker_id: int) -> None:
+        while True:
+            key, job_id, datasets, run, future = await self._queue.get()
+            self._pending.pop(job_id, None)
+            if future.cancelled():
+                self._queue.task_done()
+                continue
+
+            # Dataset turns follow the order in which jobs start
+            for dataset in datasets:
+                self._tickets[(job_id, dataset)] = self._turns.setdefault(dataset, DatasetTurns()).take()
+            self._running[job_id] = worker_id
+            logger.info(f"Worker {worker_id} starting job {job_id}")
+            try:
+                result = await run()
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                for dataset in datasets:
+                    ticket = self._tickets.pop((job_id, dataset), None)
+                    if ticket is not None:
+                        await self._turns[dataset].release(ticket)
+                self._running.pop(job_id, None)
+                self._queue.task_done()
+
+    def submit(
+        self,
+        job_id: str,
+        run: Callable[[], Awaitable],
+        priority: int = 0,
+        datasets: Tuple[str, ...] = ()
+    ) -> asyncio.Future:
+        """
+        Queue a job. `run` is called without arguments when a worker picks the
+        job up and may write `datasets` inside `dataset_turn`. The returned
+        future resolves to its result (or exception).
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        key = (-int(priority), next(self._sequence))
+        self._pending[job_id] = key
+        self._queue.put_nowait((key, job_id, tuple(datasets), run, future))
+        logger.info(f"Queued job {job_id} (priority {priority}, {len(self._pending)} waiting)")
+        return future
+
+    @asynccontextmanager
+    async def dataset_turn(self, job_id: str, dataset: str):
+        """Wait until the running job `job_id` may write `dataset`, then hold it"""
+        ticket = self._tickets.get((job_id, dataset))
+        if ticket is None:
+            raise RuntimeError(f"Job {job_id} was not submitted with dataset {dataset}")
+
+        turns = self._turns[dataset]
+        await turns.wait(ticket)
+        try:
+            yield
+        finally:
+            self._tickets.pop((job_id, dataset), None)
+            await turns.release(ticket)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Number of jobs that will start before `job_id`, None if it is not waiting"""
+        key = self._pending.get(job_id)
+        if key is None:
+            return None
+        return sum(1 for other in self._pending.values() if other < key)
+
+    def status(self) -> dict:
+        return {
+            "workers": self.workers,
+            "queued": len(self._pending),
+            "running": sorted(self._running),
+            "busy_datasets": sorted(dataset for dataset, turns in self._turns.items() if turns.busy)
+        }
+
+
+job_queue = JobQueue(Config.INGEST_WORKERS)
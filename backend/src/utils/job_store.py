@@ -0,0 +1,235 @@
+"""
+SQLite-backed store of ingest job statuses.
+
+Jobs are rows indexed by id and status, so any worker process can query
+them and they survive restarts. Progress updates are merged into an
+in-process write buffer and flushed in one transaction at most every
+`flush_interval` seconds; creations and status changes are written
+immediately. Finished jobs older than `ttl` seconds are evicted, so the
+table stays bounded however long the server runs.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from src.utils.settings import Config
+
+logger = logging.getLogger(__name__)
+
+FINISHED_STATUSES = ("completed", "failed")
+# Error of the jobs left unfinished by a restart
+INTERRUPTED_ERROR = "Traitement interrompu par le redémarrage du serveur"
+
+
+def process_start_time(pid: int) -> Optional[int]:
+    """
+    Start time of a process (clock ticks since boot), None if unknown. With
+    the pid it identifies the process, whose pid may be reused after it exits.
+    """
+    try:
+        with open(f"/proc/{pid}/stat", "rb") as f:
+            stat = f.read()
+        # Fields after the command name, which may contain spaces and parentheses
+        return int(stat[stat.rindex(b")") + 2:].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _process_running(pid: Optional[int], start_time: Optional[int] = None) -> bool:
+    """
+    Whether another process with this id is running, and is the one started at
+    `start_time` when known (not a later process given the same pid)
+    """
+    if not pid or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    if start_time is not None:
+        current = process_start_time(pid)
+        if current is not None and current != start_time:
+            return False
+    return True
+
+
+class JobStore:
+    """Persistent job statuses with batched progress writes and TTL eviction"""
+
+    def __init__(self, path, ttl: float, flush_interval: float):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        # Latest state of the jobs updated since the last flush
+        self._dirty: Dict[str, dict] = {}
+        self._last_flush = 0.0
+        self._last_eviction = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    data TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, updated_at)")
+            self._conn = conn
+        return self._conn
+
+    def _read(self, job_id: str) -> Optional[dict]:
+        row = self._connection().execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, jobs: List[dict]) -> None:
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                """
+                INSERT INTO jobs (job_id, status, created_at, updated_at, data) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (job_id) DO UPDATE SET
+                    status = excluded.status, updated_at = excluded.updated_at, data = excluded.data
+                """,
+                [
+                    (job["job_id"], job["status"], job.get("createdAt", now), now, json.dumps(job, ensure_ascii=False))
+                    for job in jobs
+                ]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def create(self, job_id: str, **fields) -> dict:
+        """Create a job, written immediately so that every worker sees it"""
+        # Jobs run in the process creating them (read per job: workers may be forked after import)
+        pid = os.getpid()
+        job = {
+            "job_id": job_id,
+            "createdAt": time.time(),
+            "pid": pid,
+            "pid_start": process_start_time(pid),
+            **fields
+        }
+        with self._lock:
+            self._write([job])
+            self._evict_expired()
+        return job
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Current state of a job, None if unknown or evicted"""
+        with self._lock:
+            if job_id in self._dirty:
+                return dict(self._dirty[job_id])
+            return self._read(job_id)
+
+    def exists(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    def update(self, job_id: str, **fields) -> None:
+        """
+        Merge `fields` into a job. Status changes are flushed at once, other
+        updates within `flush_interval` seconds of the last flush are buffered.
+        """
+        with self._lock:
+            job = self._dirty.get(job_id) or self._read(job_id)
+            if job is None:
+                return
+
+            status_changed = "status" in fields and fields["status"] != job.get("status")
+            job.update(fields)
+            self._dirty[job_id] = job
+
+            if status_changed or time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def flush(self) -> None:
+        """Write all buffered updates in one transaction"""
+        with self._lock:
+            if self._dirty:
+                self._write(list(self._dirty.values()))
+                self._dirty.clear()
+            self._last_flush = time.monotonic()
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[dict]:
+        """Most recent jobs, optionally with a given status"""
+        with self._lock:
+            self.flush()
+            query = "SELECT data FROM jobs"
+            params = ()
+            if status:
+                query += " WHERE status = ?"
+                params = (status,)
+            query += " ORDER BY created_at DESC LIMIT ?"
+            rows = self._connection().execute(query, params + (limit,)).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def fail_interrupted(self) -> int:
+        """
+        Mark failed the unfinished jobs whose process is gone (the server was
+        restarted or crashed): nothing will run them. Called at startup, when
+        this process runs no job yet. Returns the number of jobs failed.
+        """
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        with self._lock:
+            self.flush()
+            rows = self._connection().execute(
+                f"SELECT data FROM jobs WHERE status NOT IN ({placeholders})", FINISHED_STATUSES
+            ).fetchall()
+            interrupted = []
+            for (data,) in rows:
+                job = json.loads(data)
+                if not _process_running(job.get("pid"), job.get("pid_start")):
+                    job.update(status="failed", error=INTERRUPTED_ERROR, message=INTERRUPTED_ERROR, position=None)
+                    interrupted.append(job)
+            if interrupted:
+                self._write(interrupted)
+                logger.warning(f"Marked {len(interrupted)} jobs interrupted by a restart as failed")
+        return len(interrupted)
+
+    def _evict_expired(self) -> None:
+        """
+        Delete finished jobs not updated for the TTL, and unfinished ones
+        (abandoned by a process that did not restart) not updated for four
+        times the TTL. Runs at most once a minute.
+        """
+        now = time.time()
+        if now - self._last_eviction < 60:
+            return
+        self._last_eviction = now
+
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        deleted = self._connection().execute(
+            f"DELETE FROM jobs WHERE updated_at < CASE WHEN status IN ({placeholders}) THEN ? ELSE ? END",
+            (*FINISHED_STATUSES, now - self.ttl, now - 4 * self.ttl)
+        ).rowcount
+        if deleted:
+            logger.info(f"Evicted {deleted} finished jobs older than {self.ttl / 3600:.0f}h")
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+job_store = JobStore(Config.JOB_STORE_PATH, Config.JOB_TTL, Config.JOB_FLUSH_INTERVAL)
@@ -0,0 +1,295 @@
+"""
+Persistent index of the record keys stored in the dataset, for deduplication
+on append.
+
+Keys live in a SQLite table (a B-tree keyed by the key itself), so checking a
+batch costs a lookup per candidate key instead of a scan of the dataset. A
+Bloom filter kept in a memory-mapped file sits in front of it: keys the
+filter has never seen are new for sure, so in the usual case of a batch
+without duplicates the table is not queried at all. The filter is rebuilt
+from the table, with twice the capacity, when it fills up.
+
+The index records which segments of the dataset it covers and catches up
+with the manifest before every check: segments it has not seen (a crash
+between the append and the indexing, a legacy file) are indexed, and when
+segments have been removed (new mode, upload, purge) it is rebuilt from the
+remaining ones.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from src.utils.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Keys of the two hash functions combined by double hashing (16 bytes each)
+HASH_KEYS = ("dedupbloomhash01", "dedupbloomhash02")
+# Keys looked up in one query
+LOOKUP_BATCH = 100_000
+
+
+def hash_keys(keys: np.ndarray):
+    """The two 64-bit hashes of every key"""
+    return tuple(pd.util.hash_array(keys, hash_key=hash_key) for hash_key in HASH_KEYS)
+
+
+def read_segment_keys(path, key_column: str, batch_size: Optional[int] = None) -> Iterable[np.ndarray]:
+    """Non-empty keys of a CSV segment, batch by batch (nothing if it has no key column)"""
+    if key_column not in pd.read_csv(path, nrows=0).columns:
+        return
+    for chunk in pd.read_csv(path, usecols=[key_column], dtype=str, keep_default_na=False,
+                             chunksize=batch_size or Config.JOIN_BATCH_SIZE):
+        keys = chunk[key_column].to_numpy(dtype=object)
+        yield keys[keys != ""]
+
+
+class BloomFilter:
+    """Bloom filter of 64-bit hash pairs, stored in a memory-mapped file"""
+
+    def __init__(self, path, capacity: int, fp_rate: float):
+        self.path = Path(path)
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.size += -self.size % 8
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        if not self.path.exists() or self.path.stat().st_size != self.size // 8:
+            with self.path.open("wb") as f:
+                f.truncate(self.size // 8)
+        self._bits = np.memmap(self.path, dtype=np.uint8, mode="r+")
+        # File the bits are mapped from, replaced when another process rebuilds the filter
+        self.inode = os.stat(self.path).st_ino
+
+    def _positions(self, hashes) -> np.ndarray:
+        first, second = hashes
+        second = second | np.uint64(1)
+        rounds = np.arange(self.hash_count, dtype=np.uint64)[:, None]
+        return (first[None, :] + rounds * second[None, :]) % np.uint64(self.size)
+
+    def add(self, hashes) -> None:
+        positions = self._positions(hashes).ravel()
+        np.bitwise_or.at(self._bits, positions >> np.uint64(3), np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+
+    def might_contain(self, hashes) -> np.ndarray:
+        """False for keys never added, True for keys added (and a few false positives)"""
+        positions = self._positions(hashes)
+        bits = (self._bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return bits.all(axis=0)
+
+    def flush(self) -> None:
+        self._bits.flush()
+
+    def close(self) -> None:
+        self.flush()
+        del self._bits
+
+
+class KeyIndex:
+    """Keys of the dataset in `root`: SQLite table of keys behind a Bloom filter"""
+
+    def __init__(self, root, key_column: Optional[str], fp_rate: float, min_capacity: int):
+        self.root = Path(root)
+        self.key_column = key_column
+        self.fp_rate = fp_rate
+        self.min_capacity = min_capacity
+        self._conn: Optional[sqlite3.Connection] = None
+        self._bloom: Optional[BloomFilter] = None
+        self._lock = threading.RLock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.key_column)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.root / "keys.sqlite3"), check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY) WITHOUT ROWID")
+            conn.execute("CREATE TABLE IF NOT EXISTS segments (file TEXT PRIMARY KEY)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value)")
+            self._conn = conn
+        return self._conn
+
+    def _meta(self, name: str, default=None):
+        row = self._connection().execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, name: str, value) -> None:
+        self._connection().execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._meta("count", 0)
+
+    def _bloom_filter(self, capacity: Optional[int] = None) -> BloomFilter:
+        """
+        The Bloom filter, (re)built from the table when missing or too small for
+        `capacity` keys. The mapped file is reopened when another process has
+        rebuilt it (new capacity or new file).
+        """
+        capacity = capacity or self.count()
+        current = self._meta("bloom_capacity")
+        path = self.root / "keys.bloom"
+        if current is not None and capacity <= current:
+            try:
+                inode = path.stat().st_ino
+            except FileNotFoundError:
+                inode = None
+            if inode is not None:
+                if self._bloom is None or self._bloom.capacity != current or self._bloom.inode != inode:
+                    if self._bloom is not None:
+                        self._bloom.close()
+                    self._bloom = BloomFilter(path, current, self.fp_rate)
+                return self._bloom
+
+        new_capacity = max(self.min_capacity, 2 * capacity)
+        logger.info(f"Building the key Bloom filter for {new_capacity} keys")
+        if self._bloom is not None:
+            self._bloom.close()
+            self._bloom = None
+        # Built aside and renamed in, so that other processes never map a partial filter
+        temp_path = path.with_name(f".keys.bloom.{os.getpid()}")
+        temp_path.unlink(missing_ok=True)
+        bloom = BloomFilter(temp_path, new_capacity, self.fp_rate)
+        cursor = self._connection().execute("SELECT key FROM keys")
+        while rows := cursor.fetchmany(LOOKUP_BATCH):
+            bloom.add(hash_keys(np.array([row[0] for row in rows], dtype=object)))
+        bloom.close()
+        os.replace(temp_path, path)
+        self._bloom = BloomFilter(path, new_capacity, self.fp_rate)
+        self._set_meta("bloom_capacity", new_capacity)
+        return self._bloom
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        """Whether each key is already in the dataset"""
+        with self._lock:
+            found = np.zeros(len(keys), dtype=bool)
+            if not len(keys) or not self.count():
+                return found
+            candidates = np.flatnonzero(self._bloom_filter().might_contain(hash_keys(keys)))
+            if not len(candidates):
+                return found
+
+            conn = self._connection()
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS candidates (key TEXT PRIMARY KEY) WITHOUT ROWID")
+            conn.execute("DELETE FROM candidates")
+            conn.executemany("INSERT OR IGNORE INTO candidates (key) VALUES (?)", ((key,) for key in keys[candidates]))
+            existing = {row[0] for row in conn.execute("SELECT key FROM candidates JOIN keys USING (key)")}
+            conn.execute("DELETE FROM candidates")
+            if existing:
+                found[candidates] = [key in existing for key in keys[candidates]]
+            return found
+
+    def add(self, keys: List[np.ndarray], segment_file: str) -> None:
+        """Index the keys of a segment, and record the segment as indexed, in one transaction"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            try:
+                added = 0
+                for batch in keys:
+                    before = conn.total_changes
+                    conn.executemany("INSERT OR IGNORE INTO keys (key) VALUES (?)", ((key,) for key in batch))
+                    added += conn.total_changes - before
+                conn.execute("INSERT OR IGNORE INTO segments (file) VALUES (?)", (segment_file,))
+                self._set_meta("count", self.count() + added)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+            # Rebuilt from the table when full, otherwise updated with the new keys only
+            current = self._meta("bloom_capacity")
+            if current is None or self.count() > current:
+                self._bloom_filter(self.count())
+            elif added:
+                bloom = self._bloom_filter()
+                for batch in keys:
+                    bloom.add(hash_keys(batch))
+                bloom.flush()
+
+    def reset(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM keys")
+            conn.execute("DELETE FROM segments")
+            conn.execute("DELETE FROM meta")
+            self._set_meta("key_column", self.key_column)
+            conn.execute("COMMIT")
+            if self._bloom is not None:
+                self._bloom.close()
+                self._bloom = None
+            (self.root / "keys.bloom").unlink(missing_ok=True)
+
+    def sync(self, manifest: dict, segment_dir: Path) -> None:
+        """Bring the index in line with the segments listed by `manifest`"""
+        with self._lock:
+            files = [segment["file"] for segment in manifest["segments"]]
+            indexed = {row[0] for row in self._connection().execute("SELECT file FROM segments")}
+            if not indexed.issubset(files) or self._meta("key_column") != self.key_column:
+                logger.info(f"Rebuilding the {self.key_column} index of {len(files)} segments")
+                self.reset()
+                indexed = set()
+            for file in files:
+                if file not in indexed:
+                    logger.info(f"Indexing {self.key_column} keys of segment {file}")
+                    self.add(list(read_segment_keys(segment_dir / file, self.key_column)), file)
+
+
+def drop_duplicate_rows(path, index: KeyIndex, batch_size: Optional[int] = None) -> Tuple[int, List[np.ndarray]]:
+    """
+    Remove from the CSV file `path` the rows whose key is already in `index`
+    or repeats an earlier row of the file. Rows without a key are kept. The
+    file is only rewritten when duplicates are found.
+
+    Returns:
+        (rows removed, keys of the rows kept, batch by batch)
+    """
+    key_column = index.key_column
+    if key_column not in pd.read_csv(path, nrows=0).columns:
+        logger.warning(f"No {key_column} column in {path}, duplicates are not checked")
+        return 0, []
+
+    batch_size = batch_size or Config.JOIN_BATCH_SIZE
+    kept_masks, kept_keys = [], []
+    seen = set()
+    removed = 0
+    for chunk in pd.read_csv(path, usecols=[key_column], dtype=str, keep_default_na=False, chunksize=batch_size):
+        keys = chunk[key_column].to_numpy(dtype=object)
+        present = np.flatnonzero(keys != "")
+        duplicate = np.zeros(len(keys), dtype=bool)
+        duplicate[present] = index.contains(keys[present])
+
+        # Repeats of a key within the file, earlier chunks included
+        candidates = present[~duplicate[present]]
+        repeated = pd.Series(keys[candidates]).duplicated().to_numpy()
+        repeated |= np.fromiter((key in seen for key in keys[candidates]), dtype=bool, count=len(candidates))
+        duplicate[candidates[repeated]] = True
+
+        new_keys = keys[candidates[~repeated]]
+        seen.update(new_keys)
+        kept_keys.append(new_keys)
+        kept_masks.append(~duplicate)
+        removed += int(duplicate.sum())
+
+    if removed:
+        deduplicated_path = f"{path}.dedup"
+        with open(deduplicated_path, "w", newline="") as output:
+            chunks = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=batch_size)
+            for number, (chunk, kept) in enumerate(zip(chunks, kept_masks)):
+                chunk[kept].to_csv(output, index=False, header=number == 0)
+        os.replace(deduplicated_path, path)
+        logger.info(f"Removed {removed} rows with a {key_column} already present from {path}")
+    return removed, kept_keys
+
+
+key_index = KeyIndex(Config.DATASET_FOLDER + "keys/", Config.DEDUP_KEY, Config.DEDUP_BLOOM_FP_RATE, Config.DEDUP_BLOOM_MIN_CAPACITY)
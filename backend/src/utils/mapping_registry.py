@@ -0,0 +1,265 @@
+"""
+Registry of operator mappings identified by the SHA-256 of their content.
+
+A mapping is compiled once into its operator indexes (prefix and range),
+stored under `Config.MAPPING_FOLDER/<mapping_id>/`. Ingest jobs refer to it by
+id and memory-map the indexes instead of re-uploading and re-parsing MAJNUM.csv.
+
+Each mapping belongs to a country code. The numbering plan of an ingest job
+combines the mapping it names with the latest mapping of every other country.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from src.utils.numbering_plan import NumberingPlan
+from src.utils.operator_index import OperatorIndex, OperatorRangeIndex, SegmentIndex
+from src.utils.phone_numbers import DEFAULT_COUNTRY_CODE
+from src.utils.settings import Config
+
+logger = logging.getLogger(__name__)
+
+MAPPING_ID_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+def hash_file(file_path, chunk_size: int = 4 * 1024 * 1024) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MappingConflictError(ValueError):
+    """Mapping already registered with other settings"""
+
+
+class MappingRegistry:
+    """Content-addressed store of compiled operator mappings"""
+
+    METADATA_FILE = "mapping.json"
+    SOURCE_FILE = "source.csv"
+    # Directory and class of each kind of compiled index
+    INDEX_KINDS = {
+        "prefix": ("index", OperatorIndex),
+        "range": ("ranges", OperatorRangeIndex)
+    }
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self._indexes: Dict[Tuple[str, str], SegmentIndex] = {}
+        # Resident numbering plans, keyed by (mapping id or None for the latest, kind)
+        self._plans: Dict[Tuple[Optional[str], str], Tuple[int, NumberingPlan, str]] = {}
+        self._lock = threading.Lock()
+
+    def _path(self, mapping_id: str) -> Path:
+        if not MAPPING_ID_PATTERN.fullmatch(mapping_id or ""):
+            raise ValueError(f"Invalid mapping id: {mapping_id}")
+        return self.root / mapping_id
+
+    def exists(self, mapping_id: str) -> bool:
+        """Check whether a mapping has been registered and compiled"""
+        try:
+            return (self._path(mapping_id) / self.METADATA_FILE).exists()
+        except ValueError:
+            return False
+
+    def register(
+        self,
+        source_path,
+        filename: Optional[str] = None,
+        country_code: int = DEFAULT_COUNTRY_CODE
+    ) -> Tuple[str, bool]:
+        """
+        Register a MAJNUM mapping file for the numbering plan of `country_code`.
+
+        Returns the mapping id and whether it was newly compiled. Raises
+        ValueError if the file is not a valid mapping, MappingConflictError
+        if the same file is already registered for another country.
+        """
+        mapping_id = hash_file(source_path)
+        target = self._path(mapping_id)
+        if self.exists(mapping_id):
+            self._check_country(mapping_id, country_code)
+            logger.info(f"Mapping already registered: {mapping_id}")
+            return mapping_id, False
+
+        # Compile into a staging directory, then publish it with a rename
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = self.root / f".staging_{uuid.uuid4().hex}"
+        try:
+            index = OperatorIndex.from_mapping_file(source_path)
+            index.save(staging / self.INDEX_KINDS["prefix"][0])
+            range_index = OperatorRangeIndex.from_mapping_file(source_path)
+            range_index.save(staging / self.INDEX_KINDS["range"][0])
+            shutil.copyfile(source_path, staging / self.SOURCE_FILE)
+
+            metadata = {
+                "mapping_id": mapping_id,
+                "filename": filename or Path(source_path).name,
+                "country_code": int(country_code),
+                "size": os.path.getsize(source_path),
+                "operators": len(index.operators),
+                "segments": len(index.bounds),
+                "createdAt": datetime.now().isoformat()
+            }
+            with open(staging / self.METADATA_FILE, "w", encoding="utf-8") as f:
+                json.dump(metadata, f, ensure_ascii=False)
+
+            try:
+                os.replace(staging, target)
+            except OSError:
+                # Registered concurrently by another worker
+                if not self.exists(mapping_id):
+                    raise
+                self._check_country(mapping_id, country_code)
+                return mapping_id, False
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging, ignore_errors=True)
+
+        logger.info(f"Registered mapping {mapping_id} ({metadata['operators']} operators)")
+        return mapping_id, True
+
+    def _check_country(self, mapping_id: str, country_code: int) -> None:
+        """A mapping id is one file for one country: registering it for another one is refused"""
+        registered = self.get(mapping_id)["country_code"]
+        if registered != int(country_code):
+            raise MappingConflictError(
+                f"Mapping {mapping_id} is already registered for country code {registered}, not {country_code}"
+            )
+
+    def get(self, mapping_id: str) -> Optional[dict]:
+        """Metadata of a registered mapping, None if unknown"""
+        if not self.exists(mapping_id):
+            return None
+        with open(self._path(mapping_id) / self.METADATA_FILE, encoding="utf-8") as f:
+            metadata = json.load(f)
+        
+        # Mappings registered before numbering plans were all French
+        metadata.setdefault("country_code", DEFAULT_COUNTRY_CODE)
+        return metadata
+
+    def list(self) -> List[dict]:
+        """Metadata of all registered mappings, most recent first"""
+        if not self.root.exists():
+            return []
+        mappings = [self.get(path.name) for path in self.root.iterdir() if self.exists(path.name)]
+        return sorted(mappings, key=lambda m: m["createdAt"], reverse=True)
+
+    def source_path(self, mapping_id: str) -> Path:
+        """Path to the original mapping file"""
+        return self._path(mapping_id) / self.SOURCE_FILE
+
+    def index_path(self, mapping_id: str, kind: str = "prefix") -> Path:
+        """Directory of a compiled index ("prefix" or "range")"""
+        return self._path(mapping_id) / self.INDEX_KINDS[kind][0]
+
+    def load_index(self, mapping_id: str, kind: str = "prefix") -> SegmentIndex:
+        """Memory-map a compiled index of a mapping ("prefix" or "range"), cached per process"""
+        if kind not in self.INDEX_KINDS:
+            raise ValueError(f"Unknown index kind: {kind}")
+        
+        with self._lock:
+            if (mapping_id, kind) not in self._indexes:
+                if not self.exists(mapping_id):
+                    raise KeyError(f"Unknown mapping: {mapping_id}")
+                
+                index_class = self.INDEX_KINDS[kind][1]
+                index_path = self.index_path(mapping_id, kind)
+                if not index_path.exists():
+                    # Mapping registered before this kind of index existed
+                    logger.info(f"Compiling missing {kind} index for mapping {mapping_id}")
+                    self._compile(index_class, mapping_id, index_path)
+                
+                self._indexes[(mapping_id, kind)] = index_class.load(index_path)
+            return self._indexes[(mapping_id, kind)]
+
+    def numbering_plan(self, mapping_id: str, kind: str = "prefix") -> NumberingPlan:
+        """
+        Numbering plan made of `mapping_id` for its own country and of the most
+        recently registered mapping of every other country.
+        """
+        plan = NumberingPlan()
+        for country_code, plan_mapping_id in self.plan_mappings(mapping_id).items():
+            plan.register(country_code, self.load_index(plan_mapping_id, kind))
+        return plan
+
+    def plan_mappings(self, mapping_id: str) -> Dict[int, str]:
+        """Id of the mapping used for each country by the numbering plan of `mapping_id`"""
+        own_country = self.get(mapping_id)
+        if own_country is None:
+            raise KeyError(f"Unknown mapping: {mapping_id}")
+
+        mappings = {}
+        for mapping in reversed(self.list()):
+            mappings[mapping["country_code"]] = mapping["mapping_id"]
+        mappings[own_country["country_code"]] = mapping_id
+        return mappings
+
+    def generation(self) -> int:
+        """
+        Changes whenever a mapping is registered: mappings are published by
+        renaming into the registry root, which updates its mtime.
+        """
+        try:
+            return self.root.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def latest(self, country_code: int = DEFAULT_COUNTRY_CODE) -> Optional[dict]:
+        """Metadata of the most recently registered mapping of a country, None if none"""
+        return next((m for m in self.list() if m["country_code"] == country_code), None)
+
+    def resident_plan(self, mapping_id: Optional[str] = None, kind: str = "prefix") -> Tuple[NumberingPlan, str]:
+        """
+        Numbering plan of `mapping_id` (the latest French mapping by default),
+        built once and kept until a mapping is registered.
+
+        Returns the plan and the id of the mapping it was built from. Raises
+        KeyError if there is no such mapping.
+        """
+        key = (mapping_id, kind)
+        generation = self.generation()
+        cached = self._plans.get(key)
+        if cached is not None and cached[0] == generation:
+            return cached[1], cached[2]
+
+        if mapping_id is None:
+            latest = self.latest()
+            if latest is None:
+                raise KeyError("No mapping registered")
+            resolved_id = latest["mapping_id"]
+        else:
+            resolved_id = mapping_id
+        plan = self.numbering_plan(resolved_id, kind)
+
+        logger.info(f"Loaded resident numbering plan from mapping {resolved_id} ({kind})")
+        self._plans[key] = (generation, plan, resolved_id)
+        return plan, resolved_id
+
+    def _compile(self, index_class, mapping_id: str, index_path: Path) -> None:
+        """Compile an index from the stored source file and publish it with a rename"""
+        staging = index_path.with_name(f".staging_{uuid.uuid4().hex}")
+        try:
+            index_class.from_mapping_file(self.source_path(mapping_id)).save(staging)
+            try:
+                os.replace(staging, index_path)
+            except OSError:
+                if not index_path.exists():
+                    raise
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging, ignore_errors=True)
+
+
+mapping_registry = MappingRegistry(Config.MAPPING_FOLDER)
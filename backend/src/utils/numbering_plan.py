@@ -0,0 +1,85 @@
+"""
+Numbering plans: one compiled operator index per country code.
+
+Normalized numbers are sorted once by country code and each group is resolved
+against its country's index, so foreign numbers are tagged rather than dropped.
+"""
+
+from typing import Dict, Optional
+import numpy as np
+from src.utils.operator_index import SegmentIndex
+from src.utils.phone_numbers import DEFAULT_COUNTRY_CODE, normalize_phone_numbers
+
+# Values of the Statut_Operateur column
+RESOLVED = "resolu"
+UNRESOLVED = "non_resolu"
+UNSUPPORTED_COUNTRY = "pays_non_supporte"
+MALFORMED = "invalide"
+# Statuses are computed as small integer codes, then translated once
+STATUS_VALUES = np.array([RESOLVED, UNRESOLVED, UNSUPPORTED_COUNTRY, MALFORMED], dtype=object)
+
+
+class NumberingPlan:
+    """Operator indexes keyed by country code"""
+
+    def __init__(self, indexes: Optional[Dict[int, SegmentIndex]] = None):
+        self.indexes: Dict[int, SegmentIndex] = dict(indexes or {})
+
+    @classmethod
+    def for_country(cls, index: SegmentIndex, country_code: int = DEFAULT_COUNTRY_CODE) -> "NumberingPlan":
+        """Plan with a single country"""
+        return cls({country_code: index})
+
+    def register(self, country_code: int, index: SegmentIndex) -> None:
+        """Add or replace the index of a country"""
+        self.indexes[int(country_code)] = index
+
+    @property
+    def country_codes(self):
+        return sorted(self.indexes)
+
+    def resolve(self, country_codes, national_numbers, dates=None, return_lengths: bool = False):
+        """
+        Resolve normalized numbers against the index of their country.
+
+        Args:
+            country_codes: Country codes from normalize_phone_numbers (0 if malformed)
+            national_numbers: National numbers from normalize_phone_numbers
+            dates: Optional datetime64 array for as-of resolution
+            return_lengths: Also return the matched prefix lengths (int8, 0 if none)
+
+        Returns:
+            (operators, statuses) object arrays aligned with the input, operators
+            being None and statuses telling why wherever nothing matched
+        """
+        country_codes = np.asarray(country_codes)
+        operators = np.empty(len(country_codes), dtype=object)
+        status_codes = np.full(len(country_codes), 2, dtype=np.int8)
+        lengths = np.zeros(len(country_codes), dtype=np.int8)
+
+        # Group rows by country once, then resolve each group with its index
+        order = np.argsort(country_codes, kind="stable")
+        sorted_codes = country_codes[order]
+        for country_code, index in self.indexes.items():
+            start = np.searchsorted(sorted_codes, country_code, side="left")
+            stop = np.searchsorted(sorted_codes, country_code, side="right")
+            if start == stop:
+                continue
+
+            rows = order[start:stop]
+            codes, lengths[rows] = index.lookup(
+                national_numbers[rows], None if dates is None else dates[rows], return_lengths=True
+            )
+            operators[rows] = index.operator_names(codes)
+            status_codes[rows] = np.where(codes >= 0, 0, 1)
+
+        status_codes[country_codes == 0] = 3
+        statuses = STATUS_VALUES[status_codes]
+        if return_lengths:
+            return operators, statuses, lengths
+        return operators, statuses
+
+    def resolve_numbers(self, values, dates=None):
+        """Normalize raw phone numbers and resolve them, returns (operators, statuses)"""
+        country_codes, national_numbers = normalize_phone_numbers(values)
+        return self.resolve(country_codes, national_numbers, dates)
@@ -0,0 +1,331 @@
+"""
+Operator lookup indexes built from the MAJNUM mapping file.
+
+Both indexes flatten the mapping into disjoint segments of the number space,
+so resolving a batch of numbers is a `searchsorted` over sorted arrays:
+
+- OperatorIndex lays the EZABPQM prefixes out as ranges over fixed-width keys,
+  each segment being owned by the most specific prefix that covers it.
+- OperatorRangeIndex uses the Tranche_Debut/Tranche_Fin number ranges and keeps
+  every attribution of a segment, ordered by Date_Attribution, so numbers can be
+  resolved as of a given date.
+"""
+
+import json
+import logging
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Options used to read the MAJNUM.csv mapping file
+MAPPING_READ_OPTIONS = {"encoding": "ISO-8859-1", "sep": ";"}
+REQUIRED_MAPPING_COLUMNS = ["Tranche_Debut", "Tranche_Fin", "Date_Attribution", "EZABPQM", "Mnémo"]
+
+# Powers of ten used to count digits and shift keys without leaving NumPy
+POW10 = 10 ** np.arange(19, dtype=np.int64)
+
+# Dates are stored as day numbers shifted to be positive, so that they can be
+# packed with a segment number into a single sortable int64 key
+DAY_OFFSET = 1 << 20
+LATEST_DAY = (1 << 32) - 1
+
+
+def count_digits(numbers: np.ndarray) -> np.ndarray:
+    """Number of decimal digits of each positive int64 (0 for values <= 0)"""
+    return np.searchsorted(POW10, numbers, side="right")
+
+
+def to_day_numbers(dates, missing: int) -> np.ndarray:
+    """Convert datetimes to shifted day numbers, `missing` where NaT"""
+    days = np.asarray(dates, dtype="datetime64[ns]").astype("datetime64[D]")
+    numbers = days.astype(np.int64) + DAY_OFFSET
+    numbers[np.isnat(days)] = missing
+    return numbers
+
+
+def parse_record_dates(values: pd.Series) -> np.ndarray:
+    """Parse the date part of record timestamps such as CREATED_DATE (NaT if invalid)"""
+    dates = pd.to_datetime(values.astype("string").str.slice(0, 10), format="%Y-%m-%d", errors="coerce")
+    return dates.to_numpy(dtype="datetime64[ns]")
+
+
+def parse_number_bounds(values: pd.Series) -> np.ndarray:
+    """Parse range bounds such as Tranche_Debut into national numbers (-1 if invalid)"""
+    text = values.astype("string").str.strip()
+    valid = text.str.fullmatch(r"[0-9]{1,18}").fillna(False).to_numpy(dtype=bool)
+    numbers = np.full(len(text), -1, dtype=np.int64)
+    numbers[valid] = text[valid].astype("int64").to_numpy()
+    return numbers
+
+
+def read_mapping_file(mapping_path) -> pd.DataFrame:
+    """Read a MAJNUM mapping file, keeping the prefixes and ranges as strings"""
+    mapping = pd.read_csv(
+        mapping_path,
+        dtype={"EZABPQM": str, "Tranche_Debut": str, "Tranche_Fin": str},
+        **MAPPING_READ_OPTIONS
+    )
+
+    missing_columns = [col for col in REQUIRED_MAPPING_COLUMNS if col not in mapping.columns]
+    if missing_columns:
+        raise ValueError(f"Missing columns in mapping file: {missing_columns}")
+
+    return mapping
+
+
+def _encode_operators(operators: pd.Series):
+    """Sorted operator names and the code of each row"""
+    return np.unique(operators.to_numpy(dtype=object), return_inverse=True)
+
+
+class SegmentIndex:
+    """Persistence and operator naming shared by the operator indexes"""
+
+    # Arrays persisted as one .npy file each so that they can be memory-mapped
+    ARRAY_FIELDS = ()
+    # Scalar attributes persisted in the metadata file
+    METADATA_FIELDS = ()
+    METADATA_FILE = "index.json"
+
+    def save(self, directory) -> None:
+        """Write the compiled index to `directory` as memory-mappable .npy files"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        for field in self.ARRAY_FIELDS:
+            np.save(directory / f"{field}.npy", np.ascontiguousarray(getattr(self, field)))
+
+        metadata = {field: getattr(self, field) for field in self.METADATA_FIELDS}
+        metadata["operators"] = [str(name) for name in self.operators]
+        with open(directory / self.METADATA_FILE, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory, mmap: bool = True):
+        """Load an index written by `save`, memory-mapping the arrays by default"""
+        directory = Path(directory)
+        with open(directory / cls.METADATA_FILE, encoding="utf-8") as f:
+            metadata = json.load(f)
+
+        mmap_mode = "r" if mmap else None
+        arrays = {field: np.load(directory / f"{field}.npy", mmap_mode=mmap_mode) for field in cls.ARRAY_FIELDS}
+        scalars = {field: metadata[field] for field in cls.METADATA_FIELDS}
+        operators = np.array(metadata["operators"], dtype=object)
+        return cls(operators=operators, **scalars, **arrays)
+
+    def operator_names(self, codes) -> np.ndarray:
+        """Translate operator codes to names (None for -1)"""
+        codes = np.asarray(codes)
+        names = np.empty(len(codes), dtype=object)
+        matched = codes >= 0
+        names[matched] = self.operators[codes[matched]]
+        return names
+
+
+class OperatorIndex(SegmentIndex):
+    """
+    Longest-prefix match index over the EZABPQM prefixes of a mapping.
+
+    Attributes:
+        bounds: Sorted segment start keys (int64), the first one is always 0
+        owners: Operator code owning each segment, -1 when no prefix covers it
+        prefix_lengths: Length of the prefix owning each segment (0 if none)
+        operators: Operator names, indexed by operator code
+        key_width: Number of leading digits used as lookup key
+    """
+
+    ARRAY_FIELDS = ("bounds", "owners", "prefix_lengths")
+    METADATA_FIELDS = ("key_width",)
+
+    def __init__(self, bounds, owners, prefix_lengths, operators, key_width):
+        self.bounds = bounds
+        self.owners = owners
+        self.prefix_lengths = prefix_lengths
+        self.operators = operators
+        self.key_width = int(key_width)
+
+    @classmethod
+    def from_mapping_file(cls, mapping_path) -> "OperatorIndex":
+        """Build the index from a MAJNUM.csv file"""
+        return cls.from_dataframe(read_mapping_file(mapping_path))
+
+    @classmethod
+    def from_dataframe(cls, mapping: pd.DataFrame) -> "OperatorIndex":
+        """Build the index from a mapping DataFrame with EZABPQM and Mnémo columns"""
+        # National numbers carry no trunk zero: "0612" is the prefix 612, as when EZABPQM is read as an int
+        prefixes = mapping["EZABPQM"].astype(str).str.strip().str.lstrip("0")
+        valid = prefixes.str.fullmatch(r"[0-9]{1,18}") & mapping["Mnémo"].notna()
+        if not valid.all():
+            logger.warning(f"Ignoring {int((~valid).sum())} mapping rows with an invalid prefix")
+
+        table = pd.DataFrame({
+            "prefix": prefixes[valid],
+            "operator": mapping.loc[valid, "Mnémo"].astype(str)
+        }).drop_duplicates(subset="prefix", keep="last")
+
+        operator_names, operator_codes = _encode_operators(table["operator"])
+        lengths = table["prefix"].str.len().to_numpy(dtype=np.int64)
+        values = table["prefix"].astype("int64").to_numpy()
+        key_width = int(lengths.max()) if len(lengths) else 1
+
+        # Each prefix covers [start, end) in the key space
+        starts = values * POW10[key_width - lengths]
+        ends = (values + 1) * POW10[key_width - lengths]
+        bounds = np.unique(np.concatenate([[0], starts, ends]))
+
+        owners = np.full(len(bounds), -1, dtype=np.int32)
+        prefix_lengths = np.zeros(len(bounds), dtype=np.int8)
+
+        # Shorter prefixes first so that longer ones overwrite the segments they cover
+        for length in np.unique(lengths):
+            selected = lengths == length
+            order = np.argsort(values[selected])
+            level_values = values[selected][order]
+            level_codes = operator_codes[selected][order]
+
+            truncated = bounds // POW10[key_width - length]
+            positions = np.searchsorted(level_values, truncated)
+            positions = np.minimum(positions, len(level_values) - 1)
+            hit = level_values[positions] == truncated
+
+            owners[hit] = level_codes[positions[hit]]
+            prefix_lengths[hit] = length
+
+        # Merge neighbouring segments that resolve identically
+        keep = np.ones(len(bounds), dtype=bool)
+        keep[1:] = (owners[1:] != owners[:-1]) | (prefix_lengths[1:] != prefix_lengths[:-1])
+
+        index = cls(bounds[keep], owners[keep], prefix_lengths[keep], operator_names, key_width)
+        logger.info(
+            f"Built operator index: {len(table)} prefixes, {len(operator_names)} operators, "
+            f"{len(index.bounds)} segments"
+        )
+        return index
+
+    def lookup(self, numbers, dates=None, return_lengths: bool = False):
+        """
+        Resolve national numbers (int64, without country code) to operator codes.
+
+        Prefixes carry no attribution date, so `dates` is ignored. Returns an
+        int32 array aligned with `numbers`, -1 where nothing matches, and with
+        `return_lengths` also the length of the matched prefix (0 if none).
+        """
+        numbers = np.asarray(numbers, dtype=np.int64)
+        digits = count_digits(numbers)
+
+        # Keep the first `key_width` digits, right-padding shorter numbers with zeros
+        shift = digits - self.key_width
+        keys = np.where(
+            shift >= 0,
+            numbers // POW10[np.clip(shift, 0, None)],
+            numbers * POW10[np.clip(-shift, 0, None)]
+        )
+
+        segments = np.searchsorted(self.bounds, keys, side="right") - 1
+        codes = self.owners[segments]
+
+        # A number shorter than the matched prefix cannot belong to it
+        codes[(numbers <= 0) | (digits < self.prefix_lengths[segments])] = -1
+        if return_lengths:
+            return codes, np.where(codes >= 0, self.prefix_lengths[segments], 0).astype(np.int8)
+        return codes
+
+
+class OperatorRangeIndex(SegmentIndex):
+    """
+    Interval index over the Tranche_Debut/Tranche_Fin ranges of a mapping.
+
+    The range bounds cut the number space into disjoint segments. Every
+    attribution covering a segment is kept as a version whose key packs the
+    segment number (high 32 bits) with its attribution day (low 32 bits), so a
+    single searchsorted finds the attribution valid at a given date.
+
+    Attributes:
+        bounds: Sorted segment start numbers (int64), the first one is always 0
+        version_keys: Sorted (segment, attribution day) keys of the attributions
+        version_owners: Operator code of each attribution
+        operators: Operator names, indexed by operator code
+    """
+
+    ARRAY_FIELDS = ("bounds", "version_keys", "version_owners")
+
+    def __init__(self, bounds, version_keys, version_owners, operators):
+        self.bounds = bounds
+        self.version_keys = version_keys
+        self.version_owners = version_owners
+        self.operators = operators
+
+    @classmethod
+    def from_mapping_file(cls, mapping_path) -> "OperatorRangeIndex":
+        """Build the index from a MAJNUM.csv file"""
+        return cls.from_dataframe(read_mapping_file(mapping_path))
+
+    @classmethod
+    def from_dataframe(cls, mapping: pd.DataFrame) -> "OperatorRangeIndex":
+        """Build the index from a mapping DataFrame with Tranche_Debut, Tranche_Fin, Date_Attribution and Mnémo columns"""
+        starts = parse_number_bounds(mapping["Tranche_Debut"])
+        ends = parse_number_bounds(mapping["Tranche_Fin"])
+        valid = (starts >= 0) & (ends >= starts) & mapping["Mnémo"].notna().to_numpy()
+        if not valid.all():
+            logger.warning(f"Ignoring {int((~valid).sum())} mapping rows with an invalid range")
+
+        # Attributions without a date are considered valid since forever
+        attributed = pd.to_datetime(mapping["Date_Attribution"], dayfirst=True, format="mixed", errors="coerce")
+        days = to_day_numbers(attributed.to_numpy(dtype="datetime64[ns]"), missing=0)[valid]
+
+        operator_names, operator_codes = _encode_operators(mapping.loc[valid, "Mnémo"].astype(str))
+        starts = starts[valid]
+        stops = ends[valid] + 1
+        bounds = np.unique(np.concatenate([[0], starts, stops]))
+
+        # Expand every range into the segments it covers
+        first_segments = np.searchsorted(bounds, starts)
+        counts = np.searchsorted(bounds, stops) - first_segments
+        range_ids = np.repeat(np.arange(len(starts)), counts)
+        offsets = np.arange(len(range_ids)) - np.repeat(np.cumsum(counts) - counts, counts)
+        segments = np.repeat(first_segments, counts) + offsets
+
+        # Stable sort so that, for equal dates, the last row of the file wins
+        keys = (segments.astype(np.int64) << 32) | days[range_ids]
+        order = np.argsort(keys, kind="stable")
+
+        index = cls(bounds, keys[order], operator_codes[range_ids][order].astype(np.int32), operator_names)
+        logger.info(
+            f"Built operator range index: {len(starts)} ranges, {len(operator_names)} operators, "
+            f"{len(bounds)} segments, {len(keys)} attributions"
+        )
+        return index
+
+    def lookup(self, numbers, dates=None, return_lengths: bool = False):
+        """
+        Resolve national numbers (int64, without country code) to operator codes.
+
+        Args:
+            numbers: National numbers to resolve
+            dates: Optional datetime64 array aligned with `numbers`. When given,
+                each number resolves to the latest attribution made on or before
+                its date (NaT meaning the current attribution).
+            return_lengths: Also return match lengths, always 0 as ranges have
+                no prefix
+
+        Returns:
+            int32 array aligned with `numbers`, -1 where nothing matches
+        """
+        numbers = np.asarray(numbers, dtype=np.int64)
+        codes = np.full(len(numbers), -1, dtype=np.int32)
+        lengths = np.zeros(len(numbers), dtype=np.int8)
+        if len(self.version_keys) == 0:
+            return (codes, lengths) if return_lengths else codes
+
+        days = LATEST_DAY if dates is None else to_day_numbers(dates, missing=LATEST_DAY)
+        segments = np.searchsorted(self.bounds, numbers, side="right") - 1
+        probes = (segments.astype(np.int64) << 32) | days
+
+        positions = np.searchsorted(self.version_keys, probes, side="right") - 1
+        clipped = np.clip(positions, 0, None)
+        found = (positions >= 0) & ((self.version_keys[clipped] >> 32) == segments) & (numbers > 0)
+
+        codes[found] = self.version_owners[clipped[found]]
+        return (codes, lengths) if return_lengths else codes
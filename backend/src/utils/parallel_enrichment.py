@@ -0,0 +1,231 @@
+"""
+Parallel operator enrichment of large processor outputs.
+
+The CSV written by the processor is split into line-aligned byte ranges that
+are enriched by a pool of worker processes. The pool is shared by every
+ingest job, so concurrent jobs never run more than Config.ENRICH_WORKERS
+enrichment processes together. Each worker memory-maps the numbering plans it
+is asked for once, so the indexes are shared by the page cache instead of
+being copied to every process. Parts are written to separate files and
+concatenated in order.
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+import pandas as pd
+from src.utils.coverage import CoverageReport
+from src.utils.helpers import enrich_operator_batch
+from src.utils.mapping_registry import MappingRegistry, mapping_registry
+from src.utils.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Worker processes shared by all jobs, started on first use
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+class ByteRangeReader(io.RawIOBase):
+    """Read-only view of the [start, end) byte range of a file"""
+
+    def __init__(self, path, start: int, end: int):
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._remaining = end - start
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(buffer)[:self._remaining]
+        count = self._file.readinto(view)
+        self._remaining -= count
+        return count
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def split_line_ranges(path, parts: int, start: int = 0) -> List[Tuple[int, int]]:
+    """
+    Split the bytes of `path` from `start` to the end into at most `parts`
+    ranges that all begin at the start of a line.
+    """
+    size = os.path.getsize(path)
+    boundaries = [start]
+
+    with open(path, "rb") as f:
+        for part in range(1, parts):
+            target = start + (size - start) * part // parts
+            if target <= boundaries[-1]:
+                continue
+            f.seek(target)
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            if position > boundaries[-1]:
+                boundaries.append(position)
+
+    boundaries.append(size)
+    return [(begin, end) for begin, end in zip(boundaries[:-1], boundaries[1:]) if end > begin]
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """The enrichment pool shared by all jobs, started on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=Config.ENRICH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def shutdown_executor(executor: Optional[ProcessPoolExecutor] = None) -> None:
+    """Stop the worker processes of the shared pool (only if it is still `executor` when given)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None and executor in (None, _executor):
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+@lru_cache(maxsize=8)
+def _worker_plan(registry_root: str, mapping_id: str, kind: str, generation: int):
+    """
+    Numbering plan loaded once per worker process. The registry generation is
+    part of the key, as the plan uses the latest mapping of the other countries.
+    """
+    return MappingRegistry(registry_root).numbering_plan(mapping_id, kind)
+
+
+def _enrich_range(path: str, start: int, end: int, columns: List[str], part_path: str,
+                  batch_size: int, as_of_column: Optional[str], plan_key: tuple) -> Tuple[int, int, dict]:
+    """Enrich one byte range into `part_path` (without header), returns (rows read, rows written, coverage)"""
+    rows_read = 0
+    rows_written = 0
+    coverage = CoverageReport()
+    plan = _worker_plan(*plan_key)
+    with io.BufferedReader(ByteRangeReader(path, start, end)) as source, \
+            open(part_path, "w", newline="") as output:
+        reader = pd.read_csv(
+            source,
+            header=None,
+            names=columns,
+            dtype=str,
+            keep_default_na=False,
+            chunksize=batch_size
+        )
+        for batch in reader:
+            result = enrich_operator_batch(batch, plan, as_of_column, coverage)
+            result.to_csv(output, index=False, header=False)
+            rows_read += len(batch)
+            rows_written += len(result)
+    return rows_read, rows_written, coverage.to_dict()
+
+
+def parallel_join_operator_data(
+    output_path,
+    mapping_id: str,
+    kind: str = "prefix",
+    workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    as_of_column: Optional[str] = None,
+    coverage: Optional[CoverageReport] = None
+):
+    """
+    Parallel counterpart of join_operator_data for a registered mapping.
+
+    Args:
+        output_path: Path to the output CSV file from the C executable
+        mapping_id: Registered mapping whose numbering plan is used
+        kind: Index kind, "prefix" or "range"
+        workers: Number of parts the file is split into (Config.ENRICH_WORKERS by
+            default), enriched by the shared pool of Config.ENRICH_WORKERS processes
+        batch_size: Rows enriched at a time by each worker
+        as_of_column: Date column used for as-of resolution (range indexes only)
+        coverage: Report filled with the counters of every worker
+
+    Returns:
+        Path to the processed file with operator information, None on error
+    """
+    workers = workers or Config.ENRICH_WORKERS
+    batch_size = batch_size or Config.JOIN_BATCH_SIZE
+    output_path = Path(output_path)
+    processed_output_path = Path(str(output_path).replace('.csv', '_with_operators.csv'))
+    part_paths = []
+
+    try:
+        logger.info(f"Joining operator data to {output_path} with {workers} workers")
+
+        columns = pd.read_csv(output_path, nrows=0).columns.tolist()
+        if 'TELEPHONE' not in columns:
+            logger.error(f"TELEPHONE column not found in {output_path}")
+            return None
+
+        # Data starts right after the header line
+        with open(output_path, "rb") as f:
+            data_start = len(f.readline())
+        ranges = split_line_ranges(output_path, workers, data_start)
+        part_paths = [output_path.with_name(f"{output_path.stem}_part{i}.csv") for i in range(len(ranges))]
+
+        rows_read = 0
+        rows_written = 0
+        plan_key = (str(mapping_registry.root.resolve()), mapping_id, kind, mapping_registry.generation())
+        executor = get_executor()
+        futures = [
+            executor.submit(_enrich_range, str(output_path.resolve()), start, end, columns,
+                            str(part_path.resolve()), batch_size, as_of_column, plan_key)
+            for (start, end), part_path in zip(ranges, part_paths)
+        ]
+        try:
+            for future in futures:
+                part_read, part_written, part_coverage = future.result()
+                rows_read += part_read
+                rows_written += part_written
+                if coverage is not None:
+                    coverage.merge(CoverageReport.from_dict(part_coverage))
+        except BrokenProcessPool:
+            # A worker died: the next job starts a new pool
+            shutdown_executor(executor)
+            raise
+        finally:
+            # Parts of a failed job are not left running for nothing, nor writing to removed files
+            for future in futures:
+                future.cancel()
+            wait(futures)
+
+        # Header, then the parts in input order
+        header = enrich_operator_batch(pd.DataFrame(columns=columns, dtype=str), mapping_registry.numbering_plan(mapping_id, kind))
+        with open(processed_output_path, "w", newline="") as output:
+            header.to_csv(output, index=False)
+            for part_path in part_paths:
+                with open(part_path, "r", newline="") as part:
+                    shutil.copyfileobj(part, output, 4 * 1024 * 1024)
+
+        logger.info(f"Operator data joined successfully ({rows_written}/{rows_read} rows), saved to {processed_output_path}")
+        return str(processed_output_path)
+
+    except Exception as e:
+        logger.error(f"Error joining operator data in parallel: {str(e)}")
+        logger.error(traceback.format_exc())
+        return None
+    finally:
+        for part_path in part_paths:
+            if part_path.exists():
+                part_path.unlink()
@@ -0,0 +1,163 @@
+"""
+Vectorized phone-number normalization.
+
+Numbers reach us as `+33 6 12 34 56 78`, `0033612345678`, `0612345678`,
+`33612345678` or float artifacts such as `33612345678.0`. They are normalized
+with Arrow string kernels and NumPy integer arithmetic into a country code and
+a canonical int64 national number, without any per-row Python code.
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from src.utils.operator_index import POW10, count_digits
+
+# Country code assumed for numbers written with a national trunk prefix ("06...")
+DEFAULT_COUNTRY_CODE = 33
+
+# E.164 country codes are prefix-free: 1 and 7 are the only one-digit codes,
+# these are the two-digit ones and every other code has three digits
+ONE_DIGIT_COUNTRY_CODES = np.array([1, 7])
+TWO_DIGIT_COUNTRY_CODES = np.array([
+    20, 27, 30, 31, 32, 33, 34, 36, 39, 40, 41, 43, 44, 45, 46, 47, 48, 49,
+    51, 52, 53, 54, 55, 56, 57, 58, 60, 61, 62, 63, 64, 65, 66,
+    81, 82, 84, 86, 90, 91, 92, 93, 94, 95, 98
+])
+
+# E.164 numbers have at most 15 digits, country code included
+MAX_DIGITS = 15
+
+
+def split_country_code(numbers: np.ndarray):
+    """
+    Split international numbers (int64, country code first) into country
+    code and national number. Returns (country_codes, national_numbers).
+    """
+    digits = count_digits(numbers)
+    first_one = numbers // POW10[np.clip(digits - 1, 0, None)]
+    first_two = numbers // POW10[np.clip(digits - 2, 0, None)]
+
+    code_length = np.where(
+        np.isin(first_one, ONE_DIGIT_COUNTRY_CODES), 1,
+        np.where(np.isin(first_two, TWO_DIGIT_COUNTRY_CODES), 2, 3)
+    )
+    divisor = POW10[np.clip(digits - code_length, 0, None)]
+    country_codes = numbers // divisor
+    national_numbers = numbers % divisor
+
+    # A bare country code without national number is not a phone number
+    malformed = digits <= code_length
+    country_codes[malformed] = 0
+    national_numbers[malformed] = 0
+    return country_codes, national_numbers
+
+
+def _parse_strings(values: pd.Series):
+    """Parse textual numbers into (digits as int64, valid mask, trunk-prefixed mask)"""
+    text = pa.array(values.astype("string[pyarrow]"))
+
+    # Only rows that are not plain digits need the cleaning regexes:
+    # float artifacts first, then whitespace and usual separators
+    dirty = pc.fill_null(pc.invert(pc.or_(pc.ascii_is_decimal(text), pc.equal(text, ""))), False)
+    if pc.any(dirty).as_py():
+        cleaned = pc.filter(text, dirty)
+        cleaned = pc.replace_substring_regex(cleaned, r"\.0+$", "")
+        cleaned = pc.replace_substring_regex(cleaned, r"[\s.\-/()]", "")
+        text = pc.replace_with_mask(text, dirty, cleaned)
+
+    plus = pc.starts_with(text, "+")
+    double_zero = pc.starts_with(text, "00")
+    international = pc.or_(plus, double_zero)
+    trunk = pc.and_not(pc.starts_with(text, "0"), international)
+
+    # Strip the "+", "00" or "0" prefix
+    digits = pc.if_else(
+        double_zero,
+        pc.utf8_slice_codeunits(text, 2),
+        pc.if_else(pc.or_(plus, trunk), pc.utf8_slice_codeunits(text, 1), text)
+    )
+
+    valid = pc.fill_null(pc.and_(pc.ascii_is_decimal(digits), pc.less_equal(pc.utf8_length(digits), MAX_DIGITS)), False)
+    numbers = pc.cast(pc.if_else(valid, digits, "0"), pa.int64())
+
+    return (
+        numbers.to_numpy(zero_copy_only=False),
+        valid.to_numpy(zero_copy_only=False),
+        pc.fill_null(trunk, False).to_numpy(zero_copy_only=False)
+    )
+
+
+def _parse_numeric(values: pd.Series):
+    """Parse numbers read as int or float columns (never trunk-prefixed)"""
+    floats = values.to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = np.isfinite(floats) & (floats > 0) & (floats < POW10[MAX_DIGITS]) & (floats == np.floor(floats))
+    numbers = np.where(valid, floats, 0).astype(np.int64)
+    return numbers, valid, np.zeros(len(numbers), dtype=bool)
+
+
+def _parse_plain_list(values: list):
+    """
+    Fast path for a list of bare digit strings or ints, such as a lookup
+    request body: parsed by Arrow without building a Series nor running the
+    cleaning kernels. None when a value needs the general parsing.
+    """
+    try:
+        array = pa.array(values)
+    except (pa.ArrowException, TypeError, ValueError, OverflowError):
+        return None
+    if array.null_count:
+        return None
+
+    if pa.types.is_integer(array.type):
+        numbers = array.to_numpy().astype(np.int64)
+        valid = (numbers > 0) & (numbers < POW10[MAX_DIGITS])
+        return numbers, valid, np.zeros(len(numbers), dtype=bool)
+
+    if not pa.types.is_string(array.type) or len(array) == 0:
+        return None
+    lengths = pc.utf8_length(array)
+    plain = pc.and_(pc.ascii_is_decimal(array), pc.less_equal(lengths, MAX_DIGITS + 1))
+    if not pc.all(plain).as_py() or pc.any(pc.starts_with(array, "00")).as_py():
+        return None
+    # A single leading 0 is the national trunk prefix
+    trunk = pc.starts_with(array, "0")
+    numbers = pc.cast(array, pa.int64()).to_numpy()
+    valid = pc.less_equal(pc.subtract(lengths, pc.cast(trunk, pa.int32())), MAX_DIGITS).to_numpy(zero_copy_only=False)
+    return numbers, valid, trunk.to_numpy(zero_copy_only=False)
+
+
+def normalize_phone_numbers(values, default_country_code: int = DEFAULT_COUNTRY_CODE):
+    """
+    Normalize raw phone numbers.
+
+    Numbers starting with `+` or `00` are international, numbers starting with
+    a single `0` are national numbers of `default_country_code`, and bare digits
+    are taken as international numbers without `+` (the format of the dumps).
+
+    Args:
+        values: Series (or array-like) of raw numbers, text or numeric. Lists of
+            bare digits (strings or ints) take a faster path with the same result.
+
+    Returns:
+        (country_codes, national_numbers) as int16 and int64 arrays aligned with
+        `values`, both 0 for empty or malformed numbers
+    """
+    parsed = _parse_plain_list(values) if isinstance(values, list) else None
+    if parsed is not None:
+        numbers, valid, trunk = parsed
+    else:
+        values = pd.Series(values, copy=False)
+        if pd.api.types.is_numeric_dtype(values.dtype):
+            numbers, valid, trunk = _parse_numeric(values)
+        else:
+            numbers, valid, trunk = _parse_strings(values)
+
+    country_codes, national_numbers = split_country_code(numbers)
+    country_codes[trunk] = default_country_code
+    national_numbers[trunk] = numbers[trunk]
+
+    malformed = ~valid | (national_numbers <= 0)
+    country_codes[malformed] = 0
+    national_numbers[malformed] = 0
+    return country_codes.astype(np.int16), national_numbers
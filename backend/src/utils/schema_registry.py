@@ -0,0 +1,190 @@
+"""
+Schema registry of the dataset: column names, order, types and aliases.
+
+The first batch saved to a dataset defines its schema. Every appended batch
+is then mapped onto it by name, alias or case-insensitive match before it
+becomes a segment: its columns are written in the schema order, columns it
+lacks are left empty, and columns the schema does not know are added to it,
+only recorded, or rejected (Config.SCHEMA_UNKNOWN_COLUMNS). Only the new
+batch is rewritten, and only when its header differs from the schema;
+existing segments are never touched.
+
+Types are those DuckDB detects in the first batch holding a column. A batch
+whose values do not cast to the registered type widens it to VARCHAR. The
+readers use these types for every segment, so that a segment whose sample
+looks different (e.g. an empty date column) does not change the type of the
+column in queries.
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import duckdb
+from src.utils.duckdb_ingest import quote_identifier, quote_literal
+from src.utils.settings import Config
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN_COLUMN_POLICIES = ("add", "record", "reject")
+
+
+class SchemaError(ValueError):
+    """A batch does not fit the schema of the dataset"""
+
+
+def sniff_columns(path) -> List[Tuple[str, str]]:
+    """(name, type) of the columns of a CSV file, as DuckDB reads them"""
+    conn = duckdb.connect(":memory:")
+    try:
+        source_sql = f"read_csv({quote_literal(Path(path).as_posix())}, header=true)"
+        return [(row[0], row[1]) for row in conn.execute(f"DESCRIBE SELECT * FROM {source_sql}").fetchall()]
+    finally:
+        conn.close()
+
+
+def incompatible_columns(path, types: Dict[str, str]) -> List[str]:
+    """Columns of the CSV file `path` having values that do not cast to their type in `types`"""
+    if not types:
+        return []
+    conn = duckdb.connect(":memory:")
+    try:
+        source_sql = f"read_csv({quote_literal(Path(path).as_posix())}, header=true, all_varchar=true)"
+        counts = ", ".join(
+            f"COUNT(*) FILTER (WHERE {quote_identifier(name)} IS NOT NULL "
+            f"AND TRY_CAST({quote_identifier(name)} AS {column_type}) IS NULL)"
+            for name, column_type in types.items()
+        )
+        failures = conn.execute(f"SELECT {counts} FROM {source_sql}").fetchone()
+        return [name for name, failed in zip(types, failures) if failed]
+    finally:
+        conn.close()
+
+
+class SchemaRegistry:
+    """Schema of a dataset, stored as a JSON file updated atomically"""
+
+    def __init__(self, path, aliases: Optional[Dict[str, List[str]]] = None, unknown_columns: str = "add"):
+        if unknown_columns not in UNKNOWN_COLUMN_POLICIES:
+            raise ValueError(f"Unknown column policy must be one of {UNKNOWN_COLUMN_POLICIES}")
+        self.path = Path(path)
+        self.aliases = aliases or {}
+        self.unknown_columns = unknown_columns
+        self._lock = threading.Lock()
+
+    def schema(self) -> Optional[dict]:
+        """The registered schema, None before the first batch"""
+        try:
+            with self.path.open() as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, schema: dict) -> None:
+        schema["updatedAt"] = datetime.now().isoformat()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(f".{self.path.name}.{uuid.uuid4().hex}")
+        with temp_path.open("w") as f:
+            json.dump(schema, f, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def columns(self) -> List[str]:
+        schema = self.schema()
+        return [column["name"] for column in schema["columns"]] if schema else []
+
+    def types(self) -> Dict[str, str]:
+        schema = self.schema()
+        return {column["name"]: column["type"] for column in schema["columns"]} if schema else {}
+
+    def register(self, path) -> dict:
+        """Make the columns of the CSV file `path` the schema, replacing the current one"""
+        with self._lock:
+            schema = {
+                "version": (self.schema() or {}).get("version", 0) + 1,
+                "columns": [
+                    {"name": name, "type": column_type, "aliases": list(self.aliases.get(name, []))}
+                    for name, column_type in sniff_columns(path)
+                ],
+                "unknown_columns": {}
+            }
+            self._write(schema)
+        logger.info(f"Registered a schema of {len(schema['columns'])} columns from {Path(path).name}")
+        return schema
+
+    def clear(self) -> None:
+        with self._lock:
+            self.path.unlink(missing_ok=True)
+
+    def _match(self, schema: dict, name: str) -> Optional[dict]:
+        """Schema column of an incoming column: same name, then alias, then same name ignoring case"""
+        for column in schema["columns"]:
+            if column["name"] == name or name in column["aliases"]:
+                return column
+        folded = name.strip().casefold()
+        for column in schema["columns"]:
+            if column["name"].casefold() == folded:
+                # Remembered, later batches match it directly
+                column["aliases"].append(name)
+                return column
+        return None
+
+    def save(self, schema: dict) -> None:
+        """Persist a schema updated by `reconcile`, once its batch is committed"""
+        with self._lock:
+            schema["version"] = (self.schema() or {}).get("version", 0) + 1
+            self._write(schema)
+
+    def reconcile(self, path) -> Tuple[List[str], Dict[str, str], dict]:
+        """
+        Map the columns of the CSV batch `path` onto the schema, updated with
+        new columns, aliases and widened types. The updated schema is not
+        persisted: `save` it once the batch is committed.
+
+        Returns:
+            (schema columns, schema column → batch column for the columns the batch has, updated schema)
+
+        Raises:
+            SchemaError: The batch has unknown columns and the policy is "reject"
+        """
+        batch_columns = sniff_columns(path)
+        schema = self.schema()
+        if schema is None:
+            raise SchemaError("No schema registered for the dataset")
+
+        sources, batch_types, unknown = {}, {}, []
+        for name, column_type in batch_columns:
+            column = self._match(schema, name)
+            if column is None or column["name"] in sources:
+                unknown.append((name, column_type))
+                continue
+            sources[column["name"]] = name
+            if column_type != column["type"] and column["type"] != "VARCHAR":
+                batch_types[name] = column["type"]
+
+        if unknown and self.unknown_columns == "reject":
+            raise SchemaError(f"Unknown columns: {', '.join(name for name, _ in unknown)}")
+        for name, column_type in unknown:
+            if self.unknown_columns == "add":
+                schema["columns"].append({"name": name, "type": column_type, "aliases": []})
+                sources[name] = name
+                logger.info(f"Added column {name} ({column_type}) to the schema")
+            else:
+                seen = schema["unknown_columns"].setdefault(name, {"firstSeen": datetime.now().isoformat(), "batches": 0})
+                seen["batches"] += 1
+                logger.warning(f"Column {name} is not in the schema, its values are dropped")
+
+        # A type detected differently in this batch is kept if every value still casts to it
+        widened = incompatible_columns(path, batch_types)
+        for column in schema["columns"]:
+            if sources.get(column["name"]) in widened:
+                logger.warning(f"Column {column['name']} has values that are not {column['type']}, now VARCHAR")
+                column["type"] = "VARCHAR"
+
+        return [column["name"] for column in schema["columns"]], sources, schema
+
+
+schema_registry = SchemaRegistry(Config.DATASET_FOLDER + "schema.json", Config.SCHEMA_ALIASES, Config.SCHEMA_UNKNOWN_COLUMNS)
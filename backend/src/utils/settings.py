@@ -1,7 +1,83 @@
+import os
+
 class Config:
     BASE_ROOT = "src/"
     UPLOAD_FOLDER = BASE_ROOT + "data/"
     PROCESSED_CSV = 'input.csv'
+    # Enriched dataset: immutable CSV segments listed by a manifest
+    # (a single PROCESSED_CSV file left by earlier versions becomes the first segment)
+    DATASET_FOLDER = UPLOAD_FOLDER + "dataset/"
+    # Appended rows whose value of this column is already in the dataset are dropped
+    # (e.g. "UUID" or "ID_CCU"), None to append every row
+    DEDUP_KEY = "UUID"
+    # False positive rate of the Bloom filter in front of the key index, and its initial capacity in keys
+    DEDUP_BLOOM_FP_RATE = 0.01
+    DEDUP_BLOOM_MIN_CAPACITY = 1_000_000
+    # Other names of the dataset columns in incoming batches, e.g. {"TELEPHONE": ["PHONE"]}
+    # (names differing only by case or surrounding spaces always match)
+    SCHEMA_ALIASES = {}
+    # Batch columns missing from the dataset schema: "add" them to the schema, only
+    # "record" them in the schema (values dropped), or "reject" the batch
+    SCHEMA_UNKNOWN_COLUMNS = "add"
+    # Processed outputs of ingest jobs, reused when the same input is ingested again
+    # with the same mappings, and their total size limit in bytes (0 disables the cache)
+    INGEST_CACHE_FOLDER = UPLOAD_FOLDER + "ingest_cache/"
+    INGEST_CACHE_MAX_BYTES = 20 * 1024 * 1024 * 1024
+    # Compiled operator mappings, one directory per content hash
+    MAPPING_FOLDER = UPLOAD_FOLDER + "mappings/"
+    # Rows read, enriched and written at a time by the operator join
+    JOIN_BATCH_SIZE = 200_000
+    # Operator resolution: "prefix" (EZABPQM longest prefix) or "range" (Tranche_Debut/Tranche_Fin)
+    OPERATOR_MATCH_MODE = "prefix"
+    # In "range" mode, resolve each record with the attribution valid at this date column
+    # (e.g. "CREATED_DATE" or "DATE_MODF_TEL"), None for the current attribution
+    OPERATOR_AS_OF_COLUMN = None
+    # Job statuses, shared by all worker processes
+    JOB_STORE_PATH = UPLOAD_FOLDER + "jobs.sqlite3"
+    # Finished jobs are kept this many seconds
+    JOB_TTL = 7 * 24 * 3600
+    # Progress updates are written at most this often (status changes at once)
+    JOB_FLUSH_INTERVAL = 1.0
+    # Resumable chunked uploads, one directory per upload session
+    UPLOAD_SESSION_FOLDER = UPLOAD_FOLDER + "uploads/"
+    # Default and maximum chunk sizes of a chunked upload, in bytes
+    UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+    UPLOAD_MAX_CHUNK_SIZE = 64 * 1024 * 1024
+    # Bytes of a chunk buffered in memory before being written while it streams in
+    UPLOAD_WRITE_SIZE = 1024 * 1024
+    # Upload sessions receiving no chunk for this many seconds are removed
+    UPLOAD_TTL = 24 * 3600
+    # Maximum run time of the native processor, in seconds
+    PROCESSOR_TIMEOUT = 1200
+    # Seconds between two progress updates of a running processor
+    PROGRESS_INTERVAL = 1.0
+    # Ingest jobs run concurrently by the job queue (writes to a dataset stay serialized)
+    INGEST_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+    # Worker processes enriching large processor outputs in parallel
+    ENRICH_WORKERS = os.cpu_count() or 1
+    # Processor outputs smaller than this are enriched in the request process
+    PARALLEL_ENRICH_MIN_BYTES = 64 * 1024 * 1024
+    # Dump parser: "arrow" (in-process, multi-threaded) or "native" (data_processor binary)
+    PARSER_ENGINE = "arrow"
+    # Bytes of dump parsed per block, and threads parsing blocks concurrently
+    PARSER_BLOCK_SIZE = 16 * 1024 * 1024
+    PARSER_WORKERS = os.cpu_count() or 1
+    # Dumps are split across one parser (thread, or native processor) per this many bytes
+    PARSER_MIN_BYTES_PER_WORKER = 32 * 1024 * 1024
+    # Bytes sampled from the start, middle and end of a dump to detect its encoding
+    # (non-UTF-8 dumps are transcoded while parsed)
+    ENCODING_SAMPLE_SIZE = 64 * 1024
+    # Encoding assumed when the samples are not UTF-8 and the detected encoding has
+    # a lower confidence than ENCODING_MIN_CONFIDENCE (0 to 1)
+    ENCODING_FALLBACK = "ISO-8859-1"
+    ENCODING_MIN_CONFIDENCE = 0.5
+    # Stream the processor output through a named pipe into the operator join
+    # (pandas engine on POSIX), instead of writing it to a file first
+    PROCESSOR_PIPE = True
+    # Operator join engine: "pandas" (record batches) or "duckdb" (single SQL pipeline)
+    INGEST_ENGINE = "pandas"
+    # Maximum number of phone numbers per /api/operators/lookup request
+    LOOKUP_MAX_BATCH = 100_000
 
     # Dynamically determine the executable path based on platform
     EXECUTABLE_DIR = BASE_ROOT + "executables/"
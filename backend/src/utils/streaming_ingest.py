@@ -0,0 +1,191 @@
+"""
+Streaming ingest: parsed records → operator join → processed file.
+
+Records come either from the native processor, which writes its CSV into a
+FIFO instead of a file, or from the in-process dump parser as Arrow record
+batches. The join enriches them batch by batch while parsing is still running
+and writes the enriched batches straight to the processed file, which is then
+handed to the storage step as is. The parsed records are never stored on
+disk, and parsing and enrichment overlap instead of running one after the other.
+"""
+
+import errno
+import io
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+import pandas as pd
+from src.utils.coverage import CoverageReport
+from src.utils.dump_parser import dump_batches, pandas_column_names
+from src.utils.helpers import enrich_operator_batch
+from src.utils.numbering_plan import NumberingPlan
+from src.utils.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class CountingReader(io.RawIOBase):
+    """Readable wrapper of a binary stream counting the bytes read from it"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        count = self._raw.readinto(buffer)
+        self.bytes_read += count or 0
+        return count
+
+    def close(self) -> None:
+        self._raw.close()
+        super().close()
+
+
+def pipe_supported(executable_cmd: list) -> bool:
+    """Whether the processor can write into a FIFO (POSIX, and not a Windows binary run from WSL)"""
+    return hasattr(os, "mkfifo") and not any(part.lower().endswith(".exe") for part in executable_cmd)
+
+
+def create_pipe(path: Path) -> Path:
+    """Create the FIFO the processor writes into"""
+    if path.exists():
+        path.unlink()
+    os.mkfifo(path, 0o600)
+    return path
+
+
+def release_pipe(path: Path) -> None:
+    """
+    Unblock a reader still waiting for the FIFO to be opened by a processor
+    that exited without opening it: the reader then sees an empty stream.
+    """
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+    except OSError as e:
+        # ENXIO: nobody is waiting on the read end
+        if e.errno not in (errno.ENXIO, errno.ENOENT):
+            raise
+        return
+    os.close(fd)
+
+
+def stream_join_operator_data(
+    source_path,
+    processed_output_path,
+    numbering_plan: NumberingPlan,
+    as_of_column: Optional[str] = None,
+    coverage: Optional[CoverageReport] = None,
+    batch_size: Optional[int] = None,
+    on_open: Optional[Callable[[CountingReader], None]] = None
+) -> int:
+    """
+    Enrich the processor CSV read from `source_path` (a FIFO) batch by batch
+    into `processed_output_path`.
+
+    Args:
+        source_path: FIFO (or file) the processor writes its CSV into
+        processed_output_path: Processed file with operator information
+        numbering_plan: Numbering plan used for the lookup
+        as_of_column: Date column used for as-of resolution (range indexes only)
+        coverage: Report filled with the counters of every batch
+        batch_size: Rows read, enriched and written at a time
+        on_open: Called with the source reader once the processor has opened
+            the pipe, e.g. to follow the bytes read
+
+    Returns:
+        Number of rows written, without the header
+
+    Raises:
+        ValueError: The processor output is empty or has no TELEPHONE column
+    """
+    batch_size = batch_size or Config.JOIN_BATCH_SIZE
+
+    # Opening the read end blocks until the processor opens the write end
+    with io.BufferedReader(CountingReader(open(source_path, "rb", buffering=0)), 4 * 1024 * 1024) as source, \
+            open(processed_output_path, "w", newline="") as output:
+        if on_open:
+            on_open(source.raw)
+
+        header_line = source.readline()
+        if not header_line:
+            raise ValueError("Processor output is empty")
+        # Parsed like any CSV header, so that column names match the file engines
+        header = pd.read_csv(io.BytesIO(header_line), dtype=str, nrows=0)
+        columns = header.columns.tolist()
+        if 'TELEPHONE' not in columns:
+            raise ValueError("TELEPHONE column not found in processor output")
+
+        # Waits for the first rows, pandas rejects a stream without any
+        batches = ()
+        if source.peek(1):
+            batches = pd.read_csv(
+                source,
+                header=None,
+                names=columns,
+                dtype=str,
+                keep_default_na=False,
+                chunksize=batch_size
+            )
+        rows_written = write_enriched_batches(batches, header, output, numbering_plan, as_of_column, coverage)
+
+    logger.info(f"Operator data streamed successfully ({rows_written} rows), saved to {processed_output_path}")
+    return rows_written
+
+
+def parse_join_operator_data(
+    input_path,
+    processed_output_path,
+    numbering_plan: NumberingPlan,
+    as_of_column: Optional[str] = None,
+    coverage: Optional[CoverageReport] = None,
+    on_block: Optional[Callable[[int], None]] = None,
+    compression: Optional[str] = None,
+    encoding: str = "utf-8"
+) -> int:
+    """
+    Parse a dump in process and enrich its record batches into
+    `processed_output_path`, without the native processor or an intermediate CSV.
+    A compressed dump (`compression`) is decompressed, and a dump in another
+    `encoding` transcoded to UTF-8, on the fly.
+
+    Returns:
+        Number of rows written, without the header
+
+    Raises:
+        ValueError: The dump has no header, is not UTF-8 or has no TELEPHONE column
+    """
+    with dump_batches(input_path, compression, on_block, encoding) as (columns, record_batches):
+        if 'TELEPHONE' not in columns:
+            raise ValueError("TELEPHONE column not found in dump header")
+
+        # Columns named as when the processor output is read back, duplicates renamed
+        names = pandas_column_names(columns)
+        header = pd.DataFrame(columns=names, dtype=str)
+        batches = (batch.rename_columns(names).to_pandas() for batch in record_batches)
+        with open(processed_output_path, "w", newline="") as output:
+            rows_written = write_enriched_batches(batches, header, output, numbering_plan, as_of_column, coverage)
+
+    logger.info(f"Dump parsed and joined successfully ({rows_written} rows), saved to {processed_output_path}")
+    return rows_written
+
+
+def write_enriched_batches(
+    batches: Iterable[pd.DataFrame],
+    header: pd.DataFrame,
+    output,
+    numbering_plan: NumberingPlan,
+    as_of_column: Optional[str] = None,
+    coverage: Optional[CoverageReport] = None
+) -> int:
+    """Write the enriched header, then every enriched batch, to `output`; returns the rows written"""
+    enrich_operator_batch(header, numbering_plan).to_csv(output, index=False)
+    rows_written = 0
+    for batch in batches:
+        result = enrich_operator_batch(batch, numbering_plan, as_of_column, coverage)
+        result.to_csv(output, index=False, header=False)
+        rows_written += len(result)
+    return rows_written
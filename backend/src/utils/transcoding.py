@@ -0,0 +1,124 @@
+"""
+Encoding detection on samples of a dump, and streaming transcoding of dumps
+that are not UTF-8.
+
+The parser only reads UTF-8. A dump in another encoding is decoded and
+re-encoded block by block as the parser reads it, in constant memory;
+characters cut at the end of a block are completed by the next one.
+
+Samples may all be UTF-8 when the rest is not: compressed dumps can only be
+sampled at their start, where a dump is often plain ASCII, and accents may
+only appear between the samples of a plain dump. Such a dump is read as
+UTF-8 until it is not: if everything before was ASCII, the encoding is
+detected on the offending block and the rest of the dump is decoded with it.
+"""
+
+import codecs
+import logging
+from typing import Iterable
+import chardet
+from src.utils.settings import Config
+
+logger = logging.getLogger(__name__)
+
+
+class EncodingError(ValueError):
+    """A dump is not valid in the encoding it is read in"""
+
+
+def is_utf8(sample: bytes) -> bool:
+    """Whether a window of a file is valid UTF-8, ignoring the characters cut at its edges"""
+    start = 0
+    while start < min(3, len(sample)) and 0x80 <= sample[start] <= 0xBF:
+        start += 1
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample[start:], final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def detect_sample_encoding(samples: Iterable[bytes]) -> str:
+    """
+    Encoding of a file from samples of it, read one at a time: "utf-8" when
+    every sample is valid UTF-8 (ASCII included, "utf-8-sig" after a BOM);
+    otherwise chardet reads the samples and stops as soon as it is confident,
+    Config.ENCODING_FALLBACK if it is not confident enough. Returns a
+    normalized codec name.
+    """
+    detector = chardet.UniversalDetector()
+    utf8_samples = []
+    utf8 = True
+    for index, sample in enumerate(samples):
+        if index == 0 and sample.startswith(codecs.BOM_UTF8):
+            return "utf-8-sig"
+        if utf8 and is_utf8(sample):
+            utf8_samples.append(sample)
+            continue
+        if utf8:
+            # Not UTF-8: chardet reads the samples taken so far, then the next ones
+            utf8 = False
+            for previous in utf8_samples:
+                detector.feed(previous)
+        detector.feed(sample)
+        if detector.done:
+            break
+    if utf8:
+        return "utf-8"
+    detector.close()
+
+    # Guesses on text with few non-ASCII characters are not reliable
+    result = detector.result
+    confident = result["encoding"] and (result["confidence"] or 0) >= Config.ENCODING_MIN_CONFIDENCE
+    encoding = codecs.lookup(result["encoding"] if confident else Config.ENCODING_FALLBACK).name
+    if encoding in ("ascii", "utf-8"):
+        # Not valid UTF-8 after all (invalid bytes at the edge of a sample)
+        encoding = codecs.lookup(Config.ENCODING_FALLBACK).name
+    logger.info(f"Detected encoding {encoding} (chardet: {result['encoding']}, confidence {result['confidence']})")
+    return encoding
+
+
+class TranscodedInput:
+    """
+    UTF-8 content of a byte stream (read(size)) in `encoding`, read
+    sequentially. With `detect`, a UTF-8 stream found to be in another
+    encoding after an ASCII start switches to that encoding.
+    """
+
+    def __init__(self, stream, encoding: str = "utf-8", detect: bool = False):
+        self.stream = stream
+        self.encoding = codecs.lookup(encoding).name
+        self.detect = detect
+        self._decoder = codecs.getincrementaldecoder(self.encoding)()
+        self._ascii = True
+
+    def _switch_encoding(self, data: bytes, error: UnicodeDecodeError) -> None:
+        """Detect the encoding around the first invalid byte of `data` and decode with it from now on"""
+        half = Config.ENCODING_SAMPLE_SIZE // 2
+        sample = data[max(0, error.start - half):error.start + half]
+        encoding = detect_sample_encoding([sample])
+        logger.info(f"Stream is not UTF-8 after an ASCII start, switching to {encoding}")
+        self.encoding = encoding
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+
+    def read(self, size: int) -> bytes:
+        """UTF-8 bytes of the next `size` bytes of the stream (or more), b"" at the end"""
+        while True:
+            data = self.stream.read(size)
+            if self.encoding == "utf-8" and self._ascii and data.isascii():
+                # Nothing to decode (nor any character left incomplete)
+                return data
+            try:
+                try:
+                    text = self._decoder.decode(data, final=not data)
+                except UnicodeDecodeError as e:
+                    if not (self.detect and self._ascii and self.encoding == "utf-8"):
+                        raise
+                    self._switch_encoding(data, e)
+                    text = self._decoder.decode(data, final=not data)
+            except UnicodeDecodeError as e:
+                raise EncodingError(f"Dump is not valid {self.encoding}: {e}")
+            self._ascii = self._ascii and data.isascii()
+            # An incomplete character alone decodes to nothing, which is not the end
+            if text or not data:
+                return text.encode("utf-8")
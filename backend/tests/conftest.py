@@ -0,0 +1,106 @@
+"""
+Shared test data: a small MAJNUM mapping and a psql-style dump resolved by it,
+and a data directory isolating the application singletons.
+"""
+
+from pathlib import Path
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from src.app.api import app
+from src.utils.dataset_store import dataset
+from src.utils.ingest_cache import ingest_cache
+from src.utils.job_store import job_store
+from src.utils.key_index import key_index
+from src.utils.mapping_registry import mapping_registry
+from src.utils.settings import Config
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+# Prefix 6123 is more specific than 612 and reassigns its numbers
+MAPPING_CSV = (
+    "EZABPQM;Tranche_Debut;Tranche_Fin;Mnémo;Territoire;Date_Attribution\n"
+    "612;0612000000;0612999999;A;Métropole;01/01/2000\n"
+    "6123;0612300000;0612399999;B;Métropole;15/06/2010\n"
+    "700;0700000000;0700999999;E;Métropole;01/01/2022\n"
+).encode("ISO-8859-1")
+
+DUMP = (
+    " FIRST_NAME | UUID | TELEPHONE    | CREATED_DATE        | DATE_MODF_TEL\n"
+    "------------+------+--------------+---------------------+--------------\n"
+    " Jean       | u1   | +33612000000 | 2021-01-01 10:00:00 | 2021-01-01\n"
+    " Marie      | u2   | 33612300000  | 2022-01-01 10:00:00 | 2022-01-01\n"
+    " Paul       | u3   | 0700123456   | 2023-01-01 10:00:00 | 2023-01-01\n"
+    " Anna       | u4   | +447911123456| 2023-01-01 10:00:00 | 2023-01-01\n"
+    " Luc        | u5   |              | 2023-01-01 10:00:00 | 2023-01-01\n"
+    "(5 rows)\n"
+    "\n"
+).encode("utf-8")
+
+
+@pytest.fixture
+def mapping_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "EZABPQM": ["612", "6123", "700"],
+        "Tranche_Debut": ["0612000000", "0612300000", "0700000000"],
+        "Tranche_Fin": ["0612999999", "0612399999", "0700999999"],
+        "Mnémo": ["A", "B", "E"],
+        "Date_Attribution": ["01/01/2000", "15/06/2010", "01/01/2022"]
+    })
+
+
+@pytest.fixture
+def mapping_file(tmp_path):
+    path = tmp_path / "MAJNUM.csv"
+    path.write_bytes(MAPPING_CSV)
+    return path
+
+
+@pytest.fixture
+def dump_file(tmp_path):
+    path = tmp_path / "dump.txt"
+    path.write_bytes(DUMP)
+    return path
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """
+    Run in an empty working directory, so the relative data paths of the
+    singletons (and of spawned workers) resolve under tmp_path.
+    """
+    monkeypatch.setattr(Config, "C_EXECUTABLE_PATH", str(BACKEND_DIR / Config.C_EXECUTABLE_PATH))
+    monkeypatch.chdir(tmp_path)
+    job_store.close()
+    monkeypatch.setattr(key_index, "_conn", None)
+    monkeypatch.setattr(key_index, "_bloom", None)
+    monkeypatch.setattr(mapping_registry, "_indexes", {})
+    monkeypatch.setattr(mapping_registry, "_plans", {})
+    monkeypatch.setattr(ingest_cache, "max_bytes", ingest_cache.max_bytes)
+    yield tmp_path
+    job_store.close()
+    if key_index._bloom is not None:
+        key_index._bloom.close()
+    if key_index._conn is not None:
+        key_index._conn.close()
+
+
+@pytest.fixture
+def client(data_dir):
+    """API client on a single event loop, running the startup events"""
+    with TestClient(app) as client:
+        yield client
+
+
+def ingest(client, content: bytes = DUMP, filename: str = "dump.txt", mapping: bytes = MAPPING_CSV, **form):
+    """POST a dump with an uploaded mapping to /api/process_files"""
+    return client.post(
+        "/api/process_files",
+        files={"dataFiles": (filename, content), "mappingFile": ("MAJNUM.csv", mapping)},
+        data=form
+    )
+
+
+def dataset_bytes() -> bytes:
+    """Content of the current dataset, segment after segment"""
+    return b"".join(path.read_bytes() for path in dataset.segment_paths())
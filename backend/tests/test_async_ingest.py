@@ -0,0 +1,41 @@
+import time
+from tests.conftest import dataset_bytes, ingest
+
+
+def wait_for_job(client, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/job-status/{job_id}").json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_async_mode_accepts_the_job_and_processes_it_in_background(client):
+    response = ingest(client, asyncMode="true")
+    assert response.status_code == 202
+    accepted = response.json()
+    assert accepted["status"] == "queued" and accepted["job_id"]
+
+    job = wait_for_job(client, accepted["job_id"])
+    assert job["status"] == "completed", job
+    assert job["progress"] == 100
+    assert job["coverage"]["total"] == 6
+    assert b"Marie,u2,612300000" in dataset_bytes()
+    assert [listed["job_id"] for listed in client.get("/api/jobs?status=completed").json()["jobs"]] == [accepted["job_id"]]
+
+
+def test_sync_mode_returns_the_result(client):
+    response = ingest(client)
+    assert response.status_code == 200
+    assert response.json()["success"]
+    assert client.get(f"/api/job-status/{response.json()['job_id']}").json()["status"] == "completed"
+    assert client.get("/api/job-status/job_missing").status_code == 404
+
+
+def test_unknown_mapping_fails_before_queueing(client):
+    response = client.post("/api/process_files", files={"dataFiles": ("dump.txt", b"x")},
+                           data={"mappingId": "0" * 64, "asyncMode": "true"})
+    assert response.status_code == 404
+    assert client.get("/api/jobs?status=failed").json()["jobs"][0]["error"] == f"Unknown mapping id: {'0' * 64}"
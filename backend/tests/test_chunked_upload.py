@@ -0,0 +1,117 @@
+import hashlib
+import pytest
+from src.utils.chunked_upload import UploadError, UploadSessions
+from tests.conftest import DUMP, MAPPING_CSV, dataset_bytes, ingest
+
+CONTENT = bytes(range(256)) * 4 + b"end"
+
+
+@pytest.fixture
+def sessions(tmp_path):
+    return UploadSessions(tmp_path / "uploads", ttl=3600)
+
+
+def chunks(content, size):
+    return [content[start:start + size] for start in range(0, len(content), size)]
+
+
+def test_chunks_are_assembled_in_any_order(sessions, tmp_path):
+    session = sessions.create("dump.txt", len(CONTENT), 100)
+    assert (session["chunk_count"], session["missing"]) == (11, list(range(11)))
+
+    parts = chunks(CONTENT, 100)
+    for index in reversed(range(0, 11, 2)):
+        sessions.write_chunk(session["upload_id"], index, parts[index], hashlib.sha256(parts[index]).hexdigest())
+    # Resuming: only the missing chunks are sent again
+    status = sessions.status(session["upload_id"])
+    assert (status["received"], status["missing"]) == (6, [1, 3, 5, 7, 9])
+    with pytest.raises(UploadError):
+        sessions.complete(session["upload_id"], tmp_path / "input.txt")
+
+    for index in status["missing"]:
+        sessions.write_chunk(session["upload_id"], index, parts[index])
+    sessions.write_chunk(session["upload_id"], 0, parts[0])
+    assert sessions.complete(session["upload_id"], tmp_path / "input.txt")["missing"] == []
+    assert (tmp_path / "input.txt").read_bytes() == CONTENT
+    with pytest.raises(KeyError):
+        sessions.status(session["upload_id"])
+
+
+def test_invalid_chunks_are_rejected(sessions):
+    upload_id = sessions.create("dump.txt", len(CONTENT), 100)["upload_id"]
+    with pytest.raises(UploadError):
+        sessions.write_chunk(upload_id, 11, b"x")
+    with pytest.raises(UploadError):
+        sessions.write_chunk(upload_id, 10, b"end!")
+    with pytest.raises(UploadError):
+        sessions.write_chunk(upload_id, 0, CONTENT[:100], hashlib.sha256(b"other").hexdigest())
+    assert sessions.status(upload_id)["received"] == 0
+
+
+def test_chunks_are_written_as_they_stream_in(sessions, tmp_path):
+    session = sessions.create("dump.txt", len(CONTENT), 512)
+    upload_id = session["upload_id"]
+    for index, part in enumerate(chunks(CONTENT, 512)):
+        writer = sessions.open_chunk(upload_id, index, hashlib.sha256(part).hexdigest())
+        for piece in chunks(part, 100):
+            writer.write(piece)
+        writer.commit()
+        writer.close()
+    assert sessions.status(upload_id)["missing"] == []
+
+    # A bad copy of a received chunk overwrote it: it must be sent again
+    writer = sessions.open_chunk(upload_id, 1)
+    writer.write(b"x" * 100)
+    with pytest.raises(UploadError):
+        writer.write(b"x" * 500)
+    writer.close()
+    assert sessions.status(upload_id)["missing"] == [1]
+
+
+def test_invalid_sessions_are_rejected(sessions):
+    with pytest.raises(UploadError):
+        sessions.create("dump.txt", 0)
+    with pytest.raises(UploadError):
+        sessions.create("dump.txt", 10, 10 ** 12)
+    for upload_id in ("unknown", "../uploads"):
+        with pytest.raises(KeyError):
+            sessions.status(upload_id)
+    upload_id = sessions.create("dump.txt", 10, 5)["upload_id"]
+    sessions.abort(upload_id)
+    with pytest.raises(KeyError):
+        sessions.write_chunk(upload_id, 0, b"12345")
+
+
+def test_complete_ingests_once_every_chunk_arrived(client):
+    session = client.post("/api/uploads", data={"filename": "dump.txt", "size": len(DUMP), "chunkSize": 64}).json()
+    upload_id = session["upload_id"]
+    parts = chunks(DUMP, 64)
+    for index, part in enumerate(parts[1:], 1):
+        assert client.put(f"/api/uploads/{upload_id}/chunks/{index}", content=part).status_code == 200
+    mapping = {"mappingFile": ("MAJNUM.csv", MAPPING_CSV)}
+
+    incomplete = client.post(f"/api/uploads/{upload_id}/complete", files=mapping)
+    assert incomplete.status_code == 409
+    assert incomplete.json()["missing"] == [0]
+
+    bad = client.put(f"/api/uploads/{upload_id}/chunks/0", content=parts[0], headers={"X-Chunk-SHA256": "0" * 64})
+    assert bad.status_code == 400
+    assert client.put(f"/api/uploads/{upload_id}/chunks/0", content=parts[0],
+                      headers={"X-Chunk-SHA256": hashlib.sha256(parts[0]).hexdigest()}).status_code == 200
+    assert client.get(f"/api/uploads/{upload_id}").json()["missing"] == []
+
+    response = client.post(f"/api/uploads/{upload_id}/complete", files=mapping)
+    assert response.status_code == 200, response.text
+    uploaded = dataset_bytes()
+    assert client.get(f"/api/uploads/{upload_id}").status_code == 404
+
+    # Same dataset as a direct upload of the dump
+    assert client.delete("/api/csv/purge").status_code == 200
+    assert ingest(client).status_code == 200
+    assert dataset_bytes() == uploaded
+
+
+def test_uploads_of_other_files_are_refused(client):
+    assert client.post("/api/uploads", data={"filename": "dump.exe", "size": 10}).status_code == 400
+    assert client.post("/api/uploads", data={"filename": "dump.txt", "size": 0}).status_code == 400
+    assert client.put("/api/uploads/unknown/chunks/0", content=b"x").status_code == 404
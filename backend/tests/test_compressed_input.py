@@ -0,0 +1,71 @@
+import gzip
+import io
+import zipfile
+import pyarrow as pa
+import pytest
+from src.utils.compressed_input import DecompressedInput, compression_of
+from src.utils.dump_parser import parse_dump_to_csv
+from tests.conftest import DUMP, dataset_bytes, ingest
+
+
+def zipped(*members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members:
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+COMPRESSED = {
+    "gzip": ("dump.txt.gz", gzip.compress(DUMP)),
+    "zstd": ("dump.txt.zst", pa.compress(DUMP, "zstd", asbytes=True)),
+    "zip": ("dump.zip", zipped(("export/dump.txt", DUMP)))
+}
+
+
+def test_compression_follows_the_extension():
+    assert [compression_of(name) for name in ("a.txt.gz", "A.TXT.ZST", "a.zip", "a.txt", "a.gz.txt")] == \
+        ["gzip", "zstd", "zip", None, None]
+
+
+@pytest.mark.parametrize("compression", COMPRESSED)
+def test_compressed_dumps_parse_like_the_plain_dump(tmp_path, dump_file, compression):
+    name, content = COMPRESSED[compression]
+    path = tmp_path / name
+    path.write_bytes(content)
+    with DecompressedInput(path, compression) as stream:
+        assert stream.read(len(DUMP) + 1) + stream.read(10) == DUMP
+
+    reported = []
+    parse_dump_to_csv(path, tmp_path / "compressed.csv", reported.append, compression)
+    parse_dump_to_csv(dump_file, tmp_path / "plain.csv")
+    assert (tmp_path / "compressed.csv").read_bytes() == (tmp_path / "plain.csv").read_bytes()
+    assert reported[-1] == len(content) or compression == "zip"
+
+
+@pytest.mark.parametrize("name, content, compression", [
+    ("two.zip", zipped(("a.txt", DUMP), ("b.txt", DUMP)), "zip"),
+    ("empty.zip", zipped(), "zip"),
+    ("bad.zip", b"not a zip", "zip"),
+    ("bad.gz", gzip.compress(DUMP)[:-20] + b"x" * 20, "gzip"),
+    ("bad.zst", b"not zstd data", "zstd")
+])
+def test_invalid_archives_are_rejected(tmp_path, name, content, compression):
+    path = tmp_path / name
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        parse_dump_to_csv(path, tmp_path / "output.csv", compression=compression)
+
+
+def test_compressed_uploads_build_the_plain_dataset(client):
+    assert ingest(client).status_code == 200
+    plain = dataset_bytes()
+    for name, content in COMPRESSED.values():
+        assert client.delete("/api/csv/purge").status_code == 200
+        response = ingest(client, content, name)
+        assert response.status_code == 200, response.text
+        assert dataset_bytes() == plain
+
+    response = ingest(client, COMPRESSED["gzip"][1][:40], "truncated.txt.gz")
+    assert response.status_code == 500
+    assert "Corrupt gzip data" in response.json()["detail"]
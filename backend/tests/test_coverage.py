@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from src.utils.coverage import CoverageReport
+from src.utils.duckdb_ingest import duckdb_join_operator_data
+from src.utils.helpers import join_operator_data
+from src.utils.numbering_plan import NumberingPlan
+from src.utils.operator_index import OperatorIndex
+from src.utils.settings import Config
+from tests.conftest import ingest
+from tests.test_helpers import PROCESSOR_OUTPUT
+
+EXPECTED = {
+    "total": 7,
+    "resolved": 3,
+    "resolved_by_prefix_length": {"3": 2, "4": 1},
+    "unresolved": 1,
+    "unsupported_country": 1,
+    "malformed": 0,
+    "empty": 2,
+    "match_rate": 0.6
+}
+
+
+def test_batches_are_counted_by_status():
+    report = CoverageReport()
+    report.add_batch(
+        np.array(["resolu", "resolu", "invalide", "invalide", "non_resolu"], dtype=object),
+        np.array([3, 4, 0, 0, 0]),
+        np.array([False, False, True, False, False])
+    )
+    assert (report.total, report.resolved, report.unresolved, report.malformed, report.empty) == (5, 2, 1, 1, 1)
+    assert report.resolved_by_prefix_length == {3: 1, 4: 1}
+    assert report.match_rate == pytest.approx(2 / 3, abs=1e-6)
+    assert CoverageReport().match_rate is None
+
+
+def test_reports_merge_and_round_trip():
+    first = CoverageReport()
+    first.add_batch(np.array(["resolu"], dtype=object), np.array([3]), np.array([False]))
+    second = CoverageReport.from_dict(first.to_dict())
+    assert second.to_dict() == first.to_dict()
+
+    second.add_batch(np.array(["resolu", "pays_non_supporte"], dtype=object), np.array([4, 0]), np.array([False, False]))
+    first.merge(second)
+    assert first.to_dict()["resolved_by_prefix_length"] == {"3": 2, "4": 1}
+    assert (first.batches, first.total, first.unsupported_country) == (3, 4, 1)
+
+
+@pytest.mark.parametrize("engine", ["pandas", "duckdb"])
+def test_both_engines_count_the_same_rows(tmp_path, mapping_frame, engine):
+    output = tmp_path / "output.csv"
+    # Blank numbers are empty, not malformed
+    output.write_text(PROCESSOR_OUTPUT + 'Eve,u7,"   ",\n')
+    plan = NumberingPlan.for_country(OperatorIndex.from_dataframe(mapping_frame))
+    coverage = CoverageReport()
+    if engine == "pandas":
+        join_operator_data(output, plan, coverage=coverage)
+    else:
+        duckdb_join_operator_data(output, plan, coverage=coverage)
+    counts = coverage.to_dict()
+    counts.pop("batches")
+    assert counts == EXPECTED
+
+
+def test_ingest_reports_the_coverage_of_the_job(client, monkeypatch):
+    monkeypatch.setattr(Config, "INGEST_ENGINE", "pandas")
+    result = ingest(client).json()
+    job = client.get(f"/api/job-status/{result['job_id']}").json()
+    # The psql footer is a row without a number
+    assert result["coverage"]["total"] == 6
+    assert (result["coverage"]["resolved"], result["coverage"]["malformed"], result["coverage"]["empty"]) == (3, 0, 2)
+    assert result["coverage"]["match_rate"] == 0.75
+    assert job["coverage"] == result["coverage"]
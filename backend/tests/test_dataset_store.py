@@ -0,0 +1,72 @@
+import duckdb
+import pytest
+from src.utils.dataset_store import SegmentedDataset, dataset
+from tests.conftest import DUMP, ingest
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SegmentedDataset(tmp_path / "dataset", tmp_path / "input.csv")
+
+
+def staged(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content)
+    return path
+
+
+def test_appends_add_segments_without_touching_the_existing_ones(store, tmp_path):
+    first = store.append(staged(tmp_path, "a.csv", "UUID,TELEPHONE\nu1,0612\nu2,0700\n"))
+    first_path = store.segment_paths(first)[0]
+    first_stat = first_path.stat()
+
+    second = store.append(staged(tmp_path, "b.csv", "UUID,EMAIL\nu3,a@b.c\n"), job_id="job")
+    assert second["version"] == first["version"] + 1
+    assert store.segment_paths(second)[0] == first_path
+    assert (first_path.stat().st_ino, first_path.stat().st_mtime_ns) == (first_stat.st_ino, first_stat.st_mtime_ns)
+    assert [segment["columns"] for segment in second["segments"]] == [["UUID", "TELEPHONE"], ["UUID", "EMAIL"]]
+    assert second["segments"][1]["job_id"] == "job"
+    assert store.stats() == {"version": 2, "segments": 2, "rows": 3, "bytes": second["segments"][0]["bytes"] + second["segments"][1]["bytes"]}
+    assert not (tmp_path / "a.csv").exists()
+
+
+def test_segments_are_queried_as_one_table_by_column_name(store, tmp_path):
+    assert store.sql_source() is None
+    store.append(staged(tmp_path, "a.csv", "UUID,TELEPHONE\nu1,0612\n"))
+    store.append(staged(tmp_path, "b.csv", "EMAIL,UUID\na@b.c,u2\n"))
+    rows = duckdb.query(f"SELECT UUID, TELEPHONE, EMAIL FROM {store.sql_source(types={'TELEPHONE': 'VARCHAR', 'OTHER': 'VARCHAR'})} ORDER BY UUID").fetchall()
+    assert rows == [("u1", "0612", None), ("u2", None, "a@b.c")]
+
+
+def test_replace_and_purge_collect_the_old_segments(store, tmp_path):
+    store.append(staged(tmp_path, "a.csv", "UUID\nu1\n"))
+    store.append(staged(tmp_path, "b.csv", "UUID\nu2\n"))
+    manifest = store.replace(staged(tmp_path, "c.csv", "UUID\nu3\nu4\n"))
+    assert [path.name for path in store.segment_dir.iterdir()] == [manifest["segments"][0]["file"]]
+    assert [path.name for path in store.manifest_dir.iterdir()] == ["00000003.json"]
+    assert store.stats()["rows"] == 2
+
+    assert store.purge() == 1
+    assert store.purge() == 0
+    assert not store.exists()
+    assert list(store.segment_dir.iterdir()) == []
+
+
+def test_a_legacy_input_csv_is_adopted_as_the_first_segment(store, tmp_path):
+    staged(tmp_path, "input.csv", "UUID\nu1\nu2\n")
+    assert store.stats() == {"version": 1, "segments": 1, "rows": 2, "bytes": 11}
+    assert not (tmp_path / "input.csv").exists()
+    store.append(staged(tmp_path, "a.csv", "UUID\nu3\n"))
+    assert store.segment_paths()[0].read_text() == "UUID\nu1\nu2\n"
+
+
+def test_append_mode_adds_a_segment_per_ingest(client):
+    assert ingest(client).status_code == 200
+    second = DUMP.replace(b"u1 ", b"v1 ").replace(b"u2 ", b"v2 ")
+    response = ingest(client, second, "second.txt", appendMode="true")
+    assert response.status_code == 200, response.text
+    # The rows already in the dataset are dropped, keyless ones are kept
+    assert dataset.stats()["segments"] == 2
+    assert dataset.stats()["rows"] == 9
+    head = client.get("/api/csv/head?n=20").json()
+    assert [row["UUID"] for row in head] == ["u1", "u2", "u3", "u4", "u5", None, "v1", "v2", None]
@@ -0,0 +1,88 @@
+import multiprocessing
+import threading
+import time
+import pytest
+from src.utils.dataset_store import SegmentedDataset, dataset, fcntl
+
+pinning = pytest.mark.skipif(fcntl is None, reason="snapshots are not pinned without flock")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SegmentedDataset(tmp_path / "dataset")
+
+
+def commit(store, tmp_path, content, append=True):
+    path = tmp_path / "staged.csv"
+    path.write_text(content)
+    return store.append(path) if append else store.replace(path)
+
+
+def _append_from_another_process(root, tag):
+    store = SegmentedDataset(root)
+    with store.begin() as transaction:
+        time.sleep(0.2)
+        path = store.root / f"{tag}.staged"
+        path.write_text(f"UUID\n{tag}\n")
+        transaction.append(path)
+
+
+@pinning
+def test_pinned_snapshots_keep_their_segments_until_closed(store, tmp_path):
+    commit(store, tmp_path, "UUID\nu1\n")
+    snapshot = store.snapshot()
+    pinned = snapshot.segment_paths()
+
+    commit(store, tmp_path, "UUID\nu2\n", append=False)
+    commit(store, tmp_path, "UUID\nu3\n")
+    assert snapshot.version == 1
+    assert [path.read_text() for path in pinned] == ["UUID\nu1\n"]
+    assert sorted(path.name for path in store.manifest_dir.iterdir()) == ["00000001.json", "00000003.json"]
+
+    snapshot.close()
+    commit(store, tmp_path, "UUID\nu4\n")
+    assert not pinned[0].exists()
+    assert [path.name for path in store.manifest_dir.iterdir()] == ["00000004.json"]
+    assert [path.read_text() for path in store.segment_paths()] == ["UUID\nu2\n", "UUID\nu3\n", "UUID\nu4\n"]
+
+
+def test_an_empty_dataset_has_no_snapshot_segments(store):
+    with store.snapshot() as snapshot:
+        assert (snapshot.version, snapshot.exists(), snapshot.sql_source()) == (0, False, None)
+
+
+@pinning
+def test_writers_of_several_processes_commit_one_after_the_other(store, tmp_path):
+    commit(store, tmp_path, "UUID\nu0\n")
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_append_from_another_process, args=(str(store.root), f"p{i}")) for i in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(30)
+    assert [process.exitcode for process in processes] == [0, 0, 0]
+    manifest = store.manifest()
+    assert (manifest["version"], store.stats()["rows"]) == (4, 4)
+
+
+def test_a_blocked_upload_does_not_block_other_requests(client):
+    responses = {}
+
+    def request(name, method, url, **kwargs):
+        thread = threading.Thread(target=lambda: responses.update({name: client.request(method, url, **kwargs)}))
+        thread.start()
+        return thread
+
+    transaction = dataset.begin()
+    try:
+        upload = request("upload", "POST", "/api/csv/upload", files={"file": ("data.csv", b"UUID,TELEPHONE\nu1,0612\n")})
+        time.sleep(0.2)
+        # The upload waits for the write lock in the threadpool, not on the event loop
+        request("health", "GET", "/api/health").join(5)
+        assert responses["health"].status_code == 200
+        assert upload.is_alive()
+    finally:
+        transaction.close()
+    upload.join(30)
+    assert responses["upload"].status_code == 200
+    assert client.get("/api/csv/head").json() == [{"UUID": "u1", "TELEPHONE": "0612"}]
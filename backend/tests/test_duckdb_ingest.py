@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+from src.utils.coverage import CoverageReport
+from src.utils.duckdb_ingest import duckdb_join_operator_data, duckdb_project_csv
+from src.utils.helpers import join_operator_data
+from src.utils.ingest_cache import ingest_cache
+from src.utils.numbering_plan import NumberingPlan
+from src.utils.operator_index import OperatorIndex, OperatorRangeIndex
+from src.utils.settings import Config
+from tests.conftest import dataset_bytes, ingest
+from tests.test_helpers import PROCESSOR_OUTPUT
+
+
+def read(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False)
+
+
+@pytest.mark.parametrize("index_class", [OperatorIndex, OperatorRangeIndex])
+def test_duckdb_join_matches_the_pandas_join(tmp_path, mapping_frame, index_class):
+    plan = NumberingPlan.for_country(index_class.from_dataframe(mapping_frame))
+    plan.register(44, OperatorIndex.from_dataframe(pd.DataFrame({"EZABPQM": ["7911"], "Mnémo": ["UK"]})))
+    pandas_csv = tmp_path / "pandas.csv"
+    duckdb_csv = tmp_path / "duckdb.csv"
+    pandas_csv.write_text(PROCESSOR_OUTPUT)
+    duckdb_csv.write_text(PROCESSOR_OUTPUT)
+
+    pandas_coverage = CoverageReport()
+    duckdb_coverage = CoverageReport()
+    expected = read(join_operator_data(pandas_csv, plan, coverage=pandas_coverage))
+    path, rows = duckdb_join_operator_data(duckdb_csv, plan, coverage=duckdb_coverage)
+    pd.testing.assert_frame_equal(read(path), expected)
+    assert rows == len(expected) == 6
+    assert expected["Operateur"].tolist()[3] == "UK"
+
+    pandas_counts = pandas_coverage.to_dict()
+    duckdb_counts = duckdb_coverage.to_dict()
+    pandas_counts.pop("batches")
+    duckdb_counts.pop("batches")
+    assert duckdb_counts == pandas_counts
+
+
+def test_duckdb_join_as_of_a_date_column(tmp_path, mapping_frame):
+    plan = NumberingPlan.for_country(OperatorRangeIndex.from_dataframe(mapping_frame))
+    output = tmp_path / "output.csv"
+    output.write_text("TELEPHONE,CREATED_DATE\n0612300000,2005-01-01 10:00:00\n0612300000,2015-01-01 10:00:00\n0612300000,\n")
+    path, _ = duckdb_join_operator_data(output, plan, as_of_column="CREATED_DATE")
+    assert read(path)["Operateur"].tolist() == ["A", "B", "B"]
+
+
+def test_duckdb_join_rejects_outputs_without_telephone(tmp_path, mapping_frame):
+    output = tmp_path / "output.csv"
+    output.write_text("FIRST_NAME\nJean\n")
+    assert duckdb_join_operator_data(output, NumberingPlan.for_country(OperatorIndex.from_dataframe(mapping_frame))) == (None, 0)
+
+
+def test_projection_reorders_renames_and_fills_columns(tmp_path):
+    source = tmp_path / "source.csv"
+    target = tmp_path / "target.csv"
+    source.write_text('PHONE,NAME\n0612,"Doe, Jane"\n0700,Paul\n')
+    assert duckdb_project_csv(source, target, ["NAME", "TELEPHONE", "EMAIL"], {"TELEPHONE": "PHONE"}) == 2
+    assert read(target).values.tolist() == [["Doe, Jane", "0612", ""], ["Paul", "0700", ""]]
+
+
+def test_both_engines_build_the_same_dataset(client, monkeypatch):
+    monkeypatch.setattr(ingest_cache, "max_bytes", 0)
+    datasets = {}
+    for engine in ("pandas", "duckdb"):
+        monkeypatch.setattr(Config, "INGEST_ENGINE", engine)
+        assert client.delete("/api/csv/purge").status_code == 200
+        response = ingest(client)
+        assert response.status_code == 200, response.text
+        datasets[engine] = dataset_bytes()
+    assert datasets["duckdb"] == datasets["pandas"]
+    # Header, 5 rows and the psql footer, kept as a row like the native processor does
+    assert datasets["pandas"].count(b"\n") == 7
@@ -0,0 +1,110 @@
+import os
+import subprocess
+import pyarrow as pa
+import pytest
+from src.utils.dump_parser import dump_batches, parse_dump_block, parse_dump_to_csv, read_dump_header
+from src.utils.ingest_cache import ingest_cache
+from src.utils.settings import Config
+from tests.conftest import BACKEND_DIR, DUMP, dataset_bytes, ingest
+
+NATIVE_PROCESSOR = BACKEND_DIR / Config.C_EXECUTABLE_PATH
+native_processor = pytest.mark.skipif(not os.access(NATIVE_PROCESSOR, os.X_OK), reason="native processor not built")
+
+TRICKY = (
+    ' FIRST_NAME | UUID | TELEPHONE    | A,B  | "Q" | ... | --- |  LAST \n'
+    "------------+------+--------------+------+-----+\n"
+    ' Jean       | u1   | +33612000000 | x,y  | "z" | 1 | 2 | 3 | 4 | 5\n'
+    " Marie||33612300000| a\n"
+    "   |    |    |\n"
+    " ...  | --- | . \n"
+    " Paul       | u3   | 0700123456   |\n"
+    "\ttab\t|\tu9 \t| 06  \n"
+    "(3 rows)\n"
+    " é | ü | 07\n"
+    " last | line \n"
+    " 1 | 2"
+).encode("utf-8")
+
+# Output of the native processor on TRICKY
+TRICKY_CSV = (
+    'FIRST_NAME,UUID,TELEPHONE,"A,B","""Q""",LAST\n'
+    'Jean,u1,+33612000000,"x,y","""z""",1\n'
+    "Marie,33612300000,a,,,\n"
+    "Paul,u3,0700123456,,,\n"
+    "tab,u9,06,,,\n"
+    "(3 rows),,,,,\n"
+    "é,ü,07,,,\n"
+    "last,line,,,,\n"
+    "1,2,,,,\n"
+).encode("utf-8")
+
+# Column names repeated in the header are written as they are, like the native processor
+DUPLICATED = (
+    " NAME | UUID | TELEPHONE | NAME | UUID \n"
+    "------+------+-----------+------+------\n"
+    " Jean | u1   | 0612000000 | J   | v1   \n"
+).encode("utf-8")
+
+
+def native_csv(input_path, tmp_path):
+    output_path = tmp_path / "native.csv"
+    subprocess.run([str(NATIVE_PROCESSOR), str(input_path), str(output_path)], check=True, capture_output=True)
+    return output_path.read_bytes()
+
+
+def test_dump_is_parsed_with_the_native_rules(tmp_path):
+    input_path = tmp_path / "tricky.txt"
+    input_path.write_bytes(TRICKY)
+    # Separator-only header cells are not columns, "A,B" and '"Q"' are pandas names
+    columns, data_start = read_dump_header(input_path)
+    assert columns == ["FIRST_NAME", "UUID", "TELEPHONE", "A,B", '"Q"', "LAST"]
+    assert TRICKY[data_start:].startswith(b"---")
+
+    assert parse_dump_to_csv(input_path, tmp_path / "output.csv") == 8
+    assert (tmp_path / "output.csv").read_bytes() == TRICKY_CSV
+
+
+def test_blocks_split_fields_like_strtok():
+    batch = parse_dump_block(b" a || b |\n|||\n c \n  x|y|z|w  ", ["ONE", "TWO", "THREE"])
+    assert batch.to_pydict() == {"ONE": ["a", "c", "x"], "TWO": ["b", "", "y"], "THREE": ["", "", "z"]}
+    assert parse_dump_block(b"", ["ONE"]).num_rows == 0
+
+
+def test_dumps_without_header_are_rejected(tmp_path):
+    input_path = tmp_path / "empty.txt"
+    input_path.write_bytes(b"---+---\n\n")
+    with pytest.raises(ValueError):
+        read_dump_header(input_path)
+    with pytest.raises(ValueError):
+        parse_dump_to_csv(input_path, tmp_path / "output.csv")
+
+
+def test_progress_is_reported_in_bytes(dump_file, tmp_path):
+    reported = []
+    with dump_batches(dump_file, on_block=reported.append) as (columns, batches):
+        table = pa.Table.from_batches(list(batches))
+    assert columns == ["FIRST_NAME", "UUID", "TELEPHONE", "CREATED_DATE", "DATE_MODF_TEL"]
+    assert table.column("UUID").to_pylist()[:5] == ["u1", "u2", "u3", "u4", "u5"]
+    assert reported[-1] == len(DUMP)
+
+
+@native_processor
+@pytest.mark.parametrize("content", [TRICKY, DUMP, DUMP * 3 + TRICKY, DUPLICATED], ids=["tricky", "dump", "mixed", "duplicated"])
+def test_output_is_byte_identical_to_the_native_processor(tmp_path, content):
+    input_path = tmp_path / "dump.txt"
+    input_path.write_bytes(content)
+    parse_dump_to_csv(input_path, tmp_path / "output.csv")
+    assert (tmp_path / "output.csv").read_bytes() == native_csv(input_path, tmp_path)
+
+
+@native_processor
+@pytest.mark.parametrize("content", [TRICKY + b"\n" + DUMP, DUPLICATED], ids=["mixed", "duplicated"])
+def test_both_parsers_build_the_same_dataset(client, monkeypatch, content):
+    monkeypatch.setattr(ingest_cache, "max_bytes", 0)
+    datasets = {}
+    for engine in ("arrow", "native"):
+        monkeypatch.setattr(Config, "PARSER_ENGINE", engine)
+        assert client.delete("/api/csv/purge").status_code == 200
+        assert ingest(client, content).status_code == 200
+        datasets[engine] = dataset_bytes()
+    assert datasets["arrow"] == datasets["native"]
@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+from src.utils.helpers import join_operator_data
+from src.utils.operator_index import OperatorIndex
+
+PROCESSOR_OUTPUT = (
+    "FIRST_NAME,UUID,TELEPHONE,CREATED_DATE\n"
+    "Jean,u1,+33612000000,2021-01-01 10:00:00\n"
+    "Marie,u2,33612300000,2022-01-01 10:00:00\n"
+    "Paul,u3,0700123456,2023-01-01 10:00:00\n"
+    "Anna,u4,+447911123456,2023-01-01 10:00:00\n"
+    "Luc,u5,,2023-01-01 10:00:00\n"
+    '"Doe, Jane",u6,0899999999,\n'
+)
+
+
+@pytest.fixture
+def output_csv(tmp_path):
+    path = tmp_path / "output.csv"
+    path.write_text(PROCESSOR_OUTPUT)
+    return path
+
+
+def test_join_enriches_every_row(output_csv, mapping_frame):
+    result = pd.read_csv(join_operator_data(output_csv, OperatorIndex.from_dataframe(mapping_frame)),
+                         dtype=str, keep_default_na=False)
+    assert result["UUID"].tolist() == ["u1", "u2", "u3", "u4", "u5", "u6"]
+    assert result["TELEPHONE"].tolist() == ["612000000", "612300000", "700123456", "+447911123456", "", "899999999"]
+    assert result["Operateur"].tolist() == ["A", "B", "E", "", "", ""]
+    assert result["Statut_Operateur"].tolist() == ["resolu", "resolu", "resolu", "pays_non_supporte", "invalide", "non_resolu"]
+    assert result.loc[5, "FIRST_NAME"] == "Doe, Jane"
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 4])
+def test_batches_do_not_change_the_output(output_csv, mapping_frame, tmp_path, batch_size):
+    index = OperatorIndex.from_dataframe(mapping_frame)
+    whole = open(join_operator_data(output_csv, index), "rb").read()
+
+    batched_csv = tmp_path / "batched.csv"
+    batched_csv.write_text(PROCESSOR_OUTPUT)
+    assert open(join_operator_data(batched_csv, index, batch_size=batch_size), "rb").read() == whole
+
+
+def test_empty_output_keeps_the_enriched_header(tmp_path, mapping_frame):
+    path = tmp_path / "empty.csv"
+    path.write_text("FIRST_NAME,TELEPHONE\n")
+    with open(join_operator_data(path, OperatorIndex.from_dataframe(mapping_frame))) as f:
+        assert f.read() == "FIRST_NAME,TELEPHONE,Operateur,Statut_Operateur\n"
+
+
+def test_output_without_telephone_is_rejected(tmp_path, mapping_frame):
+    path = tmp_path / "other.csv"
+    path.write_text("FIRST_NAME\nJean\n")
+    assert join_operator_data(path, OperatorIndex.from_dataframe(mapping_frame)) is None
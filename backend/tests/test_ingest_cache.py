@@ -0,0 +1,76 @@
+import os
+import pytest
+from src.utils.dataset_store import dataset
+from src.utils.ingest_cache import IngestCache
+from src.utils.settings import Config
+from tests.conftest import DUMP, dataset_bytes, ingest
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return IngestCache(tmp_path / "cache", max_bytes=25)
+
+
+def output(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_outputs_are_cached_and_linked_back(cache, tmp_path):
+    cache.put("k1", output(tmp_path, "a.csv", 10), {"rows_processed": 3})
+    assert cache.get("k1", tmp_path / "linked.csv")["rows_processed"] == 3
+    assert (tmp_path / "linked.csv").read_bytes() == b"x" * 10
+    assert cache.get("k2", tmp_path / "missing.csv") is None
+    assert not (tmp_path / "missing.csv").exists()
+
+    # Caching the same key again keeps the first entry
+    cache.put("k1", output(tmp_path, "b.csv", 5), {"rows_processed": 1})
+    assert cache.get("k1", tmp_path / "again.csv")["rows_processed"] == 3
+
+
+def test_least_recently_used_entries_are_evicted(cache, tmp_path):
+    for key in ("k1", "k2"):
+        cache.put(key, output(tmp_path, f"{key}.csv", 10), {})
+    past = os.stat(cache.root / "k2" / IngestCache.ENTRY_FILE).st_mtime - 60
+    os.utime(cache.root / "k1" / IngestCache.ENTRY_FILE, (past, past))
+    os.utime(cache.root / "k2" / IngestCache.ENTRY_FILE, (past + 1, past + 1))
+    cache.get("k1", tmp_path / "used.csv")
+
+    cache.put("k3", output(tmp_path, "k3.csv", 10), {})
+    assert sorted(path.name for path in cache.root.iterdir()) == ["k1", "k3"]
+    assert not IngestCache(tmp_path / "off", 0).enabled
+
+
+def test_keys_depend_on_the_input_mappings_and_settings(cache, monkeypatch):
+    key = cache.key("sha", {33: "m1"})
+    assert cache.key("sha", {33: "m1"}) == key
+    assert len({key, cache.key("other", {33: "m1"}), cache.key("sha", {33: "m2"}), cache.key("sha", {33: "m1", 44: "m3"})}) == 4
+    monkeypatch.setattr(Config, "OPERATOR_MATCH_MODE", "range")
+    assert cache.key("sha", {33: "m1"}) != key
+
+
+def test_resubmitted_inputs_are_ingested_once(client):
+    first = ingest(client).json()
+    assert not first["cached"]
+    version = dataset.stats()["version"]
+
+    again = ingest(client, appendMode="true").json()
+    assert again["already_ingested"] and again["cached"]
+    assert dataset.stats()["version"] == version
+    assert client.get(f"/api/job-status/{again['job_id']}").json()["message"] == "Fichier déjà importé, aucune donnée ajoutée"
+
+
+def test_cached_outputs_rebuild_the_same_dataset(client):
+    assert ingest(client).status_code == 200
+    ingested = dataset_bytes()
+    assert client.delete("/api/csv/purge").status_code == 200
+
+    response = ingest(client, filename="renamed.txt").json()
+    assert response["cached"] and not response["already_ingested"]
+    assert response["coverage"]["total"] == 6
+    assert dataset_bytes() == ingested
+
+    # Another input is processed
+    other = ingest(client, DUMP.replace(b"u1 ", b"v1 "), appendMode="true").json()
+    assert not other["cached"]
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from src.utils.job_queue import JobQueue
+
+
+def test_jobs_start_by_priority_then_in_submission_order():
+    async def scenario():
+        queue = JobQueue(1)
+        started = []
+        gate = asyncio.Event()
+
+        def job(name):
+            async def run():
+                started.append(name)
+                if name == "first":
+                    await gate.wait()
+                return name
+            return run
+
+        futures = [queue.submit("first", job("first"))]
+        await asyncio.sleep(0)
+        for name, priority in [("low", 0), ("high", 5), ("low2", 0), ("urgent", 9)]:
+            futures.append(queue.submit(name, job(name), priority=priority))
+
+        assert [queue.position(name) for name in ("urgent", "high", "low", "low2", "first")] == [0, 1, 2, 3, None]
+        status = queue.status()
+        assert (status["queued"], status["running"]) == (4, ["first"])
+
+        gate.set()
+        assert await asyncio.gather(*futures) == ["first", "low", "high", "low2", "urgent"]
+        return started
+
+    assert asyncio.run(scenario()) == ["first", "urgent", "high", "low", "low2"]
+
+
+def test_dataset_writes_follow_the_start_order():
+    async def scenario():
+        queue = JobQueue(3)
+        writes = []
+
+        def job(name, delay):
+            async def run():
+                # Parsing finishes in reverse order, writes still follow the start order
+                await asyncio.sleep(delay)
+                async with queue.dataset_turn(name, "dataset"):
+                    writes.append(name)
+                    await asyncio.sleep(0)
+            return run
+
+        futures = [queue.submit(name, job(name, delay), datasets=("dataset",))
+                   for name, delay in [("a", 0.03), ("b", 0.02), ("c", 0)]]
+        await asyncio.gather(*futures)
+        assert queue.status()["busy_datasets"] == []
+        return writes
+
+    assert asyncio.run(scenario()) == ["a", "b", "c"]
+
+
+def test_failed_jobs_release_their_turn():
+    async def scenario():
+        queue = JobQueue(2)
+
+        async def fail():
+            raise ValueError("parse error")
+
+        async def write():
+            async with queue.dataset_turn("writer", "dataset"):
+                return "written"
+
+        failed = queue.submit("failed", fail, datasets=("dataset",))
+        written = queue.submit("writer", write, datasets=("dataset",))
+        with pytest.raises(ValueError):
+            await failed
+        assert await asyncio.wait_for(written, 1) == "written"
+
+        async def undeclared():
+            async with queue.dataset_turn("undeclared", "dataset"):
+                pass
+
+        with pytest.raises(RuntimeError):
+            await queue.submit("undeclared", undeclared)
+
+    asyncio.run(scenario())
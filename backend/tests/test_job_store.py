@@ -0,0 +1,104 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+import pytest
+from fastapi.testclient import TestClient
+from src.app.api import app
+from src.utils.job_store import INTERRUPTED_ERROR, JobStore, job_store, process_start_time
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(tmp_path / "jobs.sqlite3", ttl=3600, flush_interval=3600)
+    yield store
+    store.close()
+
+
+def stored(store, job_id):
+    row = sqlite3.connect(store.path).execute("SELECT data FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def test_progress_is_buffered_and_status_changes_are_written(store):
+    store.create("job", status="queued", progress=0)
+    store.flush()
+    store.update("job", progress=40, message="Parsing")
+    assert store.get("job")["progress"] == 40
+    assert stored(store, "job")["progress"] == 0
+
+    store.update("job", status="processing")
+    assert stored(store, "job")["progress"] == 40
+    assert stored(store, "job")["status"] == "processing"
+    store.update("missing", status="failed")
+    assert not store.exists("missing")
+
+
+def test_jobs_survive_a_new_store(store):
+    store.create("job", status="queued")
+    store.update("job", progress=10)
+    store.close()
+    reopened = JobStore(store.path, ttl=3600, flush_interval=0)
+    assert reopened.get("job")["progress"] == 10
+    assert [job["job_id"] for job in reopened.list("queued")] == ["job"]
+    assert reopened.list("completed") == []
+    reopened.close()
+
+
+def test_expired_jobs_are_evicted(store):
+    store.create("done", status="completed")
+    store.create("stuck", status="processing")
+    store.create("running", status="processing")
+    conn = sqlite3.connect(store.path)
+    conn.execute("UPDATE jobs SET updated_at = ? WHERE job_id IN ('done', 'stuck')", (time.time() - 2 * store.ttl,))
+    conn.commit()
+    conn.close()
+
+    store._last_eviction = 0
+    store.create("new", status="queued")
+    # Unfinished jobs are kept four times longer
+    assert {job["job_id"] for job in store.list()} == {"stuck", "running", "new"}
+
+
+def test_jobs_of_stopped_processes_are_failed(store):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    store.create("dead", status="processing", position=2)
+    store.create("own", status="queued")
+    store.create("alive", status="processing")
+    store.create("done", status="completed")
+    store.update("dead", pid=dead.pid)
+    store.update("alive", pid=os.getppid(), pid_start=process_start_time(os.getppid()))
+
+    assert store.fail_interrupted() == 2
+    assert store.get("dead")["status"] == store.get("own")["status"] == "failed"
+    assert store.get("dead")["error"] == INTERRUPTED_ERROR
+    assert store.get("dead")["position"] is None
+    assert store.get("alive")["status"] == "processing"
+    assert store.get("done")["status"] == "completed"
+    assert store.fail_interrupted() == 0
+
+
+@pytest.mark.skipif(process_start_time(os.getpid()) is None, reason="process start times unavailable")
+def test_jobs_of_a_reused_pid_are_failed(store):
+    assert store.create("own", status="queued")["pid_start"] == process_start_time(os.getpid())
+    store.create("reused", status="processing")
+    store.create("alive", status="processing")
+    parent_start = process_start_time(os.getppid())
+    # A process started later was given the pid of the one that created the job
+    store.update("reused", pid=os.getppid(), pid_start=parent_start + 1)
+    store.update("alive", pid=os.getppid(), pid_start=parent_start)
+
+    assert store.fail_interrupted() == 2
+    assert store.get("reused")["status"] == "failed"
+    assert store.get("alive")["status"] == "processing"
+
+
+def test_server_startup_fails_the_jobs_of_the_previous_run(data_dir):
+    job_store.create("previous", status="processing", progress=40)
+    job_store.update("previous", pid=2 ** 22 + 1)  # Above any pid_max
+    job_store.close()
+    with TestClient(app) as client:
+        assert client.get("/api/job-status/previous").json()["status"] == "failed"
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from src.utils.dataset_store import SegmentedDataset
+from src.utils.key_index import BloomFilter, KeyIndex, drop_duplicate_rows, hash_keys
+from tests.conftest import DUMP, ingest
+
+
+def keys(*values):
+    return np.array(values, dtype=object)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = KeyIndex(tmp_path / "keys", "UUID", fp_rate=0.01, min_capacity=8)
+    yield index
+    if index._bloom is not None:
+        index._bloom.close()
+    if index._conn is not None:
+        index._conn.close()
+
+
+def test_bloom_filter_has_no_false_negatives(tmp_path):
+    bloom = BloomFilter(tmp_path / "bloom", 1000, 0.01)
+    added = keys(*(f"u{i}" for i in range(1000)))
+    bloom.add(hash_keys(added))
+    assert bloom.might_contain(hash_keys(added)).all()
+    # About fp_rate of the keys never added
+    assert bloom.might_contain(hash_keys(keys(*(f"v{i}" for i in range(10000))))).mean() < 0.05
+    bloom.close()
+
+
+def test_indexed_keys_are_found_and_the_filter_grows(index):
+    assert not index.contains(keys("u1")).any()
+    index.add([keys("u1", "u2"), keys("u3")], "a.csv")
+    assert index.contains(keys("u3", "u4", "u1")).tolist() == [True, False, True]
+
+    index.add([keys(*(f"v{i}" for i in range(100)))], "b.csv")
+    assert index.count() == 103
+    assert index._meta("bloom_capacity") >= 103
+    assert index.contains(keys("v99", "u2", "w")).tolist() == [True, True, False]
+
+
+def test_filter_rebuilt_by_another_process_is_reopened(index, tmp_path):
+    other = KeyIndex(tmp_path / "keys", "UUID", fp_rate=0.01, min_capacity=8)
+    index.add([keys("u1")], "a.csv")
+    assert other.contains(keys("u1")).tolist() == [True]
+
+    # The other process outgrows the filter: it is rebuilt into a new file
+    index.add([keys(*(f"v{i}" for i in range(100)))], "b.csv")
+    assert other.contains(keys("v99", "u1", "w")).tolist() == [True, True, False]
+    other.add([keys(*(f"x{i}" for i in range(300)))], "c.csv")
+    assert index.contains(keys("x299", "v0")).tolist() == [True, True]
+    other._bloom.close()
+    other._conn.close()
+
+
+def test_duplicates_are_dropped_and_keyless_rows_kept(index, tmp_path):
+    index.add([keys("u1")], "a.csv")
+    path = tmp_path / "batch.csv"
+    path.write_text("UUID,NAME\nu1,old\nu2,new\n,keyless\nu2,repeat\n,keyless\nu3,new\nu3,repeat\n")
+    removed, kept = drop_duplicate_rows(path, index, batch_size=2)
+    assert removed == 3
+    assert np.concatenate(kept).tolist() == ["u2", "u3"]
+    assert path.read_text() == "UUID,NAME\nu2,new\n,keyless\n,keyless\nu3,new\n"
+
+    other = tmp_path / "other.csv"
+    other.write_text("NAME\nno key\n")
+    assert drop_duplicate_rows(other, index) == (0, [])
+    assert other.read_text() == "NAME\nno key\n"
+
+
+def test_index_follows_the_segments_of_the_dataset(index, tmp_path):
+    store = SegmentedDataset(tmp_path / "dataset")
+    for name, content in [("a.csv", "UUID\nu1\nu2\n"), ("b.csv", "UUID\nu3\n")]:
+        (tmp_path / name).write_text(content)
+        manifest = store.append(tmp_path / name)
+    index.sync(manifest, store.segment_dir)
+    assert index.contains(keys("u1", "u3")).tolist() == [True, True]
+
+    (tmp_path / "c.csv").write_text("UUID\nu4\n")
+    manifest = store.replace(tmp_path / "c.csv")
+    index.sync(manifest, store.segment_dir)
+    assert index.contains(keys("u1", "u3", "u4")).tolist() == [False, False, True]
+    assert index.count() == 1
+
+
+def test_rows_already_in_the_dataset_are_not_appended_again(client):
+    assert ingest(client).json()["total_rows"] == 6
+    response = ingest(client, DUMP.replace(b"u1 ", b"v1 "), "again.txt", appendMode="true")
+    assert response.status_code == 200, response.text
+    assert response.json()["duplicates_info"] == {"duplicates_found": 4, "duplicates_removed": 4}
+    # v1 and the keyless footer row
+    assert response.json()["total_rows"] == 8
@@ -0,0 +1,55 @@
+import pytest
+from src.utils.mapping_registry import MappingConflictError, MappingRegistry, hash_file
+from tests.conftest import MAPPING_CSV
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return MappingRegistry(tmp_path / "mappings")
+
+
+def test_mappings_are_identified_by_content_and_compiled_once(registry, mapping_file, tmp_path):
+    mapping_id, compiled = registry.register(mapping_file)
+    assert mapping_id == hash_file(mapping_file)
+    assert compiled
+
+    copy = tmp_path / "copy.csv"
+    copy.write_bytes(MAPPING_CSV)
+    assert registry.register(copy, "other name.csv") == (mapping_id, False)
+    assert registry.get(mapping_id)["filename"] == "MAJNUM.csv"
+    assert [mapping["mapping_id"] for mapping in registry.list()] == [mapping_id]
+
+
+def test_same_mapping_for_another_country_is_refused(registry, mapping_file):
+    mapping_id, _ = registry.register(mapping_file, country_code=44)
+    with pytest.raises(MappingConflictError):
+        registry.register(mapping_file, country_code=33)
+    assert registry.register(mapping_file, country_code=44) == (mapping_id, False)
+    assert registry.get(mapping_id)["country_code"] == 44
+
+
+def test_compiled_indexes_resolve_numbers(registry, mapping_file):
+    mapping_id, _ = registry.register(mapping_file)
+    for kind in ("prefix", "range"):
+        index = registry.load_index(mapping_id, kind)
+        assert list(index.operator_names(index.lookup([612300000, 700123456]))) == ["B", "E"]
+    assert registry.load_index(mapping_id) is registry.load_index(mapping_id)
+
+
+def test_missing_index_is_compiled_from_the_stored_source(registry, mapping_file):
+    mapping_id, _ = registry.register(mapping_file)
+    for path in registry.index_path(mapping_id, "range").iterdir():
+        path.unlink()
+    registry.index_path(mapping_id, "range").rmdir()
+
+    index = registry.load_index(mapping_id, "range")
+    assert list(index.operator_names(index.lookup([612000000]))) == ["A"]
+
+
+def test_invalid_mappings_are_rejected(registry, tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("EZABPQM;Mnémo\n612;A\n", encoding="ISO-8859-1")
+    with pytest.raises(ValueError):
+        registry.register(path)
+    assert registry.list() == []
+    assert not registry.exists("../" + "0" * 64)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+from src.utils.numbering_plan import NumberingPlan
+from src.utils.operator_index import OperatorIndex, OperatorRangeIndex
+
+
+def test_numbers_resolve_against_the_index_of_their_country(mapping_frame):
+    plan = NumberingPlan.for_country(OperatorIndex.from_dataframe(mapping_frame))
+    plan.register(44, OperatorIndex.from_dataframe(pd.DataFrame({"EZABPQM": ["7911"], "Mnémo": ["UK"]})))
+    assert plan.country_codes == [33, 44]
+
+    values = pd.Series(["0612000000", "+447911123456", "+33612300000", "0800000000", "+14155550100", "abc", "",
+                        "+447000000000"])
+    operators, statuses = plan.resolve_numbers(values)
+    assert operators.tolist() == ["A", "UK", "B", None, None, None, None, None]
+    assert statuses.tolist() == ["resolu", "resolu", "resolu", "non_resolu", "pays_non_supporte",
+                                 "invalide", "invalide", "non_resolu"]
+
+
+def test_resolution_keeps_the_input_order_and_lengths(mapping_frame):
+    plan = NumberingPlan.for_country(OperatorIndex.from_dataframe(mapping_frame))
+    country_codes = np.array([44, 33, 0, 33, 33])
+    national_numbers = np.array([7911123456, 612300000, 0, 612000000, 800000000])
+    operators, statuses, lengths = plan.resolve(country_codes, national_numbers, return_lengths=True)
+    assert operators.tolist() == [None, "B", None, "A", None]
+    assert statuses.tolist() == ["pays_non_supporte", "resolu", "invalide", "resolu", "non_resolu"]
+    assert lengths.tolist() == [0, 4, 0, 3, 0]
+
+
+def test_dates_are_passed_to_range_indexes(mapping_frame):
+    plan = NumberingPlan.for_country(OperatorRangeIndex.from_dataframe(mapping_frame))
+    dates = np.array(["2005-01-01", "2015-01-01", "NaT"], dtype="datetime64[ns]")
+    operators, statuses = plan.resolve_numbers(pd.Series(["0612300000"] * 3), dates)
+    assert operators.tolist() == ["A", "B", "B"]
+    assert statuses.tolist() == ["resolu"] * 3
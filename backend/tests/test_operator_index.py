@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+from src.utils.operator_index import OperatorIndex, OperatorRangeIndex
+
+
+def names(index, numbers):
+    return list(index.operator_names(index.lookup(numbers)))
+
+
+def test_longest_prefix_wins(mapping_frame):
+    index = OperatorIndex.from_dataframe(mapping_frame)
+    codes, lengths = index.lookup([612000000, 612300000, 612399999, 612400000, 700123456, 800000000], return_lengths=True)
+    assert list(index.operator_names(codes)) == ["A", "B", "B", "A", "E", None]
+    assert list(lengths) == [3, 4, 4, 3, 3, 0]
+
+
+def test_numbers_shorter_than_their_prefix_do_not_match(mapping_frame):
+    index = OperatorIndex.from_dataframe(mapping_frame)
+    assert names(index, [61, 612, 6123, 0, -5]) == [None, "A", "B", None, None]
+
+
+def test_matches_a_brute_force_longest_prefix_search():
+    rng = np.random.default_rng(0)
+    prefixes = sorted({str(rng.integers(1, 10)) + "".join(map(str, rng.integers(0, 10, length)))
+                       for length in rng.integers(0, 5, 300)})
+    mapping = pd.DataFrame({"EZABPQM": prefixes, "Mnémo": [f"OP{i % 17}" for i in range(len(prefixes))]})
+    index = OperatorIndex.from_dataframe(mapping)
+    owners = dict(zip(mapping["EZABPQM"], mapping["Mnémo"]))
+
+    numbers = rng.integers(10 ** 7, 10 ** 9, 2000)
+    expected = []
+    for number in numbers.astype(str):
+        matches = [prefix for prefix in owners if number.startswith(prefix)]
+        expected.append(owners[max(matches, key=len)] if matches else None)
+    assert names(index, numbers) == expected
+
+
+def test_saved_index_is_memory_mapped_and_resolves_identically(mapping_frame, tmp_path):
+    index = OperatorIndex.from_dataframe(mapping_frame)
+    index.save(tmp_path / "index")
+    loaded = OperatorIndex.load(tmp_path / "index")
+
+    assert isinstance(loaded.bounds, np.memmap)
+    numbers = [612000000, 612300000, 700123456, 800000000]
+    assert names(loaded, numbers) == names(index, numbers)
+
+
+def as_of(index, numbers, dates):
+    codes = index.lookup(numbers, np.array(dates, dtype="datetime64[ns]"))
+    return list(index.operator_names(codes))
+
+
+def test_range_index_resolves_the_attribution_valid_at_a_date(mapping_frame):
+    index = OperatorRangeIndex.from_dataframe(mapping_frame)
+    numbers = [612300000] * 4 + [612000000, 700500000, 701000000]
+    dates = ["1999-12-31", "2005-01-01", "2010-06-15", "NaT", "2005-01-01", "2021-12-31", "NaT"]
+    assert as_of(index, numbers, dates) == [None, "A", "B", "B", "A", None, None]
+    # Without dates, the current attribution
+    assert names(index, [612300000, 612400000, 700500000]) == ["B", "A", "E"]
+
+
+def test_range_reassigned_later_in_the_file_wins_on_the_same_date():
+    mapping = pd.DataFrame({
+        "Tranche_Debut": ["0100", "0100", "0150"],
+        "Tranche_Fin": ["0199", "0199", "x"],
+        "Mnémo": ["OLD", "NEW", "BAD"],
+        "Date_Attribution": ["01/02/2020", "01/02/2020", "01/01/2000"]
+    })
+    index = OperatorRangeIndex.from_dataframe(mapping)
+    assert names(index, [99, 100, 150, 199, 200]) == [None, "NEW", "NEW", "NEW", None]
+
+
+def test_saved_range_index_resolves_identically(mapping_frame, tmp_path):
+    index = OperatorRangeIndex.from_dataframe(mapping_frame)
+    index.save(tmp_path / "ranges")
+    loaded = OperatorRangeIndex.load(tmp_path / "ranges")
+    numbers = [612300000, 612300000, 700500000]
+    dates = ["2005-01-01", "NaT", "2023-01-01"]
+    assert as_of(loaded, numbers, dates) == as_of(index, numbers, dates) == ["A", "B", "E"]
+
+
+def test_prefixes_written_with_a_trunk_zero_match_like_plain_ones(mapping_frame):
+    zero_prefixed = mapping_frame.assign(EZABPQM="0" + mapping_frame["EZABPQM"])
+    index = OperatorIndex.from_dataframe(zero_prefixed)
+    codes, lengths = index.lookup([612000000, 612300000, 700123456], return_lengths=True)
+    assert list(index.operator_names(codes)) == ["A", "B", "E"]
+    assert list(lengths) == [3, 4, 3]
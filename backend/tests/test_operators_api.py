@@ -0,0 +1,54 @@
+from src.utils.settings import Config
+from tests.conftest import MAPPING_CSV
+
+
+def register(client, content=MAPPING_CSV, country_code=33):
+    response = client.post("/api/mappings", files={"mappingFile": ("MAJNUM.csv", content)}, data={"countryCode": country_code})
+    assert response.status_code == 200, response.text
+    return response.json()["mapping_id"]
+
+
+def test_registered_mappings_are_listed(client):
+    mapping_id = register(client)
+    assert register(client) == mapping_id
+    assert [mapping["mapping_id"] for mapping in client.get("/api/mappings").json()["mappings"]] == [mapping_id]
+    assert client.get(f"/api/mappings/{mapping_id}").json()["filename"] == "MAJNUM.csv"
+    assert client.get(f"/api/mappings/{'0' * 64}").status_code == 404
+    assert client.post("/api/mappings", files={"mappingFile": ("MAJNUM.txt", MAPPING_CSV)}).status_code == 400
+    conflict = client.post("/api/mappings", files={"mappingFile": ("MAJNUM.csv", MAPPING_CSV)}, data={"countryCode": 44})
+    assert conflict.status_code == 409
+
+
+def test_lookup_resolves_numbers_in_order(client):
+    mapping_id = register(client)
+    response = client.post("/api/operators/lookup", json=["0612300000", "+33700123456", "+447911123456", "abc"])
+    assert response.json() == {
+        "mapping_id": mapping_id,
+        "count": 4,
+        "operators": ["B", "E", None, None],
+        "statuses": ["resolu", "resolu", "pays_non_supporte", "invalide"]
+    }
+
+    text = client.post(f"/api/operators/lookup?mappingId={mapping_id}", content="0612000000\n\n0800000000\n",
+                       headers={"content-type": "text/plain"})
+    assert text.json()["operators"] == ["A", None]
+    assert text.json()["statuses"] == ["resolu", "non_resolu"]
+
+
+def test_range_lookup_uses_the_dates(client):
+    register(client)
+    response = client.post("/api/operators/lookup?mode=range",
+                           json={"numbers": ["0612300000"] * 3, "dates": ["2005-01-01", "2015-01-01", None]})
+    assert response.json()["operators"] == ["A", "B", "B"]
+
+
+def test_invalid_lookups_are_rejected(client, monkeypatch):
+    assert client.post("/api/operators/lookup", json=["0612300000"]).status_code == 404
+    mapping_id = register(client)
+    assert client.post(f"/api/operators/lookup?mappingId={'0' * 64}", json=["0612300000"]).status_code == 404
+    assert client.post("/api/operators/lookup?mode=exact", json=[]).status_code == 400
+    assert client.post("/api/operators/lookup", json={"numbers": ["1"], "dates": []}).status_code == 400
+    assert client.post("/api/operators/lookup", content="{", headers={"content-type": "application/json"}).status_code == 400
+
+    monkeypatch.setattr(Config, "LOOKUP_MAX_BATCH", 2)
+    assert client.post(f"/api/operators/lookup?mappingId={mapping_id}", json=["1", "2", "3"]).status_code == 413
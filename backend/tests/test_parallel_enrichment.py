@@ -0,0 +1,60 @@
+import pytest
+from src.utils.coverage import CoverageReport
+from src.utils.helpers import join_operator_data
+from src.utils.mapping_registry import mapping_registry
+from src.utils.parallel_enrichment import get_executor, parallel_join_operator_data, shutdown_executor, split_line_ranges
+from src.utils.settings import Config
+
+HEADER = "FIRST_NAME,UUID,TELEPHONE,CREATED_DATE\n"
+ROWS = [
+    "Jean,u1,+33612000000,2021-01-01 10:00:00\n",
+    "Marie,u2,33612300000,2022-01-01 10:00:00\n",
+    "Paul,u3,0700123456,2023-01-01 10:00:00\n",
+    "Anna,u4,+447911123456,2023-01-01 10:00:00\n",
+    "Luc,u5,,2023-01-01 10:00:00\n",
+    '"Doe, Jane",u6,0899999999,\n'
+]
+
+
+@pytest.fixture
+def output_csv(data_dir):
+    path = data_dir / "output.csv"
+    path.write_text(HEADER + "".join(ROWS * 50))
+    return path
+
+
+def test_line_ranges_cover_the_file_and_start_on_lines(output_csv):
+    data = output_csv.read_bytes()
+    start = len(HEADER)
+    ranges = split_line_ranges(output_csv, 7, start)
+    assert ranges[0][0] == start and ranges[-1][1] == len(data)
+    assert all(end == begin for (_, end), (begin, _) in zip(ranges[:-1], ranges[1:]))
+    assert all(data[begin - 1:begin] == b"\n" for begin, _ in ranges)
+    assert split_line_ranges(output_csv, 1000, start)[-1][1] == len(data)
+
+
+def test_parallel_join_matches_the_sequential_join(output_csv, mapping_file):
+    mapping_id, _ = mapping_registry.register(mapping_file)
+    expected = open(join_operator_data(output_csv, mapping_registry.numbering_plan(mapping_id)), "rb").read()
+
+    coverage = CoverageReport()
+    result = parallel_join_operator_data(output_csv, mapping_id, workers=3, batch_size=40, coverage=coverage)
+    assert open(result, "rb").read() == expected
+    assert coverage.to_dict()["total"] == 300
+    assert not list(output_csv.parent.glob("*_part*.csv"))
+
+
+def test_unknown_mapping_fails(output_csv):
+    assert parallel_join_operator_data(output_csv, "0" * 64, workers=2) is None
+
+
+def test_jobs_share_one_pool_of_workers(output_csv, mapping_file):
+    mapping_id, _ = mapping_registry.register(mapping_file)
+    executor = get_executor()
+    assert executor._max_workers == Config.ENRICH_WORKERS
+    first = open(parallel_join_operator_data(output_csv, mapping_id, workers=4), "rb").read()
+    second = open(parallel_join_operator_data(output_csv, mapping_id, workers=2), "rb").read()
+    assert first == second
+    assert get_executor() is executor
+    shutdown_executor()
+    assert get_executor() is not executor
@@ -0,0 +1,56 @@
+import asyncio
+import gzip
+from src.app.routes.file_processing import run_parallel_processor, run_processor
+from src.utils.dump_parser import parse_dump_to_csv, parser_workers
+from src.utils.settings import Config
+from tests.conftest import DUMP
+from tests.test_dump_parser import NATIVE_PROCESSOR, TRICKY, native_processor
+
+# Rows of both dumps under a single header
+CONTENT = DUMP + b"".join(
+    f" Name{i} | u{i} | 0612{i:06d} | 2023-01-01 10:00:00 | 2023-01-01\n".encode() for i in range(500)
+) + b"\n" + TRICKY
+
+
+def use_small_blocks(monkeypatch):
+    monkeypatch.setattr(Config, "PARSER_BLOCK_SIZE", 100)
+    monkeypatch.setattr(Config, "PARSER_WORKERS", 4)
+    monkeypatch.setattr(Config, "PARSER_MIN_BYTES_PER_WORKER", 1000)
+
+
+def test_workers_follow_the_dump_size(monkeypatch):
+    use_small_blocks(monkeypatch)
+    assert [parser_workers(size) for size in (0, 999, 2500, 10 ** 9)] == [1, 1, 2, 4]
+
+
+def test_blocks_parsed_in_parallel_give_the_single_block_output(tmp_path, monkeypatch):
+    input_path = tmp_path / "dump.txt"
+    input_path.write_bytes(CONTENT)
+    parse_dump_to_csv(input_path, tmp_path / "whole.csv")
+
+    use_small_blocks(monkeypatch)
+    reported = []
+    # The header of the second dump is a row of the first one
+    assert parse_dump_to_csv(input_path, tmp_path / "blocks.csv", reported.append) == 515
+    assert (tmp_path / "blocks.csv").read_bytes() == (tmp_path / "whole.csv").read_bytes()
+    assert len(reported) > 100 and reported == sorted(reported)
+
+    # Streams are cut into blocks by the reader thread
+    compressed = tmp_path / "dump.txt.gz"
+    compressed.write_bytes(gzip.compress(CONTENT))
+    parse_dump_to_csv(compressed, tmp_path / "stream.csv", compression="gzip")
+    assert (tmp_path / "stream.csv").read_bytes() == (tmp_path / "whole.csv").read_bytes()
+
+
+@native_processor
+def test_native_processors_on_byte_ranges_give_the_single_processor_output(data_dir):
+    input_path = data_dir / "dump.txt"
+    input_path.write_bytes(CONTENT)
+    single = data_dir / "single.csv"
+    parallel = data_dir / "parallel.csv"
+    assert asyncio.run(run_processor([str(NATIVE_PROCESSOR), str(input_path), str(single)], input_path, single, "dump.txt")).returncode == 0
+
+    result = asyncio.run(run_parallel_processor([str(NATIVE_PROCESSOR)], input_path, parallel, "dump.txt", None, 3))
+    assert result.returncode == 0
+    assert parallel.read_bytes() == single.read_bytes()
+    assert sorted(path.name for path in data_dir.iterdir()) == ["dump.txt", "parallel.csv", "single.csv"]
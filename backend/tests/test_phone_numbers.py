@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from src.utils.phone_numbers import normalize_phone_numbers, split_country_code
+
+
+def test_usual_french_formats_normalize_to_the_same_number():
+    values = ["+33 6 12 34 56 78", "0033612345678", "0612345678", "33612345678",
+              "33612345678.0", "+33 6-12.34/56 78", "06 12 34 56 78"]
+    country_codes, national_numbers = normalize_phone_numbers(pd.Series(values))
+    assert country_codes.tolist() == [33] * len(values)
+    assert national_numbers.tolist() == [612345678] * len(values)
+
+
+def test_foreign_numbers_keep_their_country_code():
+    country_codes, national_numbers = normalize_phone_numbers(pd.Series(["+447911123456", "0014155550100", "79161234567"]))
+    assert country_codes.tolist() == [44, 1, 7]
+    assert national_numbers.tolist() == [7911123456, 4155550100, 9161234567]
+
+
+def test_malformed_and_empty_numbers_are_zero():
+    values = pd.Series(["", None, "abc", "+33", "0", "1234567890123456789", "+33 6 12 34 56 7x"])
+    country_codes, national_numbers = normalize_phone_numbers(values)
+    assert country_codes.tolist() == [0] * len(values)
+    assert national_numbers.tolist() == [0] * len(values)
+
+
+def test_numeric_columns_are_international_numbers():
+    country_codes, national_numbers = normalize_phone_numbers(pd.Series([33612345678.0, np.nan, 3.5, -33612345678]))
+    assert country_codes.tolist() == [33, 0, 0, 0]
+    assert national_numbers.tolist() == [612345678, 0, 0, 0]
+
+
+def test_country_codes_are_split_by_length():
+    country_codes, national_numbers = split_country_code(np.array([14155550100, 33612345678, 351912345678, 33]))
+    assert country_codes.tolist() == [1, 33, 351, 0]
+    assert national_numbers.tolist() == [4155550100, 612345678, 912345678, 0]
+
+
+def test_lists_of_bare_digits_normalize_like_series():
+    samples = [
+        ["33612345678", "0612345678", "447911123456", "612", "0", "1234567890123456", "0123456789012345"],
+        [33612345678, 447911123456, -5, 0, 10 ** 15, 10 ** 15 - 1],
+        ["0033612345678", "+33 6 12", "", "33612345678.0"],
+        [33612345678, None, "0612345678"]
+    ]
+    for values in samples:
+        country_codes, national_numbers = normalize_phone_numbers(values)
+        expected_codes, expected_numbers = normalize_phone_numbers(pd.Series(values))
+        assert country_codes.dtype == expected_codes.dtype
+        assert country_codes.tolist() == expected_codes.tolist()
+        assert national_numbers.tolist() == expected_numbers.tolist()
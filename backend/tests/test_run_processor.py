@@ -0,0 +1,72 @@
+import asyncio
+import subprocess
+import sys
+import time
+import pytest
+from src.app.routes.file_processing import run_processor
+from src.utils.job_store import job_store
+from src.utils.settings import Config
+
+PROCESSOR = """
+import sys, time
+data = open(sys.argv[1], "rb").read()
+print("Lecture du fichier", flush=True)
+time.sleep(0.3)
+open(sys.argv[2], "wb").write(data.upper())
+print(f"Traitement termine: {len(data.splitlines())} lignes ecrites", flush=True)
+print("attention", file=sys.stderr, flush=True)
+"""
+
+
+@pytest.fixture
+def files(data_dir):
+    input_path = data_dir / "input.txt"
+    input_path.write_bytes(b"a\nb\nc\n")
+    return input_path, data_dir / "output.csv"
+
+
+def test_processor_output_is_streamed_without_blocking_the_loop(files):
+    input_path, output_path = files
+    job_store.create("job", status="processing")
+
+    async def scenario():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        cmd = [sys.executable, "-c", PROCESSOR, str(input_path), str(output_path)]
+        result = await run_processor(cmd, input_path, output_path, "input.txt", "job")
+        ticker.cancel()
+        return result, ticks
+
+    result, ticks = asyncio.run(scenario())
+    assert result.returncode == 0
+    assert result.stdout.splitlines()[-1] == "Traitement termine: 3 lignes ecrites"
+    assert result.stderr == "attention"
+    assert output_path.read_bytes() == b"A\nB\nC\n"
+    assert job_store.get("job")["processor_rows"] == 3
+    # The loop kept running while the processor slept
+    assert ticks >= 10
+
+
+def test_input_ranges_are_fed_to_stdin(files):
+    input_path, output_path = files
+    cmd = [sys.executable, "-c", PROCESSOR, "/dev/stdin", str(output_path)]
+    result = asyncio.run(run_processor(cmd, input_path, output_path, "input.txt", input_ranges=[(4, 6), (0, 2)]))
+    assert result.returncode == 0
+    assert output_path.read_bytes() == b"C\nA\n"
+
+
+def test_slow_processors_are_killed(files, monkeypatch):
+    input_path, output_path = files
+    monkeypatch.setattr(Config, "PROCESSOR_TIMEOUT", 0.2)
+    cmd = [sys.executable, "-c", "import time; time.sleep(30)"]
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        asyncio.run(run_processor(cmd, input_path, output_path, "input.txt"))
+    assert time.monotonic() - start < 10
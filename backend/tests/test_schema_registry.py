@@ -0,0 +1,88 @@
+import pytest
+from src.utils.dataset_store import dataset
+from src.utils.schema_registry import SchemaError, SchemaRegistry, schema_registry
+from tests.conftest import DUMP, ingest
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = SchemaRegistry(tmp_path / "schema.json", {"TELEPHONE": ["PHONE"]})
+    first = tmp_path / "first.csv"
+    first.write_text("UUID,TELEPHONE,AGE\nu1,0612,30\n")
+    registry.register(first)
+    return registry
+
+
+def batch(tmp_path, content):
+    path = tmp_path / "batch.csv"
+    path.write_text(content)
+    return path
+
+
+def test_first_batch_defines_the_schema(registry):
+    assert registry.columns() == ["UUID", "TELEPHONE", "AGE"]
+    assert registry.types()["AGE"] == "BIGINT"
+    assert registry.schema()["version"] == 1
+
+
+def test_columns_match_by_name_alias_and_case(registry, tmp_path):
+    columns, sources, schema = registry.reconcile(batch(tmp_path, "age,PHONE,uuid\n31,0700,u2\n"))
+    assert columns == ["UUID", "TELEPHONE", "AGE"]
+    assert sources == {"UUID": "uuid", "TELEPHONE": "PHONE", "AGE": "age"}
+    assert "uuid" in schema["columns"][0]["aliases"]
+
+
+def test_unknown_columns_follow_the_policy(registry, tmp_path):
+    path = batch(tmp_path, "UUID,EMAIL\nu2,a@b.c\n")
+    columns, sources, _ = registry.reconcile(path)
+    assert columns == ["UUID", "TELEPHONE", "AGE", "EMAIL"]
+    assert sources == {"UUID": "UUID", "EMAIL": "EMAIL"}
+
+    registry.unknown_columns = "record"
+    columns, sources, schema = registry.reconcile(path)
+    assert columns == ["UUID", "TELEPHONE", "AGE"]
+    assert schema["unknown_columns"]["EMAIL"]["batches"] == 1
+
+    registry.unknown_columns = "reject"
+    with pytest.raises(SchemaError):
+        registry.reconcile(path)
+    with pytest.raises(ValueError):
+        SchemaRegistry(tmp_path / "other.json", unknown_columns="ignore")
+
+
+def test_types_widen_only_for_values_that_do_not_cast(registry, tmp_path):
+    _, _, schema = registry.reconcile(batch(tmp_path, "UUID,AGE\nu2,\n"))
+    assert {column["name"]: column["type"] for column in schema["columns"]}["AGE"] == "BIGINT"
+    _, _, schema = registry.reconcile(batch(tmp_path, "UUID,AGE\nu2,unknown\n"))
+    assert {column["name"]: column["type"] for column in schema["columns"]}["AGE"] == "VARCHAR"
+
+
+def test_reconciled_schemas_are_only_persisted_when_saved(registry, tmp_path):
+    _, _, schema = registry.reconcile(batch(tmp_path, "UUID,EMAIL,AGE\nu2,a@b.c,old\n"))
+    assert registry.columns() == ["UUID", "TELEPHONE", "AGE"]
+    assert registry.types()["AGE"] == "BIGINT"
+
+    registry.save(schema)
+    assert registry.columns() == ["UUID", "TELEPHONE", "AGE", "EMAIL"]
+    assert registry.types()["AGE"] == "VARCHAR"
+    assert registry.schema()["version"] == 2
+
+
+def test_appended_batches_are_written_in_the_schema_order(client):
+    assert ingest(client).status_code == 200
+    response = ingest(client, b" uuid | EXTRA | TELEPHONE\n---\n v1 | e1 | 0612000001\n", "second.txt", appendMode="true")
+    assert response.status_code == 200, response.text
+    assert schema_registry.columns()[-1] == "EXTRA"
+    segment = dataset.segment_paths()[-1].read_text().splitlines()
+    assert segment[0] == ",".join(schema_registry.columns())
+    assert segment[1] == ",v1,612000001,,,A,resolu,e1"
+
+
+def test_batches_without_new_rows_leave_the_schema_unchanged(client):
+    assert ingest(client).status_code == 200
+    schema = schema_registry.schema()
+    # Only rows already in the dataset, with a column the schema does not have
+    duplicates = DUMP.replace(b"| DATE_MODF_TEL", b"| DATE_MODF_TEL | EXTRA").replace(b"(5 rows)\n", b"")
+    response = ingest(client, duplicates, "again.txt", appendMode="true")
+    assert response.status_code == 200, response.text
+    assert schema_registry.schema() == schema
@@ -0,0 +1,75 @@
+import asyncio
+import os
+import sys
+import pandas as pd
+import pytest
+from src.app.routes.file_processing import run_streaming_processor
+from src.utils.coverage import CoverageReport
+from src.utils.helpers import join_operator_data
+from src.utils.ingest_cache import ingest_cache
+from src.utils.numbering_plan import NumberingPlan
+from src.utils.operator_index import OperatorIndex
+from src.utils.settings import Config
+from src.utils.streaming_ingest import create_pipe
+from tests.conftest import BACKEND_DIR, dataset_bytes, ingest
+from tests.test_helpers import PROCESSOR_OUTPUT
+
+native_processor = pytest.mark.skipif(
+    not os.access(BACKEND_DIR / Config.C_EXECUTABLE_PATH, os.X_OK), reason="native processor not built"
+)
+fifo = pytest.mark.skipif(not hasattr(os, "mkfifo"), reason="named pipes not supported")
+
+# Writes its input file into its output file like the native processor
+COPY_PROCESSOR = 'import sys; open(sys.argv[2], "wb").write(open(sys.argv[1], "rb").read())'
+
+
+def stream(data_dir, mapping_frame, cmd):
+    input_path = data_dir / "output.csv"
+    input_path.write_text(PROCESSOR_OUTPUT)
+    pipe_path = create_pipe(data_dir / "pipe.csv")
+    processed = data_dir / "processed.csv"
+    plan = NumberingPlan.for_country(OperatorIndex.from_dataframe(mapping_frame))
+    coverage = CoverageReport()
+    process, rows = asyncio.run(run_streaming_processor(
+        cmd + [str(input_path), str(pipe_path)], input_path, pipe_path, processed, "dump.txt", None, plan, coverage
+    ))
+    return process, rows, processed, coverage
+
+
+@fifo
+def test_processor_output_is_joined_through_the_pipe(data_dir, mapping_frame):
+    process, rows, processed, coverage = stream(data_dir, mapping_frame, [sys.executable, "-c", COPY_PROCESSOR])
+    assert (process.returncode, rows, coverage.total) == (0, 6, 6)
+    expected = data_dir / "expected.csv"
+    expected.write_text(PROCESSOR_OUTPUT)
+    pd.testing.assert_frame_equal(
+        pd.read_csv(processed, dtype=str, keep_default_na=False),
+        pd.read_csv(join_operator_data(expected, OperatorIndex.from_dataframe(mapping_frame)), dtype=str, keep_default_na=False)
+    )
+    assert not (data_dir / "pipe.csv").exists()
+
+
+@fifo
+def test_processor_failing_before_opening_the_pipe_does_not_hang(data_dir, mapping_frame):
+    process, rows, processed, _ = stream(data_dir, mapping_frame, [sys.executable, "-c", "import sys; sys.exit(3)"])
+    assert (process.returncode, rows) == (3, None)
+    assert not processed.exists()
+    assert not (data_dir / "pipe.csv").exists()
+
+
+@fifo
+@native_processor
+def test_piped_and_file_outputs_build_the_same_dataset(client, data_dir, monkeypatch):
+    monkeypatch.setattr(Config, "PARSER_ENGINE", "native")
+    monkeypatch.setattr(ingest_cache, "max_bytes", 0)
+    datasets = {}
+    for pipe in (True, False):
+        monkeypatch.setattr(Config, "PROCESSOR_PIPE", pipe)
+        assert client.delete("/api/csv/purge").status_code == 200
+        response = ingest(client)
+        assert response.status_code == 200, response.text
+        assert response.json()["rows_processed"] == 6
+        datasets[pipe] = dataset_bytes()
+        # Neither the input nor the processor output is left behind
+        assert not [path.name for path in (data_dir / Config.UPLOAD_FOLDER).glob("*put_*")]
+    assert datasets[True] == datasets[False]
@@ -0,0 +1,85 @@
+import gzip
+import io
+import pytest
+from src.utils.dump_parser import parse_dump_to_csv
+from src.utils.helpers import detect_encoding
+from src.utils.settings import Config
+from src.utils.transcoding import EncodingError, TranscodedInput, detect_sample_encoding
+from tests.conftest import dataset_bytes, ingest
+
+FRENCH = "Hélène habite à Orléans, près de l'église où Noël est fêté. Ça coûte cher, été comme hiver. " * 20
+
+
+def dump_lines(rows, accented_row=None):
+    lines = [" ID | NOM | VILLE ", "----+-----+------"]
+    lines += [f" {i} | nom{i} | ville " for i in range(rows)]
+    if accented_row is not None:
+        lines[accented_row + 2] = f" {accented_row} | Hélène | Orléans "
+    return "\n".join(lines) + "\n"
+
+
+def read_all(stream, size):
+    chunks = []
+    while chunk := stream.read(size):
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def test_sample_encodings_are_detected():
+    assert detect_sample_encoding([b"plain ascii", FRENCH.encode("utf-8")]) == "utf-8"
+    assert detect_sample_encoding([b"\xef\xbb\xbf" + FRENCH.encode("utf-8")]) == "utf-8-sig"
+    assert detect_sample_encoding([b"ascii first", FRENCH.encode("cp1252")]) in ("cp1252", "iso8859-1")
+    assert detect_sample_encoding([]) == "utf-8"
+
+
+def test_unreliable_guesses_fall_back_to_the_configured_encoding(monkeypatch):
+    monkeypatch.setattr(Config, "ENCODING_MIN_CONFIDENCE", 1.1)
+    assert detect_sample_encoding([FRENCH.encode("cp1252")]) == "iso8859-1"
+
+
+def test_streams_are_transcoded_to_utf8_across_reads():
+    text = "début " + FRENCH
+    for encoding in ("utf-16", "cp1252", "utf-8"):
+        assert read_all(TranscodedInput(io.BytesIO(text.encode(encoding)), encoding), 7) == text.encode("utf-8")
+
+
+def test_utf8_streams_switch_encoding_after_an_ascii_start():
+    data = ("a" * 1000 + FRENCH).encode("latin-1")
+    assert read_all(TranscodedInput(io.BytesIO(data), "utf-8", detect=True), 100) == data.decode("latin-1").encode("utf-8")
+    with pytest.raises(EncodingError):
+        read_all(TranscodedInput(io.BytesIO(data), "utf-8"), 100)
+    # Text that was UTF-8 cannot be another encoding afterwards
+    mixed = "é".encode("utf-8") + b"a" * 1000 + "é".encode("latin-1")
+    with pytest.raises(EncodingError):
+        read_all(TranscodedInput(io.BytesIO(mixed), "utf-8", detect=True), 100)
+
+
+@pytest.fixture
+def small_samples(monkeypatch):
+    monkeypatch.setattr(Config, "ENCODING_SAMPLE_SIZE", 1024)
+    monkeypatch.setattr(Config, "PARSER_BLOCK_SIZE", 4096)
+    monkeypatch.setattr(Config, "PARSER_MIN_BYTES_PER_WORKER", 4096)
+
+
+@pytest.mark.parametrize("compressed", [False, True], ids=["plain", "gzip"])
+def test_dumps_not_utf8_between_their_samples_are_transcoded(tmp_path, small_samples, compressed):
+    content = dump_lines(2000, accented_row=1000).encode("latin-1")
+    path = tmp_path / ("dump.txt.gz" if compressed else "dump.txt")
+    path.write_bytes(gzip.compress(content) if compressed else content)
+    compression = "gzip" if compressed else None
+    # Every sample is ASCII
+    assert detect_encoding(path, compression) == "utf-8"
+
+    reported = []
+    assert parse_dump_to_csv(path, tmp_path / "output.csv", reported.append, compression) == 2000
+    lines = (tmp_path / "output.csv").read_text(encoding="utf-8").splitlines()
+    assert lines[1001] == "1000,Hélène,Orléans"
+    assert lines[-1] == "1999,nom1999,ville"
+    assert reported[-1] == path.stat().st_size
+
+
+def test_dumps_in_another_encoding_are_ingested_as_utf8(client):
+    content = dump_lines(3).replace("nom1", "Noël").replace(" ID ", " TELEPHONE ")
+    response = ingest(client, content.encode("cp1252"), "dump.txt")
+    assert response.status_code == 200, response.text
+    assert "Noël".encode("utf-8") in dataset_bytes()
@@ -42,8 +42,9 @@ const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL || "http://localhost:800
 // File size threshold for warning (1GB)
 const FILE_SIZE_WARNING_THRESHOLD = 1 * 1024 * 1024 * 1024
 
-// Delay between processing parts (in milliseconds)
-const PROCESSING_DELAY = 5000
+// Data files: TXT dumps, or compressed dumps decompressed by the backend while parsing
+const DATA_FILE_EXTENSIONS = [".txt", ".gz", ".zst", ".zip"]
+const isCompressedFile = (file: File) => !file.name.toLowerCase().endsWith(".txt")
 
 interface ImportDialogProps {
   fileExists: boolean
@@ -158,11 +159,7 @@ export function ImportDialog({ fileExists }: ImportDialogProps) {
       !failedFiles.includes(splitFiles[currentSplitFileIndex].name)
     ) {
       // Traiter la partie actuelle
-      const timer = setTimeout(() => {
-        handleImportSplitFile(splitFiles[currentSplitFileIndex], currentSplitFileIndex)
-      }, PROCESSING_DELAY) // Délai entre les parties
-
-      return () => clearTimeout(timer)
+      handleImportSplitFile(splitFiles[currentSplitFileIndex], currentSplitFileIndex)
     }
   }, [currentSplitFileIndex, splitFiles, isLoading, failedFiles, processingAllParts])
 
@@ -171,8 +168,8 @@ export function ImportDialog({ fileExists }: ImportDialogProps) {
       const file = e.target.files[0]
       setDataFile(file)
 
-      // Check if file is large and show warning
-      if (file.size > FILE_SIZE_WARNING_THRESHOLD) {
+      // Check if file is large and show warning (compressed files cannot be split)
+      if (file.size > FILE_SIZE_WARNING_THRESHOLD && !isCompressedFile(file)) {
         setShowSizeWarning(true)
       } else {
         setShowSizeWarning(false)
@@ -205,13 +202,13 @@ export function ImportDialog({ fileExists }: ImportDialogProps) {
 
     if (e.dataTransfer.files && e.dataTransfer.files.length > 0) {
       if (type === "data") {
-        // Accept only .txt files
+        // Accept only .txt files, optionally compressed
         const file = e.dataTransfer.files[0]
-        if (file.name.toLowerCase().endsWith(".txt")) {
+        if (DATA_FILE_EXTENSIONS.some((extension) => file.name.toLowerCase().endsWith(extension))) {
           setDataFile(file)
 
-          // Check if file is large and show warning
-          if (file.size > FILE_SIZE_WARNING_THRESHOLD) {
+          // Check if file is large and show warning (compressed files cannot be split)
+          if (file.size > FILE_SIZE_WARNING_THRESHOLD && !isCompressedFile(file)) {
             setShowSizeWarning(true)
           } else {
             setShowSizeWarning(false)
@@ -219,7 +216,7 @@ export function ImportDialog({ fileExists }: ImportDialogProps) {
         } else {
           toast({
             title: "Format non supporté",
-            description: "Veuillez sélectionner un fichier TXT pour les données",
+            description: "Veuillez sélectionner un fichier TXT (ou compressé en .gz, .zst, .zip) pour les données",
             variant: "destructive",
           })
         }
@@ -1054,7 +1051,7 @@ export function ImportDialog({ fileExists }: ImportDialogProps) {
                 ref={dataInputRef}
                 id="data-file"
                 type="file"
-                accept=".txt"
+                accept={DATA_FILE_EXTENSIONS.join(",")}
                 multiple={false}
                 onChange={handleDataFileChange}
                 className="hidden"